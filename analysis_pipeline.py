@@ -0,0 +1,101 @@
+# analysis_pipeline.py
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide worker pool shared by every session's pipeline."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('NUTRILENS_PIPELINE_WORKERS', '8')),
+                    thread_name_prefix='nutrilens-analysis'
+                )
+    return _executor
+
+
+def _profile_key(user_profile):
+    return tuple(sorted((user_profile or {}).items()))
+
+
+class AnalysisPipeline:
+    def __init__(self, nutrition_api, advisor, executor=None):
+        """
+        Per-session memo of in-flight nutrition and advice work.
+
+        Nutrition lookups for every detected candidate start as soon as detection
+        returns, so whichever food the user confirms is usually already resolved.
+        Advice is chained onto its nutrition lookup without blocking a worker.
+
+        Args:
+            nutrition_api: NutritionAPI instance
+            advisor: GPTAdvisor instance
+            executor: concurrent.futures executor (defaults to the shared pool)
+        """
+        self.nutrition_api = nutrition_api
+        self.advisor = advisor
+        self.executor = executor or get_executor()
+        self._nutrition = {}
+        self._advice = {}
+        self._lock = threading.Lock()
+
+    def prefetch_nutrition(self, food_names):
+        """Start nutrition lookups for every candidate without waiting on them"""
+        for food_name in food_names:
+            self.nutrition(food_name)
+
+    def nutrition(self, food_name):
+        """Future for get_nutrition(food_name), started once per session"""
+        with self._lock:
+            future = self._nutrition.get(food_name)
+            if future is None or future.cancelled():
+                future = self.executor.submit(self.nutrition_api.get_nutrition, food_name)
+                self._nutrition[food_name] = future
+            return future
+
+    def advice(self, food_name, user_profile):
+        """Future for generate_advice, chained onto the food's nutrition lookup"""
+        key = (food_name, _profile_key(user_profile))
+        with self._lock:
+            future = self._advice.get(key)
+            if future is not None and not future.cancelled():
+                return future
+            future = Future()
+            self._advice[key] = future
+
+        def start(nutrition_future):
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                nutrition_data = nutrition_future.result()
+                inner = self.executor.submit(self.advisor.generate_advice, food_name, nutrition_data, user_profile)
+            except Exception as e:
+                future.set_exception(e)
+                return
+            inner.add_done_callback(lambda done: _transfer(done, future))
+
+        self.nutrition(food_name).add_done_callback(start)
+        return future
+
+    def cancel(self):
+        """Drop all speculative work, e.g. when a new photo is uploaded"""
+        with self._lock:
+            for future in list(self._nutrition.values()) + list(self._advice.values()):
+                future.cancel()
+            self._nutrition.clear()
+            self._advice.clear()
+
+
+def _transfer(source, target):
+    if source.cancelled():
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -1,11 +1,28 @@
 # app.py (Cleaned-Up Version)
 import streamlit as st
 from streamlit_option_menu import option_menu
+import os
 import time
 import random
+import datetime
+import importlib
 
 from theme import apply_pookie_theme
-from pages import log_meal_page, chat_page, dashboard_page, login_page, my_profile_page
+import metrics
+import resilience
+
+# Pages (and the provider SDKs they pull in: clarifai_grpc, openai, supabase,
+# plotly) are imported the first time they're shown, not at startup.
+# Check the cost with: python import_benchmark.py
+PAGE_MODULES = {
+    "Log Meal": "pages.log_meal_page", "AI Chat": "pages.chat_page",
+    "Dashboard": "pages.dashboard_page", "My Profile": "pages.my_profile_page",
+    "Login": "pages.login_page",
+}
+
+@st.cache_resource(show_spinner=False)
+def load_page(page_name):
+    return importlib.import_module(PAGE_MODULES[page_name])
 
 st.set_page_config(
     page_title="NutriLens 🌸 Your AI Nutritionist",
@@ -13,7 +30,8 @@ st.set_page_config(
     layout="wide"
 )
 
-apply_pookie_theme()
+apply_pookie_theme(new_run=True)
+metrics.start_exporters()
 
 selected = option_menu(
     menu_title=None,
@@ -33,15 +51,11 @@ selected = option_menu(
 def display_page(page_name):
     if 'user' not in st.session_state:
         st.warning("You need to log in to access this page, pookie! 💖")
-        login_page.show_page()
+        load_page("Login").show_page()
     else:
-        page_modules = {
-            "Log Meal": log_meal_page, "AI Chat": chat_page,
-            "Dashboard": dashboard_page, "My Profile": my_profile_page
-        }
-        page_modules[page_name].show_page()
+        load_page(page_name).show_page()
 
-if selected == "Home":
+def show_home():
     st.markdown("<h1 class='main-title'>Welcome to NutriLens! 🌸</h1>", unsafe_allow_html=True)
     st.markdown("<p class='cute-tagline'>Your adorable AI nutritionist bestie! 💕</p>", unsafe_allow_html=True)
     st.markdown("---")
@@ -61,8 +75,16 @@ if selected == "Home":
         "A little walk after dinner is a wonderful way to aid digestion and get some gentle movement in. 🚶‍♀️✨",
         "Good sleep is a secret ingredient for good health! Aim for 7-8 hours to feel your best. 😴💖"
     ]
+    # Precomputed by daily_precompute.py; fall back to a static tip
+    insight = None
+    if 'user' in st.session_state:
+        from database import init_database, get_daily_insight
+        insight = get_daily_insight(init_database(), st.session_state.user.id, datetime.date.today())
+    tip = insight['tip'] if insight and insight.get('tip') else random.choice(tips)
     # CLEANED: Removed inline style from the <p> tag
-    st.markdown(f"<div class='daily-tip-card'><h4>💖 Pookie's Tip of the Day 💖</h4><p>{random.choice(tips)}</p></div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='daily-tip-card'><h4>💖 Pookie's Tip of the Day 💖</h4><p>{tip}</p></div>", unsafe_allow_html=True)
+    if insight and insight.get('summary'):
+        st.markdown(f"<div class='daily-tip-card'><h4>📝 Yesterday in a Nutshell</h4><p>{insight['summary']}</p></div>", unsafe_allow_html=True)
     st.markdown("---")
     if 'user' in st.session_state:
         st.success("You're logged in and ready to go! What's on your plate today?")
@@ -71,10 +93,14 @@ if selected == "Home":
         st.warning("You're not logged in! Create an account to start your personalized health journey.")
         st.info("Click 'Login' in the top menu to get started! 👤")
 
-elif selected in ["Log Meal", "AI Chat", "Dashboard", "My Profile"]:
-    display_page(selected)
-elif selected == "Login":
-    login_page.show_page()
+# Every page render is one span, e.g. page.log_meal
+with metrics.span(f"page.{selected.lower().replace(' ', '_')}"):
+    if selected == "Home":
+        show_home()
+    elif selected in ["Log Meal", "AI Chat", "Dashboard", "My Profile"]:
+        display_page(selected)
+    elif selected == "Login":
+        load_page("Login").show_page()
 
 if 'user' in st.session_state:
     st.sidebar.success(f"Logged in as {st.session_state.user.email} ✅")
@@ -83,4 +109,10 @@ if 'user' in st.session_state:
             del st.session_state[key]
         st.success("You've been logged out, cutie! See you soon! 👋")
         time.sleep(1)
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+# Off unless NUTRILENS_METRICS=1 and NUTRILENS_DEBUG_PANEL=1
+if metrics.ENABLED and os.getenv('NUTRILENS_DEBUG_PANEL', '0') == '1':
+    with st.sidebar.expander("⏱️ Performance"):
+        st.dataframe(metrics.registry.snapshot(), hide_index=True)
+        st.dataframe(resilience.guard_states(), hide_index=True)
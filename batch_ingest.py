@@ -0,0 +1,506 @@
+# batch_ingest.py
+# Headless bulk import of meal photos into one user's log. Photos stream
+# through four stages, each with its own bounded worker pool and a bounded
+# queue in front of it, so a slow stage holds back the ones before it:
+#   preprocess → detect (FoodDetector) → nutrition (NutritionAPI) → save (insert_meals)
+# Every finished photo is appended to the checkpoint file, and rerunning the
+# same command skips photos that are already saved.
+#   python batch_ingest.py photos/ --user-id <uuid> --checkpoint clinic.ckpt
+#   python batch_ingest.py --manifest meals.csv --user-id <uuid> --preprocess-processes 4
+#   python batch_ingest.py --dry-run --synthetic 300 --latency-ms 60   # local stand-ins only
+import os
+import csv
+import json
+import time
+import uuid
+import queue
+import random
+import shutil
+import hashlib
+import argparse
+import datetime
+import tempfile
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from PIL import Image
+
+load_dotenv()
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+STAGES = ('preprocess', 'detect', 'nutrition', 'save')
+DEFAULT_WORKERS = {'preprocess': 4, 'detect': 2, 'nutrition': 4, 'save': 2}
+# Idempotency keys are uuid5(user + photo content) in this namespace, so the
+# same photo imported twice (from any path) is stored once
+IMPORT_NAMESPACE = uuid.UUID('6f1c2a52-4a3e-4c55-9c1b-0d9a3e7f5b21')
+
+_EXIF_IFD = 0x8769
+_EXIF_DATETIME_ORIGINAL = 36867
+_EXIF_DATETIME = 306
+_DONE = object()
+
+
+def iter_photos(paths=(), manifest=None):
+    """
+    Yield one job per photo, in a stable order.
+
+    Args:
+        paths (list): Image files and/or directories (searched recursively)
+        manifest (str): CSV or JSON Lines file with a 'path' column (relative to
+            the manifest) and optional 'eaten_at' (ISO 8601) and 'food_name'
+
+    Returns:
+        generator: dicts with 'id', 'path' and, from a manifest, 'eaten_at' and 'food_name'
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield _job(os.path.join(root, name))
+        else:
+            yield _job(path)
+
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, newline='', encoding='utf-8') as f:
+            if manifest.endswith(('.jsonl', '.ndjson')):
+                rows = (json.loads(line) for line in f if line.strip())
+            else:
+                rows = csv.DictReader(f)
+            for row in rows:
+                eaten_at = row.get('eaten_at') or None
+                yield _job(os.path.join(base, row['path']),
+                           eaten_at=datetime.datetime.fromisoformat(eaten_at).astimezone() if eaten_at else None,
+                           food_name=row.get('food_name') or None)
+
+
+def _job(path, eaten_at=None, food_name=None):
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+        # Identity for the checkpoint: a rewritten file is imported again
+        photo_id = f"{path}|{stat.st_size}|{stat.st_mtime_ns}"
+    except OSError:
+        photo_id = path
+    return {'id': photo_id, 'path': path, 'eaten_at': eaten_at, 'food_name': food_name, 'error': None}
+
+
+def photo_timestamp(raw, path):
+    """When the photo was taken: EXIF DateTimeOriginal, else EXIF DateTime, else the file's mtime."""
+    try:
+        exif = Image.open(BytesIO(raw)).getexif()
+        value = exif.get_ifd(_EXIF_IFD).get(_EXIF_DATETIME_ORIGINAL) or exif.get(_EXIF_DATETIME)
+        if value:
+            # EXIF times are camera-local wall clock; read them in this machine's zone
+            return datetime.datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S').astimezone()
+    except (OSError, ValueError, SyntaxError):
+        pass
+    return datetime.datetime.fromtimestamp(os.path.getmtime(path)).astimezone()
+
+
+def prepare_photo(path, user_id):
+    """
+    Read, downscale and fingerprint one photo. Runs in a worker process when
+    --preprocess-processes is set, so it only returns picklable values.
+    """
+    from image_preprocessing import prepare_image
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    prepared = prepare_image(raw)
+    del prepared['image']
+    prepared['idempotency_key'] = str(uuid.uuid5(IMPORT_NAMESPACE, f"{user_id}:{hashlib.sha256(raw).hexdigest()}"))
+    prepared['taken_at'] = photo_timestamp(raw, path)
+    return prepared
+
+
+class Stage:
+    def __init__(self, name, handler, workers=1, queue_size=32, batch_size=1, linger=0.05):
+        """
+        A pool of worker threads behind a bounded inbox. Each worker takes up
+        to batch_size items (waiting at most linger seconds to fill a batch),
+        hands the ones without an error to handler, then passes every item on.
+        put() blocks while the inbox is full, which throttles the stage before it.
+
+        Args:
+            name (str): Stage name used in reports and error messages
+            handler (callable): Called with a list of items; sets results or 'error' on each
+            workers (int): Worker threads
+            queue_size (int): Items allowed to wait in the inbox
+            batch_size (int): Most items handed to one handler call
+            linger (float): Seconds to wait for a batch to fill
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.linger = linger
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.stats = {'items': 0, 'failed': 0, 'batches': 0, 'busy_seconds': 0.0}
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def start(self, downstream, on_finished):
+        """Start the workers; downstream(item) receives every item, on_finished() runs after the last worker exits."""
+        self._downstream = downstream
+        self._on_finished = on_finished
+        self._running = self.workers
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f'ingest-{self.name}-{index}', daemon=True).start()
+
+    def put(self, item):
+        self.inbox.put(item)
+
+    def close(self):
+        """No more input: each worker exits after draining the inbox."""
+        for _ in range(self.workers):
+            self.inbox.put(_DONE)
+
+    def _work(self):
+        finished = False
+        while not finished:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            fill_until = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.inbox.get(timeout=max(0.0, fill_until - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+            self._handle(batch)
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self._on_finished()
+
+    def _handle(self, batch):
+        live = [item for item in batch if item['error'] is None]
+        started = time.perf_counter()
+        if live:
+            try:
+                self.handler(live)
+            except Exception as e:
+                for item in live:
+                    if item['error'] is None:
+                        item['error'] = f"{self.name}: {e}"
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.stats['items'] += len(live)
+            self.stats['failed'] += sum(1 for item in live if item['error'] is not None)
+            self.stats['batches'] += 1 if live else 0
+            self.stats['busy_seconds'] += elapsed
+        for item in batch:
+            self._downstream(item)
+
+
+class Checkpoint:
+    def __init__(self, path=None):
+        """
+        Append-only JSON Lines log of finished photos. Photos recorded as saved
+        (or already present) are skipped on the next run; failed ones are retried.
+
+        Args:
+            path (str): Checkpoint file, or None to keep no checkpoint
+        """
+        self.path = path
+        self.completed = set()
+        self._lock = threading.Lock()
+        self._file = None
+        if not path:
+            return
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A run killed mid-write leaves a partial last line
+                        continue
+                    if record.get('status') in ('saved', 'duplicate'):
+                        self.completed.add(record['id'])
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, item, status):
+        if self._file is None:
+            return
+        nutrition = item.get('nutrition') or {}
+        line = json.dumps({
+            'id': item['id'], 'path': item['path'], 'status': status,
+            'food_name': nutrition.get('food_name') or item.get('food_name'),
+            'calories': nutrition.get('calories'), 'error': item['error'],
+            'at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        })
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def run_ingest(jobs, user_id, detector, nutrition_api, db, checkpoint=None, workers=None, queue_size=32,
+               detect_batch=8, nutrition_batch=8, save_batch=25, preprocess_processes=0, min_confidence=0.0,
+               report_interval=5.0):
+    """
+    Stream photos through preprocess → detect → nutrition → save.
+
+    Args:
+        jobs (iterable): Jobs from iter_photos
+        user_id (str): Owner of the imported meals
+        detector: FoodDetector instance
+        nutrition_api: NutritionAPI instance
+        db: Supabase client
+        checkpoint (Checkpoint): Progress log; photos it lists as done are skipped
+        workers (dict): Worker threads per stage (defaults to DEFAULT_WORKERS)
+        queue_size (int): Items allowed to wait in front of each stage
+        detect_batch (int): Photos per PostModelOutputs request
+        nutrition_batch (int): Foods per get_nutrition_many call
+        save_batch (int): Meal rows per insert
+        preprocess_processes (int): Decode and resize in this many processes (0 keeps it in threads);
+            the preprocess stage gets at least one thread per process
+        min_confidence (float): Detections below this confidence are marked failed
+        report_interval (float): Seconds between progress lines (0 for none)
+
+    Returns:
+        dict: Counts per outcome, elapsed seconds, photos per second and per-stage stats
+    """
+    from database import build_meal_row, insert_meals
+
+    checkpoint = checkpoint or Checkpoint()
+    workers = {**DEFAULT_WORKERS, **(workers or {})}
+    pool = None
+    if preprocess_processes:
+        # spawn, not fork: the parent already holds gRPC channels and threads
+        pool = ProcessPoolExecutor(preprocess_processes, mp_context=multiprocessing.get_context('spawn'))
+        # Each preprocess thread waits on one job, so it takes a thread per process to keep them all busy
+        workers['preprocess'] = max(workers['preprocess'], preprocess_processes)
+
+    def preprocess(items):
+        for item in items:
+            try:
+                if pool is not None:
+                    item['prepared'] = pool.submit(prepare_photo, item['path'], user_id).result()
+                else:
+                    item['prepared'] = prepare_photo(item['path'], user_id)
+            except Exception as e:
+                item['error'] = f"preprocess: could not read image: {e}"
+
+    def detect(items):
+        # Manifest rows that already name the food skip the model
+        unnamed = [item for item in items if not item['food_name']]
+        results = detector.detect_prepared_batch([item['prepared'] for item in unnamed], batch_size=detect_batch)
+        for item, result in zip(unnamed, results):
+            if not result['success']:
+                item['error'] = f"detect: {result['error']}"
+            elif result['confidence'] < min_confidence:
+                item['error'] = f"detect: {result['food_name']} at {result['confidence']:.0%} is below --min-confidence"
+            else:
+                item['food_name'] = result['food_name']
+        for item in items:
+            item['prepared'].pop('bytes', None)
+
+    def nutrition(items):
+        results = nutrition_api.get_nutrition_many([item['food_name'] for item in items])
+        for item, result in zip(items, results):
+            if result['success']:
+                item['nutrition'] = result
+            else:
+                item['error'] = f"nutrition: {result['error']}"
+
+    def save(items, attempts=4):
+        rows = [build_meal_row(user_id, item['nutrition'], {}, item['prepared']['idempotency_key'],
+                               created_at=item['eaten_at'] or item['prepared']['taken_at'])
+                for item in items]
+        for attempt in range(attempts):
+            try:
+                inserted = {row.get('idempotency_key') for row in insert_meals(db, rows)}
+                break
+            except Exception as e:
+                if attempt == attempts - 1:
+                    raise
+                print(f"⚠️ Save batch failed ({e}), retrying")
+                time.sleep(random.uniform(0, min(5.0, 0.5 * (2 ** attempt))))
+        for item in items:
+            item['status'] = 'saved' if item['prepared']['idempotency_key'] in inserted else 'duplicate'
+
+    stages = [
+        Stage('preprocess', preprocess, workers['preprocess'], queue_size),
+        Stage('detect', detect, workers['detect'], queue_size, batch_size=detect_batch),
+        Stage('nutrition', nutrition, workers['nutrition'], queue_size, batch_size=nutrition_batch),
+        Stage('save', save, workers['save'], queue_size, batch_size=save_batch, linger=0.25),
+    ]
+    outcomes = {'saved': 0, 'duplicate': 0, 'failed': 0, 'skipped': 0}
+    outcomes_lock = threading.Lock()
+    finished = threading.Event()
+
+    def sink(item):
+        status = 'failed' if item['error'] is not None else item.get('status', 'saved')
+        checkpoint.record(item, status)
+        with outcomes_lock:
+            outcomes[status] += 1
+        if status == 'failed':
+            print(f"❌ {item['path']}: {item['error']}")
+
+    for stage, downstream in zip(stages, stages[1:] + [None]):
+        stage.start(downstream.put if downstream else sink,
+                    downstream.close if downstream else finished.set)
+
+    started = time.perf_counter()
+    queued = 0
+
+    def report():
+        while not finished.wait(report_interval):
+            with outcomes_lock:
+                done = outcomes['saved'] + outcomes['duplicate'] + outcomes['failed']
+                failed = outcomes['failed']
+            depths = ' '.join(f"{stage.name} {stage.inbox.qsize()}/{stage.inbox.maxsize}" for stage in stages)
+            rate = done / (time.perf_counter() - started)
+            print(f"📊 {done}/{queued} photos · {rate:.1f}/s · queued: {depths} · failed {failed}")
+
+    if report_interval:
+        threading.Thread(target=report, name='ingest-report', daemon=True).start()
+
+    try:
+        for job in jobs:
+            if job['id'] in checkpoint.completed:
+                outcomes['skipped'] += 1
+                continue
+            stages[0].put(job)
+            queued += 1
+    except KeyboardInterrupt:
+        print("⏹️ Interrupted: finishing the photos already in the pipeline. Rerun the same command to resume.")
+    stages[0].close()
+    while not finished.wait(0.5):
+        pass
+    elapsed = time.perf_counter() - started
+    if pool is not None:
+        pool.shutdown()
+
+    return {
+        **outcomes, 'queued': queued, 'elapsed_seconds': elapsed,
+        'photos_per_second': (queued / elapsed) if elapsed else 0.0,
+        'stages': {stage.name: {**stage.stats, 'workers': stage.workers,
+                                'items_per_second': stage.stats['items'] / elapsed if elapsed else 0.0}
+                   for stage in stages},
+    }
+
+
+def print_summary(summary):
+    print(f"\n{'stage':<12}{'workers':>8}{'items':>8}{'failed':>8}{'items/s':>10}{'busy s':>10}{'ms/batch':>10}")
+    for name, stats in summary['stages'].items():
+        per_batch = stats['busy_seconds'] / stats['batches'] * 1000 if stats['batches'] else 0.0
+        print(f"{name:<12}{stats['workers']:>8}{stats['items']:>8}{stats['failed']:>8}"
+              f"{stats['items_per_second']:>10.1f}{stats['busy_seconds']:>10.1f}{per_batch:>10.1f}")
+    print(f"\n✅ {summary['saved']} saved, {summary['duplicate']} already logged, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped from checkpoint · {summary['queued']} photos in "
+          f"{summary['elapsed_seconds']:.1f}s ({summary['photos_per_second']:.1f}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a folder or manifest of meal photos into a NutriLens log.")
+    parser.add_argument('paths', nargs='*', help="Image files or directories")
+    parser.add_argument('--manifest', help="CSV/JSONL with path and optional eaten_at, food_name columns")
+    parser.add_argument('--user-id', help="User the meals belong to")
+    parser.add_argument('--checkpoint', help="Progress file; rerun with the same file to resume")
+    for stage in STAGES:
+        parser.add_argument(f'--{stage}-workers', type=int, default=DEFAULT_WORKERS[stage])
+    parser.add_argument('--preprocess-processes', type=int, default=0, help="Decode and resize in worker processes")
+    parser.add_argument('--queue-size', type=int, default=32, help="Items allowed to wait in front of each stage")
+    parser.add_argument('--detect-batch', type=int, default=8, help="Photos per Clarifai request")
+    parser.add_argument('--nutrition-batch', type=int, default=8, help="Foods per Nutritionix query")
+    parser.add_argument('--save-batch', type=int, default=25, help="Meals per database insert")
+    parser.add_argument('--min-confidence', type=float, default=0.0, help="Fail detections below this confidence")
+    parser.add_argument('--report-interval', type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument('--report', help="Write the summary as JSON to this file")
+    parser.add_argument('--dry-run', action='store_true', help="Use the local provider stand-ins, not the real services")
+    parser.add_argument('--synthetic', type=int, default=0, help="With --dry-run: generate this many test photos")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="With --dry-run: stand-in latency")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="With --dry-run: extra random stand-in latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="With --dry-run: fraction of failing requests")
+    args = parser.parse_args()
+
+    if not args.dry_run and not args.user_id:
+        parser.error("--user-id is required (or use --dry-run)")
+    if not (args.paths or args.manifest or (args.dry_run and args.synthetic)):
+        parser.error("give image paths, --manifest or, with --dry-run, --synthetic N")
+
+    # Synthetic photos only live for this run
+    folder = tempfile.mkdtemp(prefix='nutrilens-ingest-') if args.dry_run and args.synthetic else None
+    try:
+        import metrics
+        metrics.start_exporters()
+
+        stack = None
+        paths = list(args.paths)
+        user_id = args.user_id or 'dry-run-user'
+        if args.dry_run:
+            from fake_services.stack import FakeProviderStack
+            stack = FakeProviderStack(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate).start()
+            if args.synthetic:
+                from benchmark_suite import make_images
+                for index, payload in enumerate(make_images(args.synthetic, size=(1600, 1200))):
+                    with open(os.path.join(folder, f"meal-{index:05d}.jpg"), 'wb') as f:
+                        f.write(payload)
+                paths.append(folder)
+                print(f"🧪 Wrote {args.synthetic} synthetic photos to {folder}")
+            db = stack.database()
+        else:
+            from supabase import create_client
+            db = create_client(os.environ["SUPABASE_URL"], os.getenv("SUPABASE_SERVICE_KEY") or os.environ["SUPABASE_KEY"])
+
+        from food_detection import FoodDetector
+        from nutrition_api import NutritionAPI
+        from nutrition_cache import NutritionCache
+
+        detector = FoodDetector()
+        if not detector.model_loaded:
+            raise SystemExit("❌ Food detector is not configured; check CLARIFAI_PAT")
+        # Dry runs keep the stand-ins' made-up numbers out of the real nutrition cache file
+        nutrition_api = NutritionAPI(cache=NutritionCache(None)) if args.dry_run else NutritionAPI()
+        checkpoint = Checkpoint(args.checkpoint)
+        if checkpoint.completed:
+            print(f"↩️ Resuming: {len(checkpoint.completed)} photos already done in {args.checkpoint}")
+
+        try:
+            summary = run_ingest(
+                iter_photos(paths, args.manifest), user_id, detector, nutrition_api, db, checkpoint,
+                workers={stage: getattr(args, f'{stage}_workers') for stage in STAGES},
+                queue_size=args.queue_size, detect_batch=args.detect_batch, nutrition_batch=args.nutrition_batch,
+                save_batch=args.save_batch, preprocess_processes=args.preprocess_processes,
+                min_confidence=args.min_confidence, report_interval=args.report_interval,
+            )
+        finally:
+            checkpoint.close()
+
+        print_summary(summary)
+        if stack is not None:
+            meals = stack.postgrest.tables.get('meals', [])
+            print(f"🧪 Dry run: the stand-in database now holds {sum(1 for m in meals if m['user_id'] == user_id)} meals for {user_id}")
+            stack.stop()
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            print(f"✅ Summary written to {args.report}")
+        raise SystemExit(1 if summary['failed'] else 0)
+    finally:
+        if folder is not None:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
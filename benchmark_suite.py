@@ -0,0 +1,239 @@
+# benchmark_suite.py
+# Offline end-to-end benchmarks: every provider is replaced by the in-process
+# stand-ins in fake_services/ (Clarifai gRPC servicer, Nutritionix, OpenAI and
+# PostgREST), each with the same configurable latency and error profile.
+#   python benchmark_suite.py --iterations 50 --json bench.json
+#   python benchmark_suite.py --latency-ms 80 --jitter-ms 40 --error-rate 0.02 --compare bench.json
+import io
+import sys
+import json
+import uuid
+import time
+import argparse
+import datetime
+import contextlib
+
+import numpy as np
+from PIL import Image
+
+from fake_services.stack import FakeProviderStack
+
+BENCH_USER = 'bench-user'
+BENCH_PROFILE = {'goal': 'Stay Healthy', 'age': 30, 'diet_type': 'Flexible', 'activity': 'Moderate'}
+
+
+def summarize(samples_ms, errors=0):
+    """Latency percentiles for one scenario, in milliseconds."""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) if len(samples) else (0.0, 0.0, 0.0)
+    return {
+        'count': int(len(samples)), 'errors': errors,
+        'mean_ms': float(samples.mean()) if len(samples) else 0.0,
+        'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+        'max_ms': float(samples.max()) if len(samples) else 0.0,
+    }
+
+
+def time_scenario(run, iterations, warmup=2):
+    """
+    Call run(i) warmup + iterations times. A call counts as an error if it
+    raises or returns a dict with success=False.
+    """
+    samples, errors = [], 0
+    for i in range(-warmup, iterations):
+        started = time.perf_counter()
+        try:
+            result = run(i)
+            failed = isinstance(result, dict) and result.get('success') is False
+        except Exception:
+            failed = True
+        elapsed = (time.perf_counter() - started) * 1000
+        if i >= 0:
+            samples.append(elapsed)
+            errors += failed
+    return summarize(samples, errors)
+
+
+def unique_food(i):
+    """A food name per index that no alias, local table entry or cache key shares."""
+    letters = ''
+    i += 1
+    while i:
+        i, remainder = divmod(i - 1, 26)
+        letters = chr(ord('a') + remainder) + letters
+    return f'benchmark stew {letters}'
+
+
+def make_images(count, size=(1024, 768), seed=0):
+    """Distinct noisy JPEGs, so neither the exact nor the perceptual detection cache hits."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, size=(size[1] // 16, size[0] // 16, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels).resize(size)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def seed_history(stack, db, days=90, meals_per_day=3):
+    """Give the benchmark user a profile and a few months of meals and rollups."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    stack.postgrest.seed('profiles', [{'id': BENCH_USER, **BENCH_PROFILE}])
+    stack.postgrest.seed('meals', [
+        {'user_id': BENCH_USER, 'created_at': (now - datetime.timedelta(days=day, hours=3 + 5 * slot)).isoformat(),
+         'food_name': 'Seeded meal', 'calories': 450.0, 'protein': 20.0, 'carbs': 50.0, 'fat': 15.0, 'advice': {}}
+        for day in range(days) for slot in range(meals_per_day)
+    ])
+    db.rpc('rebuild_daily_rollups', {'p_user_id': BENCH_USER}).execute()
+
+
+def run_benchmarks(iterations=30, warmup=2, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, only=None):
+    """
+    Run every scenario against a fresh FakeProviderStack.
+
+    Args:
+        iterations (int): Timed calls per scenario
+        warmup (int): Untimed calls before each scenario
+        latency (float): Base provider latency in seconds
+        jitter (float): Extra random provider latency, up to this many seconds
+        error_rate (float): Fraction of provider requests that fail
+        seed (int): Seed for images and fault injection
+        only (list): Scenario names to run (all if None)
+
+    Returns:
+        dict: 'config' and 'results' ({scenario: percentiles, error and request counts})
+    """
+    with FakeProviderStack(latency, jitter, error_rate, seed) as stack, contextlib.redirect_stdout(io.StringIO()):
+        import database
+        from food_detection import FoodDetector
+        from nutrition_api import NutritionAPI
+        from nutrition_cache import NutritionCache
+        from gpt_advisor import GPTAdvisor
+        from completion_cache import CompletionCache
+        from analysis_pipeline import AnalysisPipeline
+        from meal_save_queue import MealSaveQueue
+
+        db = stack.database()
+        seed_history(stack, db)
+        detector = FoodDetector()
+        nutrition_api = NutritionAPI(cache=NutritionCache(None))
+        advisor = GPTAdvisor(cache=CompletionCache())
+        images = make_images(2 * (warmup + iterations), seed=seed)
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        month_ago = today - datetime.timedelta(days=30)
+        sample_nutrition = nutrition_api.get_nutrition('pizza')
+
+        def uncached(read):
+            # Measure the database round trip, not the per-user read cache
+            def run(i):
+                database._user_cache.invalidate(BENCH_USER)
+                return read(i)
+            return run
+
+        save_queue = MealSaveQueue(db, flush_interval=0.05)
+
+        def analyze_food(i):
+            # The Log Meal flow: detect, prefetch every candidate, speculative advice, confirm, enqueue the save
+            pipeline = AnalysisPipeline(nutrition_api, advisor)
+            result = detector.detect_food(images[warmup + iterations + warmup + i])
+            if not result['success']:
+                return result
+            pipeline.prefetch_nutrition([result['food_name']] + [alt['name'] for alt in result['alternatives']])
+            pipeline.advice(result['food_name'], BENCH_PROFILE)
+            nutrition = pipeline.nutrition(result['food_name']).result()
+            advice = pipeline.advice(result['food_name'], BENCH_PROFILE).result()
+            save_queue.enqueue(BENCH_USER, nutrition, advice, str(uuid.uuid4()))
+            return nutrition
+
+        scenarios = {
+            'detect_food': lambda i: detector.detect_food(images[i + warmup]),
+            'get_nutrition': lambda i: nutrition_api.get_nutrition(unique_food(i + warmup)),
+            'get_nutrition_cached': lambda i: nutrition_api.get_nutrition(unique_food(0)),
+            'generate_advice': lambda i: advisor.generate_advice('Pizza', sample_nutrition, BENCH_PROFILE, use_cache=False),
+            'generate_advice_cached': lambda i: advisor.generate_advice('Pizza', sample_nutrition, BENCH_PROFILE),
+            'db_save_meal': lambda i: database.save_meal(db, BENCH_USER, sample_nutrition, {}, str(uuid.uuid4())),
+            'db_get_meals_30d': uncached(lambda i: database.get_meals_for_date_range(db, BENCH_USER, month_ago, today)),
+            'db_get_meals_today': uncached(lambda i: database.get_meals_today(db, BENCH_USER)),
+            'db_get_daily_rollups_30d': uncached(lambda i: database.get_daily_rollups(db, BENCH_USER, month_ago, today)),
+            'db_get_user_profile': uncached(lambda i: database.get_user_profile(db, BENCH_USER)),
+            'analyze_food': analyze_food,
+        }
+
+        results = {}
+        for name, run in scenarios.items():
+            if only and name not in only:
+                continue
+            before = stack.request_counts()
+            results[name] = time_scenario(run, iterations, warmup)
+            if name == 'analyze_food':
+                save_queue.flush(timeout=30)
+            after = stack.request_counts()
+            results[name]['requests'] = {provider: after[provider] - before[provider]
+                                         for provider in after if after[provider] != before[provider]}
+        save_queue.close()
+
+    return {
+        'config': {'iterations': iterations, 'warmup': warmup, 'latency_ms': latency * 1000,
+                   'jitter_ms': jitter * 1000, 'error_rate': error_rate, 'seed': seed,
+                   'python': sys.version.split()[0], 'timestamp': datetime.datetime.now().isoformat(timespec='seconds')},
+        'results': results,
+    }
+
+
+def compare(results, baseline, tolerance=0.2, min_delta_ms=1.0):
+    """
+    Scenarios whose p95 is more than tolerance slower than in baseline (and by
+    at least min_delta_ms, so sub-millisecond noise on cached paths is ignored).
+
+    Returns:
+        list: (scenario, baseline_p95_ms, current_p95_ms)
+    """
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous and current['p95_ms'] > max(previous['p95_ms'] * (1 + tolerance), previous['p95_ms'] + min_delta_ms):
+            regressions.append((name, previous['p95_ms'], current['p95_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NutriLens offline against local provider stand-ins.")
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Base latency of every fake provider")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Extra random latency, up to this much")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of provider requests that fail")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', help="Scenario names to run")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Baseline JSON from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed p95 slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.iterations, args.warmup, args.latency_ms / 1000, args.jitter_ms / 1000,
+                             args.error_rate, args.seed, args.only)
+
+    print(f"{'scenario':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}  requests")
+    for name, stats in results['results'].items():
+        requests_made = ', '.join(f"{provider} {count}" for provider, count in stats['requests'].items()) or '-'
+        print(f"{name:<26}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+              f"{stats['errors']:>8}  {requests_made}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            print(f"❌ {name}: p95 {before:.2f} ms → {after:.2f} ms")
+        print(f"{'✅' if not regressions else '⚠️'} {len(regressions)} regressions against {args.compare}")
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
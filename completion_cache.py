@@ -0,0 +1,108 @@
+# completion_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+
+# How long each kind of completion stays valid, in seconds
+DEFAULT_TTLS = {
+    'advice': 7 * 24 * 3600,
+    'daily_tip': 24 * 3600,
+    'daily_summary': 24 * 3600,
+    'chat': 10 * 60,
+}
+
+
+def make_completion_key(model, messages, temperature, max_tokens, extra=None):
+    """
+    Canonical key for a chat completion request.
+
+    Temperature is bucketed to one decimal so 0.70 and 0.7 share entries;
+    extra lets callers scope a key further (e.g. to a calendar day).
+    """
+    canonical = {
+        'model': model,
+        'messages': [{'role': m['role'], 'content': ' '.join(m['content'].split())} for m in messages],
+        'temperature': round(float(temperature), 1),
+        'max_tokens': max_tokens,
+        'extra': extra,
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class CompletionCache:
+    def __init__(self, max_entries=2048, ttls=None):
+        """
+        In-memory LRU store for completion text with per-method TTLs.
+
+        Any object with the same get(method, key) / set(method, key, text)
+        interface can be passed to GPTAdvisor instead.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted.
+            ttls (dict): Seconds to keep entries, per method name.
+        """
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self.evictions = 0
+
+    def get(self, method, key):
+        """Returns cached completion text, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.stats[method]['hits'] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.stats[method]['misses'] += 1
+            return None
+
+    def set(self, method, key, text):
+        ttl = self.ttls.get(method, 0)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def hit_ratios(self):
+        """Hit ratio per method, e.g. {'advice': 0.82, 'chat': 0.05}."""
+        with self._lock:
+            return {
+                method: counts['hits'] / (counts['hits'] + counts['misses'])
+                for method, counts in self.stats.items()
+                if counts['hits'] + counts['misses']
+            }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def default_completion_cache():
+    """
+    Process-wide cache built from COMPLETION_CACHE_* settings, or None when
+    switched off. Shared so short-lived GPTAdvisor instances still benefit.
+    """
+    global _shared_cache
+    if os.getenv('COMPLETION_CACHE', 'on').lower() in ('off', '0', 'false', 'none'):
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            ttls = {}
+            for method in DEFAULT_TTLS:
+                value = os.getenv(f'COMPLETION_CACHE_TTL_{method.upper()}')
+                if value:
+                    ttls[method] = int(value)
+            _shared_cache = CompletionCache(max_entries=int(os.getenv('COMPLETION_CACHE_SIZE', '2048')), ttls=ttls)
+        return _shared_cache
@@ -0,0 +1,118 @@
+# conversation_memory.py
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English chat text)."""
+    return len(text) // 4 + 1
+
+
+def format_meal_history(meal_history, max_listed=5):
+    """
+    Describe today's meals in a bounded number of lines: the latest meals are
+    listed, older ones are folded into a single aggregate line.
+    """
+    if not meal_history:
+        return "You haven't logged any meals yet today."
+
+    total_calories = sum(meal.get('calories', 0) or 0 for meal in meal_history)
+    earlier, latest = meal_history[:-max_listed], meal_history[-max_listed:]
+
+    history_str = "So far today, you have logged:\n"
+    if earlier:
+        earlier_calories = sum(meal.get('calories', 0) or 0 for meal in earlier)
+        history_str += f"- {len(earlier)} earlier meals (about {earlier_calories:.0f} kcal)\n"
+    for meal in latest:
+        history_str += f"- {meal['food_name']} ({meal.get('calories', 0):.0f} kcal)\n"
+    history_str += f"Your total for today is approximately {total_calories:.0f} calories."
+    return history_str
+
+
+class ConversationMemory:
+    def __init__(self, token_budget=1500, keep_last_turns=6, summary_token_limit=200, fold_batch=4):
+        """
+        Keeps chat context within a fixed token budget.
+
+        The last keep_last_turns messages are kept verbatim; older ones are
+        folded, fold_batch at a time, into a rolling summary that is stored
+        here and extended rather than rebuilt on every turn.
+
+        Args:
+            token_budget (int): Maximum prompt tokens for a chat request.
+            keep_last_turns (int): Recent messages kept word for word.
+            summary_token_limit (int): Maximum size of the rolling summary.
+            fold_batch (int): Messages that must fall out of the window before a fold.
+        """
+        self.token_budget = token_budget
+        self.keep_last_turns = keep_last_turns
+        self.summary_token_limit = summary_token_limit
+        self.fold_batch = fold_batch
+        self.summary = ""
+        self.turns = []
+        self._consumed = 0
+
+    def sync(self, chat_messages, summarizer=None):
+        """
+        Ingest messages appended since the last call and fold old ones if due.
+
+        Args:
+            chat_messages (list): The full st.session_state.chat_messages list.
+            summarizer: Optional callable(summary, messages) -> str used to fold
+                        turns; a cheap extractive fold is used if it is missing or fails.
+        """
+        if len(chat_messages) < self._consumed:
+            # The chat history was reset
+            self.summary, self.turns, self._consumed = "", [], 0
+        self.turns.extend(dict(m) for m in chat_messages[self._consumed:])
+        self._consumed = len(chat_messages)
+
+        overflow = len(self.turns) - self.keep_last_turns
+        if overflow < self.fold_batch:
+            return
+        to_fold, self.turns = self.turns[:overflow], self.turns[overflow:]
+
+        folded = None
+        if summarizer is not None:
+            try:
+                folded = summarizer(self.summary, to_fold)
+            except Exception as e:
+                print(f"⚠️ Conversation summary failed, using a short extract instead: {e}")
+        if not folded:
+            folded = self._extractive_fold(to_fold)
+        self.summary = self._clip(folded.strip(), self.summary_token_limit)
+
+    def context_messages(self, token_allowance):
+        """
+        Chat messages to place before the new question: the rolling summary
+        (if any) plus as many recent turns as fit in token_allowance.
+        """
+        messages = []
+        remaining = token_allowance
+        if self.summary:
+            summary = self._clip(self.summary, max(0, remaining // 2))
+            if summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+                remaining -= estimate_tokens(messages[0]['content'])
+
+        recent = []
+        for turn in reversed(self.turns[-self.keep_last_turns:]):
+            cost = estimate_tokens(turn['content'])
+            if cost > remaining:
+                break
+            recent.append({"role": turn['role'], "content": turn['content']})
+            remaining -= cost
+        return messages + list(reversed(recent))
+
+    def _extractive_fold(self, turns):
+        lines = [self.summary] if self.summary else []
+        for turn in turns:
+            speaker = "User" if turn['role'] == 'user' else "Pookie"
+            first_sentence = turn['content'].strip().split('\n')[0][:120]
+            lines.append(f"{speaker}: {first_sentence}")
+        return ' | '.join(lines)
+
+    @staticmethod
+    def _clip(text, token_limit):
+        """Keep the most recent part of text within token_limit"""
+        max_chars = token_limit * 4
+        if len(text) <= max_chars:
+            return text
+        return "…" + text[-max(0, max_chars - 1):] if max_chars > 1 else ""
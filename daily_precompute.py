@@ -0,0 +1,148 @@
+# daily_precompute.py
+# Batch worker: precomputes every user's daily tip and yesterday's summary so the
+# Home page reads them instead of calling the LLM. Run once a day, e.g. from cron:
+#   python daily_precompute.py --workers 8
+import os
+import argparse
+import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from database import get_all_profiles, get_meal_totals_for_date_all_users, save_daily_insights
+
+load_dotenv()
+
+WRITE_CHUNK_SIZE = 500
+
+
+def _summary_key(profile, day_totals):
+    """Users whose rounded inputs match share one summary completion"""
+    return (
+        profile.get('goal') or 'Stay Healthy',
+        profile.get('activity') or 'Moderate',
+        day_totals['meal_count'],
+        int(round(day_totals['calories'] / 50.0) * 50),
+        int(round(day_totals['protein'] / 5.0) * 5),
+        int(round(day_totals['carbs'] / 5.0) * 5),
+        int(round(day_totals['fat'] / 5.0) * 5),
+    )
+
+
+def run_daily_precompute(db, advisor, day=None, max_workers=4, dry_run=False):
+    """
+    Generate and store the day's tips and summaries for every profile.
+
+    Args:
+        db: Supabase client
+        advisor: GPTAdvisor instance
+        day (datetime.date): Day the insights are for (defaults to today)
+        max_workers (int): Concurrent LLM requests
+        dry_run (bool): Build the rows but don't write them
+
+    Returns:
+        dict: Counts of users, distinct prompts and rows written, plus the rows themselves
+    """
+    day = day or datetime.date.today()
+    previous_day = day - datetime.timedelta(days=1)
+
+    profiles = list(get_all_profiles(db))
+    totals = get_meal_totals_for_date_all_users(db, previous_day)
+
+    tip_groups = defaultdict(list)
+    summary_groups = defaultdict(list)
+    for profile in profiles:
+        tip_groups[profile.get('goal') or 'Stay Healthy'].append(profile['id'])
+        day_totals = totals.get(profile['id'])
+        if day_totals:
+            summary_groups[_summary_key(profile, day_totals)].append(profile['id'])
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nutrilens-precompute') as pool:
+        tip_futures = {
+            goal: pool.submit(advisor.generate_daily_tip, {'goal': goal}, day=day, fallback=False)
+            for goal in tip_groups
+        }
+        summary_futures = {
+            key: pool.submit(
+                advisor.generate_daily_summary,
+                {'goal': key[0], 'activity': key[1]},
+                dict(zip(('meal_count', 'calories', 'protein', 'carbs', 'fat'), key[2:]))
+            )
+            for key in summary_groups
+        }
+        tips = {goal: future.result() for goal, future in tip_futures.items()}
+        summaries = {key: future.result() for key, future in summary_futures.items()}
+
+    # A failed generation leaves its column out, so a rerun fills it in and a
+    # good value from an earlier run is never overwritten with a placeholder
+    rows_by_user = {}
+    for goal, user_ids in tip_groups.items():
+        for user_id in user_ids:
+            rows_by_user[user_id] = {'user_id': user_id, 'day': day.isoformat()}
+            if tips[goal] is not None:
+                rows_by_user[user_id]['tip'] = tips[goal]
+    for key, user_ids in summary_groups.items():
+        for user_id in user_ids:
+            if summaries[key] is not None:
+                rows_by_user[user_id]['summary'] = summaries[key]
+
+    rows = [row for row in rows_by_user.values() if len(row) > 2]
+    if not dry_run:
+        # One upsert needs the same columns in every row
+        by_columns = defaultdict(list)
+        for row in rows:
+            by_columns[tuple(row)].append(row)
+        for column_rows in by_columns.values():
+            for start in range(0, len(column_rows), WRITE_CHUNK_SIZE):
+                save_daily_insights(db, column_rows[start:start + WRITE_CHUNK_SIZE])
+
+    return {
+        'users': len(profiles),
+        'tip_prompts': len(tip_groups),
+        'summary_prompts': len(summary_groups),
+        'failed_tips': sum(1 for tip in tips.values() if tip is None),
+        'rows_written': 0 if dry_run else len(rows),
+        'rows': rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute NutriLens daily tips and summaries.")
+    parser.add_argument('--date', help="Day to compute insights for (YYYY-MM-DD, default today)")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('PRECOMPUTE_WORKERS', '4')))
+    parser.add_argument('--dry-run', action='store_true', help="Print results instead of writing them")
+    parser.add_argument('--fake-llm', action='store_true', help="Use a local fake OpenAI endpoint")
+    args = parser.parse_args()
+
+    day = datetime.date.fromisoformat(args.date) if args.date else None
+
+    fake_server = None
+    if args.fake_llm:
+        from fake_services.openai_server import FakeOpenAIServer
+        fake_server = FakeOpenAIServer().start()
+        os.environ['OPENAI_BASE_URL'] = fake_server.openai_base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'fake-key')
+
+    from supabase import create_client
+    from gpt_advisor import GPTAdvisor
+
+    # The worker reads every user's rows, so it needs a key that bypasses row-level security
+    db = create_client(os.environ["SUPABASE_URL"], os.getenv("SUPABASE_SERVICE_KEY") or os.environ["SUPABASE_KEY"])
+    try:
+        result = run_daily_precompute(db, GPTAdvisor(), day=day, max_workers=args.workers, dry_run=args.dry_run)
+    finally:
+        if fake_server is not None:
+            fake_server.stop()
+
+    if args.dry_run:
+        for row in result['rows']:
+            print(row)
+    if result['failed_tips']:
+        print(f"⚠️ {result['failed_tips']} tip prompts failed; rerun later to fill those tips in")
+    print(f"✅ {result['users']} users, {result['tip_prompts']} tip prompts, "
+          f"{result['summary_prompts']} summary prompts, {result['rows_written']} rows written")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,15 @@ import os
 from dotenv import load_dotenv
 import datetime
 
+from user_cache import UserDataCache
+import metrics
+
 # Load the .env file
 load_dotenv()
 
+# Per-user read-through cache, shared by every session in this process
+_user_cache = UserDataCache()
+
 @st.cache_resource
 def init_supabase():
     """Initializes and returns the Supabase client."""
@@ -27,76 +33,263 @@ def init_supabase():
         st.error(f"Failed to initialize Supabase: {e}")
         return None
 
-def save_meal(db: Client, user_id, meal_data, advice):
+# Column projections for meal reads; nothing on the read side needs the large 'advice' blob
+MEAL_SUMMARY_COLUMNS = "id, created_at, food_name, calories, protein, carbs, fat"
+MEAL_CHAT_COLUMNS = "id, created_at, food_name, calories"
+MEAL_PAGE_SIZE = 500
+# Below PostgREST's default max-rows (1000), so a full page is never truncated
+ROLLUP_PAGE_SIZE = 500
+
+def build_meal_row(user_id, meal_data, advice, idempotency_key=None, created_at=None):
+    """Shapes analysis output into a row for the 'meals' table. created_at backdates imported meals."""
+    row = {
+        'user_id': user_id, 'food_name': meal_data.get('food_name', 'Unknown'),
+        'calories': meal_data.get('calories', 0), 'protein': meal_data.get('protein', 0),
+        'carbs': meal_data.get('total_carbs', 0), 'fat': meal_data.get('total_fat', 0),
+        'advice': advice
+    }
+    if idempotency_key:
+        row['idempotency_key'] = idempotency_key
+    if created_at is not None:
+        row['created_at'] = created_at.isoformat()
+    return row
+
+@metrics.timed('db.save_meal')
+def save_meal(db: Client, user_id, meal_data, advice, idempotency_key=None):
     """Saves a user's meal to the 'meals' table in Supabase."""
     if not db: return
     try:
-        data_to_save = {
-            'user_id': user_id, 'food_name': meal_data.get('food_name', 'Unknown'),
-            'calories': meal_data.get('calories', 0), 'protein': meal_data.get('protein', 0),
-            'carbs': meal_data.get('total_carbs', 0), 'fat': meal_data.get('total_fat', 0),
-            'advice': advice
-        }
-        db.table('meals').insert(data_to_save).execute()
+        insert_meals(db, [build_meal_row(user_id, meal_data, advice, idempotency_key)])
         print(f"✅ Meal saved to Supabase for user {user_id}")
     except Exception as e:
         print(f"❌ Error saving meal to Supabase: {e}")
+        metrics.mark_error(e)
+
+@metrics.timed('db.insert_meals')
+def insert_meals(db: Client, rows):
+    """
+    Inserts meal rows in one request and drops the users' cached reads.
+    Rollups are updated by the meals insert trigger (migrations/004).
+    Rows whose idempotency_key already exists are skipped. Returns the rows
+    actually inserted; errors are raised so callers can retry.
+    """
+    if metrics.ENABLED:
+        metrics.add_payload(bytes_out=metrics.json_size(rows))
+    keyed = [row for row in rows if row.get('idempotency_key')]
+    unkeyed = [row for row in rows if not row.get('idempotency_key')]
+    inserted = []
+    if keyed:
+        response = db.table('meals').upsert(keyed, on_conflict='idempotency_key', ignore_duplicates=True).execute()
+        inserted += response.data or []
+    if unkeyed:
+        response = db.table('meals').insert(unkeyed).execute()
+        inserted += response.data or unkeyed
+
+    for user_id in {row['user_id'] for row in rows}:
+        _user_cache.invalidate(user_id, ('meals', 'rollups'))
+    return inserted
+
+def meal_day(meal):
+    """UTC calendar day a meal row belongs to."""
+    created_at = meal.get('created_at')
+    if not created_at:
+        return datetime.datetime.utcnow().date()
+    parsed = datetime.datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc)
+    return parsed.date()
+
+@metrics.timed('db.get_daily_rollups', result_bytes=True)
+def get_daily_rollups(db: Client, user_id, start_date, end_date, page_size=ROLLUP_PAGE_SIZE):
+    """
+    Fetches per-day totals for a date range from 'daily_nutrition_rollups'.
+    Pages by day (keyset) so multi-year ranges aren't cut off at PostgREST's max-rows.
+    Returns a list (one dict per logged day, 'day' as a date) or None if the read failed.
+    """
+    if not db: return None
+    hit, rollups = _user_cache.get(user_id, 'rollups', (start_date, end_date))
+    if hit: return list(rollups)
+    try:
+        rollups = []
+        last_day = None
+        while True:
+            query = db.table('daily_nutrition_rollups').select("day, calories, protein, carbs, fat, meal_count").eq('user_id', user_id).gte('day', start_date.isoformat()).lte('day', end_date.isoformat())
+            if last_day is not None:
+                query = query.gt('day', last_day)
+            rows = query.order('day', desc=False).limit(page_size).execute().data
+            rollups += [{**row, 'day': datetime.date.fromisoformat(row['day'])} for row in rows]
+            if len(rows) < page_size:
+                break
+            last_day = rows[-1]['day']
+        _user_cache.set(user_id, 'rollups', (start_date, end_date), rollups)
+        return list(rollups)
+    except Exception as e:
+        print(f"❌ Error fetching daily rollups: {e}")
+        metrics.mark_error(e)
+        return None
+
+@metrics.timed('db.iter_meals')
+def iter_meals(db: Client, user_id=None, start_date=None, end_date=None, columns=MEAL_SUMMARY_COLUMNS, page_size=MEAL_PAGE_SIZE):
+    """
+    Yields meals in (created_at, id) order, fetching one keyset page at a time.
+    Memory use is bounded by page_size however long the range is, and no rows
+    are lost to PostgREST's max-rows cap. Query errors are raised to the caller.
+    """
+    if not db: return
+    selected = {column.strip() for column in columns.split(',')}
+    if '*' not in selected:
+        missing = [column for column in ('id', 'created_at') if column not in selected]
+        if missing:
+            columns = ', '.join(missing + [columns])
+    last = None
+    while True:
+        query = db.table('meals').select(columns)
+        if user_id is not None:
+            query = query.eq('user_id', user_id)
+        if start_date is not None:
+            query = query.gte('created_at', datetime.datetime.combine(start_date, datetime.time.min).isoformat())
+        if end_date is not None:
+            query = query.lte('created_at', datetime.datetime.combine(end_date, datetime.time.max).isoformat())
+        if last is not None:
+            created_at, meal_id = last
+            query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt."{meal_id}")')
+        rows = query.order('created_at', desc=False).order('id', desc=False).limit(page_size).execute().data
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = (rows[-1]['created_at'], rows[-1]['id'])
+
+def _cached_meals(db: Client, user_id, start_date, end_date, columns):
+    """Meals for a user and date window, served from the user cache when possible."""
+    column_set = frozenset(column.strip() for column in columns.split(','))
+    key = (start_date, end_date, column_set)
+    hit, rows = _user_cache.get(user_id, 'meals', key)
+    if hit: return list(rows)
 
-def get_meals_today(db: Client, user_id):
+    if start_date == end_date:
+        # A single day can be cut out of an already-fetched wider window (e.g. the dashboard's 30 days)
+        window = _user_cache.find(user_id, 'meals', lambda k: k[0] <= start_date <= k[1] and ('*' in k[2] or column_set <= k[2]))
+        if window is not None:
+            return [row for row in window[1] if meal_day(row) == start_date]
+
+    rows = list(iter_meals(db, user_id, start_date, end_date, columns))
+    _user_cache.set(user_id, 'meals', key, rows)
+    return list(rows)
+
+@metrics.timed('db.get_meals_today', result_bytes=True)
+def get_meals_today(db: Client, user_id, columns=MEAL_SUMMARY_COLUMNS):
     """Fetches all meals logged by a user for the current day from Supabase."""
     if not db: return []
     try:
         today = datetime.datetime.utcnow().date()
-        start_of_day = datetime.datetime.combine(today, datetime.time.min).isoformat()
-        end_of_day = datetime.datetime.combine(today, datetime.time.max).isoformat()
-        response = db.table('meals').select("*").eq('user_id', user_id).gte('created_at', start_of_day).lte('created_at', end_of_day).order('created_at', desc=False).execute()
-        return response.data
+        return _cached_meals(db, user_id, today, today, columns)
     except Exception as e:
         print(f"❌ Error fetching today's meals from Supabase: {e}")
+        metrics.mark_error(e)
         return []
 
+@metrics.timed('db.get_user_profile', result_bytes=True)
 def get_user_profile(db: Client, user_id):
     """Fetches a user's profile from the 'profiles' table."""
     if not db: return None
+    hit, profile = _user_cache.get(user_id, 'profile', None)
+    if hit: return dict(profile) if profile is not None else None
     try:
         response = db.table('profiles').select("*").eq('id', user_id).single().execute()
-        return response.data
+        _user_cache.set(user_id, 'profile', None, response.data)
+        return dict(response.data) if response.data is not None else None
     except Exception:
         return None
 
+@metrics.timed('db.update_user_profile')
 def update_user_profile(db: Client, user_id, profile_data):
     """Creates or updates a user's profile."""
     if not db: return
     try:
         db.table('profiles').upsert({**profile_data, 'id': user_id}).execute()
+        _user_cache.invalidate(user_id, ('profile',))
         print(f"✅ Profile updated for user {user_id}")
     except Exception as e:
         print(f"❌ Error updating profile: {e}")
+        metrics.mark_error(e)
 
-def get_meals_for_date(db: Client, user_id, date):
+@metrics.timed('db.get_meals_for_date', result_bytes=True)
+def get_meals_for_date(db: Client, user_id, date, columns=MEAL_SUMMARY_COLUMNS):
     """Fetches all meals logged by a user for a specific date from Supabase."""
     if not db: return []
     try:
-        start_of_day = datetime.datetime.combine(date, datetime.time.min).isoformat()
-        end_of_day = datetime.datetime.combine(date, datetime.time.max).isoformat()
-        response = db.table('meals').select("*").eq('user_id', user_id).gte('created_at', start_of_day).lte('created_at', end_of_day).order('created_at', desc=False).execute()
-        return response.data
+        return _cached_meals(db, user_id, date, date, columns)
     except Exception as e:
         print(f"❌ Error fetching meals for date {date}: {e}")
+        metrics.mark_error(e)
         return []
 
-def get_meals_for_date_range(db: Client, user_id, start_date, end_date):
+@metrics.timed('db.get_meals_for_date_range', result_bytes=True)
+def get_meals_for_date_range(db: Client, user_id, start_date, end_date, columns=MEAL_SUMMARY_COLUMNS):
     """Fetches all meals for a user within a specific date range."""
     if not db: return []
     try:
-        start_iso = datetime.datetime.combine(start_date, datetime.time.min).isoformat()
-        end_iso = datetime.datetime.combine(end_date, datetime.time.max).isoformat()
-        response = db.table('meals').select("*").eq('user_id', user_id).gte('created_at', start_iso).lte('created_at', end_iso).execute()
-        return response.data
+        return _cached_meals(db, user_id, start_date, end_date, columns)
     except Exception as e:
         print(f"❌ Error fetching meals for date range: {e}")
+        metrics.mark_error(e)
         return []
 
+@metrics.timed('db.get_all_profiles')
+def get_all_profiles(db: Client, page_size=1000):
+    """Yields every row of the 'profiles' table, one page at a time."""
+    if not db: return
+    start = 0
+    while True:
+        try:
+            response = db.table('profiles').select("*").order('id').range(start, start + page_size - 1).execute()
+        except Exception as e:
+            print(f"❌ Error fetching profiles page at {start}: {e}")
+            return
+        yield from response.data
+        if len(response.data) < page_size:
+            return
+        start += page_size
+
+@metrics.timed('db.get_meal_totals_for_date_all_users', result_bytes=True)
+def get_meal_totals_for_date_all_users(db: Client, date):
+    """Sums calories/protein/carbs/fat per user for one day, across every user."""
+    totals = {}
+    if not db: return totals
+    try:
+        for meal in iter_meals(db, None, date, date, columns="id, created_at, user_id, calories, protein, carbs, fat"):
+            day = totals.setdefault(meal['user_id'], {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'meal_count': 0})
+            for key in ('calories', 'protein', 'carbs', 'fat'):
+                day[key] += meal.get(key) or 0
+            day['meal_count'] += 1
+    except Exception as e:
+        print(f"❌ Error fetching meal totals for {date}: {e}")
+        metrics.mark_error(e)
+    return totals
+
+@metrics.timed('db.save_daily_insights')
+def save_daily_insights(db: Client, rows):
+    """Upserts precomputed tips/summaries into the 'daily_insights' table."""
+    if not db or not rows: return
+    try:
+        db.table('daily_insights').upsert(rows, on_conflict='user_id,day').execute()
+        print(f"✅ Saved {len(rows)} daily insights")
+    except Exception as e:
+        print(f"❌ Error saving daily insights: {e}")
+        metrics.mark_error(e)
+
+@metrics.timed('db.get_daily_insight', result_bytes=True)
+def get_daily_insight(db: Client, user_id, date):
+    """Fetches the precomputed tip/summary for a user and day, or None."""
+    if not db: return None
+    try:
+        response = db.table('daily_insights').select("tip, summary").eq('user_id', user_id).eq('day', date.isoformat()).limit(1).execute()
+        return response.data[0] if response.data else None
+    except Exception as e:
+        print(f"❌ Error fetching daily insight: {e}")
+        metrics.mark_error(e)
+        return None
+
 # A simple wrapper function to keep the naming consistent across the app
 def init_database():
     return init_supabase()
\ No newline at end of file
@@ -0,0 +1,117 @@
+# detection_cache.py
+import os
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def content_hash(payload):
+    """Exact fingerprint of the encoded image bytes (the upload as received)."""
+    return hashlib.sha256(payload).hexdigest()
+
+
+def perceptual_hash(image):
+    """64-bit difference hash (dHash): survives re-encoding, resizing and small edits."""
+    small = image.convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return bits
+
+
+class DetectionCache:
+    def __init__(self, max_entries=256, ttl_seconds=24 * 3600, max_distance=6):
+        """
+        Cache of formatted detection results keyed by image content.
+
+        Exact re-uploads hit on the content hash; near-identical shots hit when
+        their perceptual hashes are within max_distance bits of a cached entry.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used is evicted.
+            ttl_seconds (int): How long a detection result stays valid.
+            max_distance (int): Hamming-distance threshold for a perceptual match (0 disables).
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def get_exact(self, exact_key):
+        """Returns a copy of the result cached for exactly these bytes, or None (not counted as a miss)."""
+        with self._lock:
+            self._drop_expired(time.time())
+            return self._exact_hit(exact_key)
+
+    def get(self, exact_key, phash):
+        """Returns a copy of the cached result dict, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            self._drop_expired(now)
+            result = self._exact_hit(exact_key)
+            if result is not None:
+                return result
+
+            if self.max_distance > 0:
+                best_key, best_distance = None, self.max_distance + 1
+                for key, (_, cached_phash, _) in self._entries.items():
+                    distance = bin(cached_phash ^ phash).count('1')
+                    if distance < best_distance:
+                        best_key, best_distance = key, distance
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.stats['near_hits'] += 1
+                    return copy.deepcopy(self._entries[best_key][2])
+
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, exact_key, phash, result):
+        with self._lock:
+            # Deep copies both ways: results hold nested lists and dicts that callers may edit
+            self._entries[exact_key] = (time.time(), phash, copy.deepcopy(result))
+            self._entries.move_to_end(exact_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def hit_rate(self):
+        hits = self.stats['hits'] + self.stats['near_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def _exact_hit(self, exact_key):
+        # Caller holds self._lock
+        entry = self._entries.get(exact_key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(exact_key)
+        self.stats['hits'] += 1
+        return copy.deepcopy(entry[2])
+
+    def _drop_expired(self, now):
+        # Entries are in LRU order, not insertion order, so check them all
+        expired = [key for key, (stored_at, _, _) in self._entries.items()
+                   if now - stored_at >= self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self.stats['expired'] += len(expired)
+
+
+def default_detection_cache():
+    """Builds a cache from DETECTION_CACHE_* environment settings."""
+    return DetectionCache(
+        max_entries=int(os.getenv('DETECTION_CACHE_SIZE', '256')),
+        ttl_seconds=int(os.getenv('DETECTION_CACHE_TTL', str(24 * 3600))),
+        max_distance=int(os.getenv('DETECTION_CACHE_MAX_DISTANCE', '6'))
+    )
@@ -0,0 +1 @@
+# fake_services: in-process stand-ins for the external providers, for offline runs
@@ -0,0 +1,136 @@
+# fake_services/base.py
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FaultProfile:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None):
+        """
+        Latency and error behaviour shared by every fake provider.
+
+        Args:
+            latency (float): Base delay per request, in seconds.
+            jitter (float): Extra uniform random delay, up to this many seconds.
+            error_rate (float): Fraction of requests that fail (0..1).
+            error_status (int): HTTP status returned for failed requests.
+            seed (int): Seed for reproducible runs.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        time.sleep(self.latency + extra)
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+class FakeHTTPServer:
+    """Runs a JSON-over-HTTP fake on 127.0.0.1 in a background thread."""
+
+    def __init__(self, faults=None):
+        self.faults = faults or FaultProfile()
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def handle(self, method, path, body, headers):
+        """Override: return (status, payload) where payload is a dict or an iterable of SSE chunks."""
+        raise NotImplementedError
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out as separate writes; without this, Nagle plus
+            # delayed ACKs add ~40 ms to every keep-alive request
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+                with fake._count_lock:
+                    fake.request_count += 1
+                fake.faults.delay()
+                if fake.faults.should_fail():
+                    self._send_json(fake.faults.error_status, {'error': 'injected failure'})
+                    return
+                status, payload = fake.handle(method, self.path, body, self.headers)
+                if payload is None or isinstance(payload, (dict, list, int, float)):
+                    self._send_json(status, payload)
+                else:
+                    self._send_events(status, payload)
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_events(self, status, chunks):
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in chunks:
+                    line = f"data: {chunk if isinstance(chunk, str) else json.dumps(chunk)}\n\n".encode('utf-8')
+                    self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PATCH(self):
+                self._dispatch('PATCH')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
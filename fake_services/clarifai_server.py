@@ -0,0 +1,85 @@
+# fake_services/clarifai_server.py
+import zlib
+import threading
+from concurrent import futures
+
+import grpc
+from clarifai_grpc.grpc.api import resources_pb2, service_pb2, service_pb2_grpc
+from clarifai_grpc.grpc.api.status import status_code_pb2, status_pb2
+
+from fake_services.base import FaultProfile
+
+FOODS = ('pizza', 'chicken biryani', 'caesar salad', 'paneer butter masala', 'sushi',
+         'cheeseburger', 'pad thai', 'masala dosa', 'ramen', 'pancakes', 'tacos', 'fried rice')
+
+
+def default_concepts(image_bytes):
+    """Deterministic top-3 concepts for an image, picked from its content checksum."""
+    seed = zlib.crc32(image_bytes)
+    picks = [FOODS[(seed + offset) % len(FOODS)] for offset in (0, 3, 7)]
+    return [(name, round(0.9 - 0.2 * rank, 2)) for rank, name in enumerate(picks)]
+
+
+class FakeClarifaiServicer(service_pb2_grpc.V2Servicer):
+    """PostModelOutputs that echoes each input id with canned food concepts."""
+
+    def __init__(self, faults=None, concepts=default_concepts):
+        self.faults = faults or FaultProfile()
+        self.concepts = concepts
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    def PostModelOutputs(self, request, context):
+        with self._count_lock:
+            self.request_count += 1
+        self.faults.delay()
+        if not any(key == 'authorization' for key, _ in context.invocation_metadata()):
+            return service_pb2.MultiOutputResponse(
+                status=status_pb2.Status(code=status_code_pb2.CONN_KEY_INVALID, description='Missing API key'))
+        if self.faults.should_fail():
+            return service_pb2.MultiOutputResponse(
+                status=status_pb2.Status(code=status_code_pb2.INTERNAL_UNCATEGORIZED, description='injected failure'))
+
+        outputs = []
+        for model_input in request.inputs:
+            outputs.append(resources_pb2.Output(
+                status=status_pb2.Status(code=status_code_pb2.SUCCESS),
+                input=resources_pb2.Input(id=model_input.id),
+                data=resources_pb2.Data(concepts=[
+                    resources_pb2.Concept(id=name.replace(' ', '-'), name=name, value=value)
+                    for name, value in self.concepts(model_input.data.image.base64)
+                ]),
+            ))
+        return service_pb2.MultiOutputResponse(status=status_pb2.Status(code=status_code_pb2.SUCCESS), outputs=outputs)
+
+
+class FakeClarifaiServer:
+    """Serves FakeClarifaiServicer over insecure gRPC on 127.0.0.1."""
+
+    def __init__(self, faults=None, max_workers=16):
+        self.servicer = FakeClarifaiServicer(faults)
+        self.max_workers = max_workers
+        self.port = None
+        self._server = None
+
+    @property
+    def request_count(self):
+        return self.servicer.request_count
+
+    def start(self):
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=self.max_workers))
+        service_pb2_grpc.add_V2Servicer_to_server(self.servicer, self._server)
+        self.port = self._server.add_insecure_port('127.0.0.1:0')
+        self._server.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop(grace=None)
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
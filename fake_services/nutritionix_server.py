@@ -0,0 +1,60 @@
+# fake_services/nutritionix_server.py
+import zlib
+
+from fake_services.base import FakeHTTPServer
+
+
+def default_food(query_item):
+    """Deterministic Nutritionix-style record for one '<serving> <food>' query item."""
+    words = query_item.split()
+    quantity = 1.0
+    if words:
+        try:
+            quantity = float(words[0])
+            words = words[1:]
+        except ValueError:
+            pass
+    if words and words[0] in ('serving', 'servings', 'cup', 'cups', 'bowl', 'plate', 'piece', 'pieces', 'g'):
+        words = words[1:]
+    name = ' '.join(words) or query_item
+    seed = zlib.crc32(name.lower().encode('utf-8'))
+    return {
+        'food_name': name.lower(),
+        'brand_name': None,
+        'serving_qty': quantity,
+        'serving_unit': 'serving',
+        'serving_weight_grams': 100.0 * quantity,
+        'nf_calories': round(quantity * (120 + seed % 480), 1),
+        'nf_total_fat': round(quantity * (seed % 300) / 10, 1),
+        'nf_saturated_fat': round(quantity * (seed % 90) / 10, 1),
+        'nf_cholesterol': round(quantity * (seed % 80), 1),
+        'nf_sodium': round(quantity * (seed % 900), 1),
+        'nf_total_carbohydrate': round(quantity * (seed // 7 % 700) / 10, 1),
+        'nf_dietary_fiber': round(quantity * (seed % 60) / 10, 1),
+        'nf_sugars': round(quantity * (seed // 3 % 200) / 10, 1),
+        'nf_protein': round(quantity * (seed // 11 % 400) / 10, 1),
+        'nf_potassium': round(quantity * (seed % 500), 1),
+        'photo': {'thumb': None},
+    }
+
+
+class FakeNutritionixServer(FakeHTTPServer):
+    """Nutritionix /v2/natural/nutrients endpoint: one food per comma-separated query item."""
+
+    def __init__(self, faults=None, food=default_food):
+        super().__init__(faults)
+        self.food = food
+
+    @property
+    def nutritionix_base_url(self):
+        return f"{self.base_url}/v2"
+
+    def handle(self, method, path, body, headers):
+        if method != 'POST' or not path.rstrip('/').endswith('/natural/nutrients'):
+            return 404, {'message': f'Unknown route {path}'}
+        if not headers.get('x-app-id') or not headers.get('x-app-key'):
+            return 401, {'message': 'unauthorized'}
+        items = [item.strip() for item in str(body.get('query', '')).split(',') if item.strip()]
+        if not items:
+            return 404, {'message': "We couldn't match any of your foods"}
+        return 200, {'foods': [self.food(item) for item in items]}
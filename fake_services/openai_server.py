@@ -0,0 +1,66 @@
+# fake_services/openai_server.py
+import time
+import itertools
+
+from fake_services.base import FakeHTTPServer
+
+ADVICE_REPLY = (
+    "**HEALTHY SWAP:** Try a smaller portion with extra salad. 🥗\n"
+    "**DIET TIP:** Add a protein side to stay full longer.\n"
+    "**PORTION ADVICE:** One plate is plenty.\n"
+    "**MOTIVATION:** You're doing amazing, pookie! 🌸"
+)
+
+
+def default_reply(messages):
+    """Canned, deterministic reply shaped like what each GPTAdvisor prompt expects."""
+    prompt = messages[-1]['content'] if messages else ''
+    if 'HEALTHY SWAP' in prompt:
+        return ADVICE_REPLY
+    if 'daily health tip' in prompt:
+        return "Drink a glass of water before every meal today! 💧"
+    if 'Yesterday they logged' in prompt:
+        return "You kept things balanced yesterday. Keep the protein coming today! 💪"
+    return "Here's a cute, healthy idea: Greek yogurt with berries! 🍓"
+
+
+class FakeOpenAIServer(FakeHTTPServer):
+    """OpenAI-compatible /v1/chat/completions endpoint, with optional streaming."""
+
+    def __init__(self, faults=None, reply=default_reply):
+        super().__init__(faults)
+        self.reply = reply
+        self._ids = itertools.count(1)
+
+    @property
+    def openai_base_url(self):
+        return f"{self.base_url}/v1"
+
+    def handle(self, method, path, body, headers):
+        if method != 'POST' or not path.rstrip('/').endswith('/chat/completions'):
+            return 404, {'error': {'message': f'Unknown route {path}'}}
+
+        text = self.reply(body.get('messages', []))
+        completion_id = f"chatcmpl-fake-{next(self._ids)}"
+        created = int(time.time())
+        model = body.get('model', 'gpt-4o-mini')
+
+        if body.get('stream'):
+            def chunks():
+                for word in text.split(' '):
+                    yield {
+                        'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]
+                    }
+                yield {
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                    'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+                }
+                yield '[DONE]'
+            return 200, chunks()
+
+        return 200, {
+            'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }
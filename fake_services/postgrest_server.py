@@ -0,0 +1,270 @@
+# fake_services/postgrest_server.py
+import datetime
+import itertools
+import threading
+from urllib.parse import urlsplit, parse_qsl
+
+from fake_services.base import FakeHTTPServer
+
+# Columns that must be unique per table, as in the real schema (see migrations/)
+UNIQUE_KEYS = {
+    'meals': (('id',), ('idempotency_key',)),
+    'profiles': (('id',),),
+    'daily_insights': (('user_id', 'day'),),
+    'daily_nutrition_rollups': (('user_id', 'day'),),
+}
+ROLLUP_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'meal_count')
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+
+def _split_top_level(text):
+    """Split on commas that aren't inside parentheses or double quotes."""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == ',' and depth == 0 and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value):
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _compare(left, right):
+    """Order a stored value against a filter string, numerically when the column is numeric."""
+    if isinstance(left, (int, float)) and not isinstance(left, bool):
+        right = float(right)
+    else:
+        left = str(left)
+    return (left > right) - (left < right)
+
+
+def _condition(column, operator, value):
+    value = _unquote(value)
+    if operator == 'in':
+        options = {_unquote(v) for v in _split_top_level(value.strip('()'))}
+        return lambda row: str(row.get(column)) in options
+    if operator == 'is':
+        return lambda row: row.get(column) is None if value == 'null' else str(row.get(column)).lower() == value
+    checks = {
+        'eq': lambda c: c == 0, 'neq': lambda c: c != 0, 'gt': lambda c: c > 0,
+        'gte': lambda c: c >= 0, 'lt': lambda c: c < 0, 'lte': lambda c: c <= 0,
+    }
+    check = checks[operator]
+    return lambda row: row.get(column) is not None and check(_compare(row.get(column), value))
+
+
+def _logic_tree(expression):
+    """Parse an or=(...)/and(...) expression into a row predicate."""
+    expression = expression.strip()
+    for joiner, combine in (('or', any), ('and', all)):
+        if expression.startswith(joiner + '(') and expression.endswith(')'):
+            parts = [_logic_tree(part) for part in _split_top_level(expression[len(joiner) + 1:-1])]
+            return lambda row, parts=parts, combine=combine: combine(part(row) for part in parts)
+    column, operator, value = expression.split('.', 2)
+    return _condition(column, operator, value)
+
+
+class FakePostgRESTServer(FakeHTTPServer):
+    """
+    In-memory PostgREST at /rest/v1 covering what database.py uses: select
+    with eq/neq/gt/gte/lt/lte/in/is and or/and filters, order, limit/offset
+    and Range paging, single-object reads, insert/upsert (merge or ignore
+    duplicates), update, delete, the meals insert trigger that keeps
+    daily_nutrition_rollups current, and the rollup backfill RPC.
+    Timestamps are compared as ISO strings, which is enough for date ranges.
+    Like Supabase's default, a read returns at most max_rows rows.
+    """
+
+    def __init__(self, faults=None, max_rows=1000):
+        super().__init__(faults)
+        self.max_rows = max_rows
+        self.tables = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.rpcs = {
+            'rebuild_daily_rollups': self._rebuild_daily_rollups,
+        }
+
+    @property
+    def supabase_url(self):
+        return self.base_url
+
+    def seed(self, table, rows):
+        """Insert rows directly, filling ids and timestamps like the database would."""
+        with self._lock:
+            stored = self.tables.setdefault(table, [])
+            for row in rows:
+                stored.append(self._with_defaults(table, dict(row)))
+
+    def handle(self, method, path, body, headers):
+        parts = urlsplit(path)
+        route = parts.path.rstrip('/')
+        if not route.startswith('/rest/v1/'):
+            return 404, {'message': f'Unknown route {route}'}
+        name = route[len('/rest/v1/'):]
+        params = parse_qsl(parts.query, keep_blank_values=True)
+
+        with self._lock:
+            if name.startswith('rpc/'):
+                handler = self.rpcs.get(name[len('rpc/'):])
+                if handler is None:
+                    return 404, {'code': 'PGRST202', 'message': f'Could not find the function {name}'}
+                return 200, handler(body)
+            if method == 'GET':
+                return self._select(name, params, headers)
+            if method == 'POST':
+                return self._insert(name, params, body, headers)
+            if method == 'PATCH':
+                return self._update(name, params, body)
+            if method == 'DELETE':
+                return self._delete(name, params)
+        return 405, {'message': f'{method} not supported'}
+
+    def _filters(self, params):
+        predicates = []
+        for key, value in params:
+            if key in RESERVED_PARAMS:
+                continue
+            if key in ('or', 'and'):
+                predicates.append(_logic_tree(f'{key}{value}'))
+            else:
+                operator, _, operand = value.partition('.')
+                predicates.append(_condition(key, operator, operand))
+        return lambda row: all(predicate(row) for predicate in predicates)
+
+    def _select(self, table, params, headers):
+        query = dict(params)
+        rows = [row for row in self.tables.get(table, []) if self._filters(params)(row)]
+        for clause in reversed(_split_top_level(query.get('order', ''))):
+            column, *options = clause.split('.')
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else 0),
+                      reverse='desc' in options)
+
+        start = int(query.get('offset', 0))
+        if headers.get('Range'):
+            first, _, last = headers['Range'].partition('-')
+            start = int(first)
+            rows = rows[:int(last) + 1] if last else rows
+        if 'limit' in query:
+            rows = rows[start:start + int(query['limit'])]
+        else:
+            rows = rows[start:]
+        rows = rows[:self.max_rows]
+
+        columns = [column.strip() for column in query.get('select', '*').split(',') if column.strip()]
+        if '*' not in columns:
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        else:
+            rows = [dict(row) for row in rows]
+
+        if 'vnd.pgrst.object' in headers.get('Accept', ''):
+            if len(rows) != 1:
+                return 406, {'code': 'PGRST116', 'message': 'JSON object requested, multiple (or no) rows returned',
+                             'details': f'The result contains {len(rows)} rows', 'hint': None}
+            return 200, rows[0]
+        return 200, rows
+
+    def _insert(self, table, params, body, headers):
+        query = dict(params)
+        prefer = headers.get('Prefer', '')
+        merge = 'resolution=merge-duplicates' in prefer
+        ignore = 'resolution=ignore-duplicates' in prefer
+        conflict_columns = tuple(c.strip() for c in query['on_conflict'].split(',')) if query.get('on_conflict') else None
+        stored = self.tables.setdefault(table, [])
+
+        written, inserted = [], []
+        for row in (body if isinstance(body, list) else [body]):
+            existing = self._conflict(table, row, conflict_columns)
+            if existing is not None:
+                if ignore:
+                    continue
+                if not merge:
+                    return 409, {'code': '23505', 'message': 'duplicate key value violates unique constraint'}
+                existing.update(row)
+                written.append(dict(existing))
+                continue
+            row = self._with_defaults(table, dict(row))
+            stored.append(row)
+            inserted.append(row)
+            written.append(dict(row))
+        if table == 'meals':
+            self._add_meals_to_rollups(inserted)
+        return 201, written if 'return=representation' in prefer or not prefer else []
+
+    def _update(self, table, params, body):
+        matches = self._filters(params)
+        updated = []
+        for row in self.tables.get(table, []):
+            if matches(row):
+                row.update(body)
+                updated.append(dict(row))
+        return 200, updated
+
+    def _delete(self, table, params):
+        matches = self._filters(params)
+        kept, deleted = [], []
+        for row in self.tables.get(table, []):
+            (deleted if matches(row) else kept).append(row)
+        self.tables[table] = kept
+        return 200, deleted
+
+    def _conflict(self, table, row, conflict_columns):
+        keys = (conflict_columns,) if conflict_columns else UNIQUE_KEYS.get(table, (('id',),))
+        for key in keys:
+            if any(row.get(column) is None for column in key):
+                continue
+            for existing in self.tables.get(table, []):
+                if all(existing.get(column) == row[column] for column in key):
+                    return existing
+        return None
+
+    def _with_defaults(self, table, row):
+        if table == 'meals':
+            row.setdefault('id', next(self._ids))
+            row.setdefault('created_at', datetime.datetime.now(datetime.timezone.utc).isoformat())
+        return row
+
+    def _add_meals_to_rollups(self, meals):
+        # Stands in for the meals insert trigger (migrations/004_daily_rollup_trigger.sql)
+        rollups = self.tables.setdefault('daily_nutrition_rollups', [])
+        for meal in meals:
+            day = str(meal['created_at'])[:10]
+            for row in rollups:
+                if row['user_id'] == meal['user_id'] and row['day'] == day:
+                    break
+            else:
+                row = {'user_id': meal['user_id'], 'day': day, **dict.fromkeys(ROLLUP_FIELDS, 0)}
+                rollups.append(row)
+            for field in ROLLUP_FIELDS[:-1]:
+                row[field] += meal.get(field) or 0
+            row['meal_count'] += 1
+
+    def _rebuild_daily_rollups(self, args):
+        user_id = args.get('p_user_id')
+        totals = {}
+        for meal in self.tables.get('meals', []):
+            if user_id is not None and meal['user_id'] != user_id:
+                continue
+            key = (meal['user_id'], str(meal['created_at'])[:10])
+            day = totals.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+            for field in ROLLUP_FIELDS[:-1]:
+                day[field] += meal.get(field) or 0
+            day['meal_count'] += 1
+        kept = [row for row in self.tables.get('daily_nutrition_rollups', [])
+                if user_id is not None and row['user_id'] != user_id]
+        self.tables['daily_nutrition_rollups'] = kept + [
+            {'user_id': key[0], 'day': key[1], **day} for key, day in totals.items()
+        ]
+        return len(totals)
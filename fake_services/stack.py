@@ -0,0 +1,78 @@
+# fake_services/stack.py
+import os
+
+from fake_services.base import FaultProfile
+from fake_services.clarifai_server import FakeClarifaiServer
+from fake_services.nutritionix_server import FakeNutritionixServer
+from fake_services.openai_server import FakeOpenAIServer
+from fake_services.postgrest_server import FakePostgRESTServer
+
+
+class FakeProviderStack:
+    """
+    Every provider stand-in started together, with the environment pointed at
+    them while the stack is running (and restored afterwards). Clients built
+    inside the with-block (FoodDetector, NutritionAPI, GPTAdvisor) talk to the fakes.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        def faults(offset):
+            return FaultProfile(latency, jitter, error_rate, seed=None if seed is None else seed + offset)
+
+        self.clarifai = FakeClarifaiServer(faults(0))
+        self.nutritionix = FakeNutritionixServer(faults(1))
+        self.openai = FakeOpenAIServer(faults(2))
+        self.postgrest = FakePostgRESTServer(faults(3))
+        self._saved_env = {}
+
+    @property
+    def env(self):
+        return {
+            'CLARIFAI_PAT': 'fake-pat',
+            'CLARIFAI_GRPC_BASE': '127.0.0.1',
+            'CLARIFAI_GRPC_INSECURE_PORT': str(self.clarifai.port),
+            'NUTRITIONIX_BASE_URL': self.nutritionix.nutritionix_base_url,
+            'NUTRITIONIX_APP_ID': 'fake-app-id',
+            'NUTRITIONIX_APP_KEY': 'fake-app-key',
+            'OPENAI_BASE_URL': self.openai.openai_base_url,
+            'OPENAI_API_KEY': 'fake-key',
+            'SUPABASE_URL': self.postgrest.supabase_url,
+            'SUPABASE_KEY': 'fake-key',
+            'SUPABASE_SERVICE_KEY': 'fake-key',
+        }
+
+    def request_counts(self):
+        return {
+            'clarifai': self.clarifai.request_count,
+            'nutritionix': self.nutritionix.request_count,
+            'openai': self.openai.request_count,
+            'postgrest': self.postgrest.request_count,
+        }
+
+    def database(self):
+        from supabase import create_client
+        return create_client(self.postgrest.supabase_url, 'fake-key')
+
+    def start(self):
+        for server in (self.clarifai, self.nutritionix, self.openai, self.postgrest):
+            server.start()
+        for key, value in self.env.items():
+            self._saved_env[key] = os.environ.get(key)
+            os.environ[key] = value
+        return self
+
+    def stop(self):
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        self._saved_env = {}
+        for server in (self.clarifai, self.nutritionix, self.openai, self.postgrest):
+            server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -10,12 +10,24 @@ from clarifai_grpc.channel.clarifai_channel import ClarifaiChannel
 from clarifai_grpc.grpc.api import resources_pb2, service_pb2, service_pb2_grpc
 from clarifai_grpc.grpc.api.status import status_code_pb2
 
+from food_normalizer import normalize_food_name
+from image_preprocessing import prepare_image, read_image_bytes
+from detection_cache import content_hash, default_detection_cache
+from resilience import CircuitOpenError, get_guard
+import metrics
+
 # Load environment variables
 load_dotenv()
 
 class FoodDetector:
     def __init__(self):
         """Initialize the Clarifai food detection model"""
+        # Shared across sessions: re-uploads and near-identical shots skip the API call
+        self.cache = default_detection_cache()
+        
+        # Shared deadline and circuit breaker for PostModelOutputs
+        self.guard = get_guard('clarifai', is_failure=_is_upstream_failure)
+        
         self.pat = os.getenv('CLARIFAI_PAT')
         if not self.pat:
             print("❌ Clarifai PAT (Personal Access Token) not found in .env file!")
@@ -28,8 +40,16 @@ class FoodDetector:
         self.model_id = 'food-item-recognition'
         self.model_version_id = '1d5fd481e0cf4826aa72ec3ff049e044'
         
+        # Inputs per PostModelOutputs call in detect_food_batch
+        self.batch_size = int(os.getenv('CLARIFAI_BATCH_SIZE', '32'))
+        
         try:
-            channel = ClarifaiChannel.get_grpc_channel()
+            # CLARIFAI_GRPC_BASE plus an insecure port points the detector at a local servicer
+            insecure_port = os.getenv('CLARIFAI_GRPC_INSECURE_PORT')
+            if insecure_port:
+                channel = ClarifaiChannel.get_insecure_grpc_channel(port=int(insecure_port))
+            else:
+                channel = ClarifaiChannel.get_grpc_channel()
             self.stub = service_pb2_grpc.V2Stub(channel)
             self.model_loaded = True
             print("✅ Clarifai Food Detector initialized successfully!")
@@ -37,84 +57,236 @@ class FoodDetector:
             print(f"❌ Error initializing Clarifai: {e}")
             self.model_loaded = False
 
+    @metrics.timed('clarifai.detect_food')
     def detect_food(self, image):
         """
         Detect food items from an image using the Clarifai API.
         
         Args:
-            image: PIL Image object.
+            image: PIL Image, raw image bytes or an uploaded file object.
             
         Returns:
             dict: The same format as your old detector for compatibility.
         """
         if not self.model_loaded:
-            return {
-                'success': False,
-                'error': 'Clarifai Food Detector is not initialized. Check your API Key (PAT) in .env file.'
-            }
+            return self._not_loaded_error()
 
         try:
-            # Convert PIL image to bytes
-            buffered = BytesIO()
-            image.save(buffered, format="JPEG")
-            image_bytes = buffered.getvalue()
-
-            post_model_outputs_response = self.stub.PostModelOutputs(
-                service_pb2.PostModelOutputsRequest(
-                    user_app_id=resources_pb2.UserAppIDSet(user_id=self.user_id, app_id=self.app_id),
-                    model_id=self.model_id,
-                    version_id=self.model_version_id,
-                    inputs=[
-                        resources_pb2.Input(
-                            data=resources_pb2.Data(
-                                image=resources_pb2.Image(
-                                    base64=image_bytes
-                                )
-                            )
-                        )
-                    ]
-                ),
-                metadata=(('authorization', 'Key ' + self.pat),)
-            )
-
-            if post_model_outputs_response.status.code != status_code_pb2.SUCCESS:
-                raise Exception("Post model outputs failed, status: " + post_model_outputs_response.status.description)
-
-            # Parse the results
-            output = post_model_outputs_response.outputs[0]
-            concepts = output.data.concepts
-            
-            if not concepts:
-                return {'success': False, 'error': 'No food items were detected in the image.'}
+            # An exact re-upload is answered from its raw bytes, before any decoding
+            raw = read_image_bytes(image)
+            if raw is not None:
+                cached = self.cache.get_exact(content_hash(raw))
+                if cached is not None:
+                    return cached
+                image = raw
 
-            # Format the output to be identical to your old detector
-            top_result = concepts[0]
-            food_name = self.clean_food_name(top_result.name)
-            confidence = top_result.value
+            # Downscale and re-encode (or pass small JPEGs through) before upload
+            prepared = self._prepare(image)
+            cached = self.cache.get(prepared['exact_key'], prepared['phash'])
+            if cached is not None:
+                return cached
 
-            alternatives = [
-                {'name': self.clean_food_name(c.name), 'confidence': c.value}
-                for c in concepts[1:3] # Get the next two alternatives
-            ]
+            response = self._post_inputs([prepared['bytes']])
+            if response.status.code != status_code_pb2.SUCCESS:
+                raise Exception("Post model outputs failed, status: " + response.status.description)
 
-            return {
-                'success': True,
-                'food_name': food_name,
-                'confidence': confidence,
-                'alternatives': alternatives,
-                'error': None
-            }
+            result = self._format_output(response.outputs[0], prepared)
+            if result['success']:
+                self.cache.set(prepared['exact_key'], prepared['phash'], result)
+            return result
 
+        except CircuitOpenError as e:
+            return self._unavailable_error(e)
         except Exception as e:
             print(f"❌ Clarifai detection error: {str(e)}")
+            metrics.mark_error(e)
             return {
                 'success': False,
                 'error': f'Error during AI food detection: {str(e)}. Please try again.'
             }
 
+    @metrics.timed('clarifai.detect_food_batch')
+    def detect_food_batch(self, images, batch_size=None):
+        """
+        Detect food in many images, sending up to batch_size inputs per request.
+        
+        Args:
+            images (list): PIL Images, raw image bytes or uploaded file objects.
+            batch_size (int): Inputs per PostModelOutputs call (defaults to self.batch_size).
+            
+        Returns:
+            list: One detect_food-style result dict per image, in input order.
+        """
+        if not self.model_loaded:
+            return [self._not_loaded_error() for _ in images]
+
+        results = [None] * len(images)
+        prepared_items = []
+        for index, image in enumerate(images):
+            try:
+                prepared_items.append((index, self._prepare(image)))
+            except Exception as e:
+                results[index] = {'success': False, 'error': f'Could not read image: {str(e)}'}
+
+        self._detect_prepared(prepared_items, results, batch_size or self.batch_size)
+        return results
+
+    @metrics.timed('clarifai.detect_prepared_batch')
+    def detect_prepared_batch(self, prepared_items, batch_size=None):
+        """
+        Same as detect_food_batch for images that already went through
+        prepare_image, e.g. in a separate preprocessing process.
+        
+        Args:
+            prepared_items (list): prepare_image results ('image' may be dropped).
+            batch_size (int): Inputs per PostModelOutputs call (defaults to self.batch_size).
+            
+        Returns:
+            list: One detect_food-style result dict per item, in input order.
+        """
+        if not self.model_loaded:
+            return [self._not_loaded_error() for _ in prepared_items]
+
+        results = [None] * len(prepared_items)
+        self._detect_prepared(list(enumerate(prepared_items)), results, batch_size or self.batch_size)
+        return results
+
+    def _detect_prepared(self, prepared_items, results, batch_size):
+        """Fill results[index] for each (index, prepared) pair from the cache or the API"""
+        pending = []
+        for index, prepared in prepared_items:
+            cached = self.cache.get(prepared['exact_key'], prepared['phash'])
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append((index, prepared))
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            try:
+                response = self._post_inputs([prepared['bytes'] for _, prepared in chunk],
+                                             input_ids=[f"input-{index}" for index, _ in chunk])
+                if response.status.code not in (status_code_pb2.SUCCESS, status_code_pb2.MIXED_STATUS):
+                    raise Exception("Post model outputs failed, status: " + response.status.description)
+            except CircuitOpenError as e:
+                for index, _ in chunk:
+                    results[index] = self._unavailable_error(e)
+                continue
+            except Exception as e:
+                print(f"❌ Clarifai batch detection error: {str(e)}")
+                metrics.mark_error(e)
+                for index, _ in chunk:
+                    results[index] = {
+                        'success': False,
+                        'error': f'Error during AI food detection: {str(e)}. Please try again.'
+                    }
+                continue
+
+            # Map outputs back by input id, falling back to position
+            outputs_by_id = {output.input.id: output for output in response.outputs if output.input.id}
+            for position, (index, prepared) in enumerate(chunk):
+                output = outputs_by_id.get(f"input-{index}")
+                if output is None and position < len(response.outputs):
+                    output = response.outputs[position]
+                if output is None:
+                    results[index] = {'success': False, 'error': 'No output returned for this image.'}
+                elif output.status.code and output.status.code != status_code_pb2.SUCCESS:
+                    results[index] = {'success': False, 'error': f'Detection failed: {output.status.description}'}
+                else:
+                    results[index] = self._format_output(output, prepared)
+                    if results[index]['success']:
+                        self.cache.set(prepared['exact_key'], prepared['phash'], results[index])
+
+    def _not_loaded_error(self):
+        return {
+            'success': False,
+            'error': 'Clarifai Food Detector is not initialized. Check your API Key (PAT) in .env file.'
+        }
+
+    def _unavailable_error(self, error):
+        # The Log Meal page offers manual entry when it sees service_unavailable
+        return {
+            'success': False,
+            'service_unavailable': True,
+            'error': f'Photo recognition is paused while Clarifai recovers ({error}).'
+        }
+
+    def _prepare(self, image):
+        """Preprocess an image and compute its cache keys"""
+        return prepare_image(image)
+
+    def _post_inputs(self, payloads, input_ids=None):
+        """Send one PostModelOutputs request carrying every payload as a separate input"""
+        input_ids = input_ids or [''] * len(payloads)
+        response = self.guard.call(
+            self.stub.PostModelOutputs,
+            service_pb2.PostModelOutputsRequest(
+                user_app_id=resources_pb2.UserAppIDSet(user_id=self.user_id, app_id=self.app_id),
+                model_id=self.model_id,
+                version_id=self.model_version_id,
+                inputs=[
+                    resources_pb2.Input(
+                        id=input_id,
+                        data=resources_pb2.Data(
+                            image=resources_pb2.Image(
+                                base64=payload
+                            )
+                        )
+                    )
+                    for payload, input_id in zip(payloads, input_ids)
+                ]
+            ),
+            metadata=(('authorization', 'Key ' + self.pat),),
+            timeout=self.guard.deadline
+        )
+        if metrics.ENABLED:
+            metrics.add_payload(bytes_in=response.ByteSize(), bytes_out=sum(len(payload) for payload in payloads))
+        return response
+
+    def _format_output(self, output, prepared):
+        """Turn one Clarifai output into the detector's result dict"""
+        concepts = output.data.concepts
+        
+        if not concepts:
+            return {'success': False, 'error': 'No food items were detected in the image.'}
+
+        # Format the output to be identical to your old detector
+        top_result = concepts[0]
+        food_name = self.clean_food_name(top_result.name)
+        confidence = top_result.value
+
+        # Get the next two alternatives that don't normalize to an already-listed dish
+        alternatives = []
+        seen_names = {food_name}
+        for c in concepts[1:]:
+            alt_name = self.clean_food_name(c.name)
+            if alt_name in seen_names:
+                continue
+            seen_names.add(alt_name)
+            alternatives.append({'name': alt_name, 'confidence': c.value})
+            if len(alternatives) == 2:
+                break
+
+        return {
+            'success': True,
+            'food_name': food_name,
+            'confidence': confidence,
+            'alternatives': alternatives,
+            'image_stats': {k: prepared[k] for k in ('width', 'height', 'original_bytes', 'payload_bytes', 'passthrough')},
+            'error': None
+        }
+
     def clean_food_name(self, food_name):
-        """Cleans the food name from the API."""
-        return ' '.join(word.capitalize() for word in food_name.split())
+        """Cleans the food name from the API using the same normalizer as NutritionAPI."""
+        return ' '.join(word.capitalize() for word in normalize_food_name(food_name).split())
+
+def _is_upstream_failure(outcome):
+    """gRPC errors (deadline exceeded included) and Clarifai's internal/throttling statuses"""
+    if isinstance(outcome, Exception):
+        return True
+    status = status_code_pb2.StatusCode.DESCRIPTOR.values_by_number.get(outcome.status.code)
+    name = status.name if status is not None else ''
+    return any(marker in name for marker in ('INTERNAL', 'THROTTLED', 'BUSY', 'UNAVAILABLE', 'TIMEOUT'))
 
 # Test function to make sure it works
 def test_clarifai_detector():
@@ -0,0 +1,198 @@
+# food_normalizer.py
+import os
+import csv
+import threading
+from collections import defaultdict, deque
+
+DEFAULT_ALIAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'food_aliases.csv')
+
+# Words that may sit around an alias without changing the dish ("a bowl of dal")
+FILLER_WORDS = {'a', 'an', 'the', 'of', 'plate', 'bowl', 'cup', 'glass', 'serving', 'portion',
+                'piece', 'pieces', 'slice', 'slices', 'homemade', 'fresh', 'food', 'dish'}
+# Shorter names are too close to each other ("dahl"/"dahi", "idle"/"idli") to guess at
+MIN_FUZZY_LENGTH = 5
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b):
+    """Levenshtein distance, counting a swap of neighbouring letters as one edit"""
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+def _max_typos(alias):
+    """Edits a fuzzy match may need: one per six letters, at least one"""
+    return max(1, len(alias) // 6)
+
+
+class FoodNameNormalizer:
+    def __init__(self, alias_path=DEFAULT_ALIAS_PATH, typo_threshold=0.6):
+        """
+        Maps raw food names onto canonical dish names.
+
+        Exact aliases are found with an Aho-Corasick automaton (longest match
+        wins); names with no exact alias fall back to a character-trigram index
+        so small typos like "biriyani" still resolve. Either way the alias has
+        to cover the whole name apart from filler words, so "curd rice" is not
+        collapsed into "curd".
+
+        Args:
+            alias_path (str): CSV file with alias,canonical columns.
+            typo_threshold (float): Minimum trigram Dice similarity for a fuzzy candidate;
+                candidates must also be within a few edits of the name.
+        """
+        self.alias_path = alias_path
+        self.typo_threshold = typo_threshold
+        self.aliases = {}
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        # Trigram postings, split by alias word count
+        self._postings = defaultdict(lambda: defaultdict(list))
+        self._alias_trigrams = {}
+        self._load()
+        self._build_automaton()
+        self._build_ngram_index()
+
+    def normalize(self, food_name):
+        """
+        Clean a food name and map it onto its canonical dish name.
+
+        Args:
+            food_name (str): Raw food name from image detection or the user
+
+        Returns:
+            str: Canonical name (lowercase) if an alias matched, otherwise the cleaned name
+        """
+        cleaned = self.clean(food_name)
+        lowered = cleaned.lower()
+        alias = self._longest_exact_match(lowered)
+        if alias is None:
+            core = ' '.join(word for word in lowered.split() if word not in FILLER_WORDS)
+            alias = self._closest_alias(core or lowered)
+        return self.aliases[alias] if alias else cleaned
+
+    @staticmethod
+    def clean(food_name):
+        """Remove underscores, dashes, bare numbers and extra spaces"""
+        cleaned = str(food_name).replace('_', ' ').replace('-', ' ')
+        return ' '.join(word for word in cleaned.split() if not word.isdigit())
+
+    def _longest_exact_match(self, text):
+        """Scan text once; return the longest whole-word alias if only filler words are left around it"""
+        best, best_key = None, None
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for alias in self._output[state]:
+                start = end - len(alias)
+                if (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' '):
+                    key = (-len(alias), start, alias)
+                    if best_key is None or key < best_key:
+                        best, best_key = alias, key
+        if best is None:
+            return None
+        start = best_key[1]
+        # One word of a longer dish ("roti" in "roti canai") names a different food
+        rest = (text[:start] + ' ' + text[start + len(best):]).split()
+        return best if all(word in FILLER_WORDS for word in rest) else None
+
+    def _closest_alias(self, text):
+        """Typo-tolerant fallback: the nearest alias with the same word count as the whole name"""
+        if len(text) < MIN_FUZZY_LENGTH:
+            return None
+        grams = _trigrams(text)
+        shared = defaultdict(int)
+        # Postings are split by word count so a typo in one word can't match a longer dish
+        for gram in grams:
+            for alias in self._postings.get(len(text.split()), {}).get(gram, ()):
+                shared[alias] += 1
+        best, best_key = None, None
+        for alias, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._alias_trigrams[alias]))
+            if score < self.typo_threshold or _edit_distance(text, alias) > _max_typos(alias):
+                continue
+            key = (-score, -len(alias), alias)
+            if best_key is None or key < best_key:
+                best, best_key = alias, key
+        return best
+
+    def _load(self):
+        try:
+            with open(self.alias_path, newline='', encoding='utf-8') as f:
+                for record in csv.DictReader(f):
+                    alias = ' '.join(record['alias'].lower().split())
+                    canonical = ' '.join(record['canonical'].lower().split())
+                    if alias and canonical:
+                        self.aliases[alias] = canonical
+        except (OSError, KeyError) as e:
+            print(f"⚠️ Food alias table could not be loaded: {e}")
+
+    def _build_automaton(self):
+        for alias in sorted(self.aliases):
+            state = 0
+            for char in alias:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(alias)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _build_ngram_index(self):
+        for alias in sorted(self.aliases):
+            grams = _trigrams(alias)
+            self._alias_trigrams[alias] = grams
+            for gram in grams:
+                self._postings[len(alias.split())][gram].append(alias)
+
+
+_default_normalizer = None
+_default_lock = threading.Lock()
+_memo = {}
+
+
+def get_normalizer():
+    """Returns the process-wide normalizer built from NUTRILENS_FOOD_ALIASES."""
+    global _default_normalizer
+    if _default_normalizer is None:
+        with _default_lock:
+            if _default_normalizer is None:
+                _default_normalizer = FoodNameNormalizer(os.getenv('NUTRILENS_FOOD_ALIASES', DEFAULT_ALIAS_PATH))
+    return _default_normalizer
+
+
+def normalize_food_name(food_name):
+    """Shared entry point used by NutritionAPI and FoodDetector so their names line up."""
+    result = _memo.get(food_name)
+    if result is None:
+        result = get_normalizer().normalize(food_name)
+        if len(_memo) < 10000:
+            _memo[food_name] = result
+    return result
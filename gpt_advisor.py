@@ -1,41 +1,169 @@
 # gpt_advisor.py
 import os
+import datetime
 from dotenv import load_dotenv
+import openai
 from openai import OpenAI
 
+from completion_cache import default_completion_cache, make_completion_key
+from conversation_memory import estimate_tokens, format_meal_history
+from resilience import CircuitOpenError, get_guard
+import metrics
+
 # Load environment variables
 load_dotenv()
 
+BUSY_CHAT_REPLY = "My AI brain is a little overloaded right now, pookie! 😴 Give me a minute and ask again. 💕"
+
 class GPTAdvisor:
-    def __init__(self):
+    MODEL = "gpt-4o-mini"
+    
+    def __init__(self, cache=None):
         """Initialize OpenAI GPT advisor"""
         self.api_key = os.getenv('OPENAI_API_KEY')
         
+        # Completion cache shared by every method; pass use_cache=False to bypass it per call
+        self.cache = cache if cache is not None else default_completion_cache()
+        
+        # Shared circuit breaker; its deadline bounds each request instead of the SDK's 10 minute default
+        self.guard = get_guard('openai', is_failure=_is_upstream_failure)
+        
         if not self.api_key:
             print("⚠️ OpenAI API key not found! Please add OPENAI_API_KEY to your .env file")
             self.client = None
         else:
-            self.client = OpenAI(api_key=self.api_key)
+            # The SDK's timeout is per attempt, so split the deadline across the retries
+            max_retries = int(os.getenv('OPENAI_MAX_RETRIES', '1'))
+            timeout = self.guard.deadline / (max_retries + 1) if self.guard.deadline else None
+            self.client = OpenAI(api_key=self.api_key, timeout=timeout, max_retries=max_retries)
             print("✅ GPT Advisor initialized!")
     
     # --- THIS IS THE NEW FUNCTION WE ARE ADDING ---
-    def get_chat_suggestion(self, meal_history, user_profile, user_query):
-        """Generates a conversational response based on meal history."""
+    @metrics.timed('openai.get_chat_suggestion')
+    def get_chat_suggestion(self, meal_history, user_profile, user_query, use_cache=True, memory=None):
+        """Generates a conversational response based on meal history and, if given, a ConversationMemory."""
         if not self.client:
             return "Sorry, my AI brain is taking a little nap! 😴 Please check the API keys."
 
-        history_str = ""
-        total_calories = 0
-        if meal_history:
-            history_str = "So far today, you have logged:\n"
-            for meal in meal_history:
-                history_str += f"- {meal['food_name']} ({meal.get('calories', 0):.0f} kcal)\n"
-                total_calories += meal.get('calories', 0)
-            history_str += f"Your total for today is approximately {total_calories:.0f} calories."
-        else:
-            history_str = "You haven't logged any meals yet today."
+        messages = self._build_chat_messages(meal_history, user_profile, user_query, memory)
+        try:
+            return self._complete('chat', messages, temperature=0.7, max_tokens=250, use_cache=use_cache)
+        except CircuitOpenError:
+            return BUSY_CHAT_REPLY
+        except Exception as e:
+            print(f"❌ GPT Chat Error: {e}")
+            metrics.mark_error(e)
+            return f"Oh no, pookie! I had a little hiccup trying to think! Please try again. 💕"
+
+    @metrics.timed('openai.stream_chat_suggestion')
+    def stream_chat_suggestion(self, meal_history, user_profile, user_query, use_cache=True, memory=None):
+        """Same as get_chat_suggestion, but yields text chunks as the model produces them."""
+        if not self.client:
+            yield "Sorry, my AI brain is taking a little nap! 😴 Please check the API keys."
+            return
+
+        messages = self._build_chat_messages(meal_history, user_profile, user_query, memory)
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = make_completion_key(self.MODEL, messages, 0.7, 250)
+            cached = self.cache.get('chat', cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        started = False
+        parts = []
+        try:
+            # Recorded by the breaker when the stream ends, so a dropped connection counts too
+            stream = self.guard.stream(
+                self.client.chat.completions.create,
+                model=self.MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=250,
+                stream=True
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if not text:
+                    continue
+                if not started:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                    started = True
+                parts.append(text)
+                yield text
+            if cache_key is not None and parts:
+                self.cache.set('chat', cache_key, ''.join(parts).strip())
+        except CircuitOpenError:
+            yield BUSY_CHAT_REPLY
+        except Exception as e:
+            print(f"❌ GPT Chat Error: {e}")
+            metrics.mark_error(e)
+            if started:
+                yield "\n\nOh no, pookie! I lost my train of thought. Please try again. 💕"
+            else:
+                yield "Oh no, pookie! I had a little hiccup trying to think! Please try again. 💕"
+
+    @metrics.timed('openai.chat_completion')
+    def _complete(self, method, messages, temperature, max_tokens, use_cache=True, key_extra=None):
+        """Run one chat completion through the cache and return its stripped text"""
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = make_completion_key(self.MODEL, messages, temperature, max_tokens, key_extra)
+            cached = self.cache.get(method, cache_key)
+            if cached is not None:
+                return cached
+
+        response = self.guard.call(
+            self.client.chat.completions.create,
+            model=self.MODEL,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        text = response.choices[0].message.content.strip()
+        if metrics.ENABLED:
+            metrics.add_payload(bytes_in=len(text.encode('utf-8')),
+                                bytes_out=sum(len(m['content'].encode('utf-8')) for m in messages))
+        if cache_key is not None:
+            self.cache.set(method, cache_key, text)
+        return text
+
+    def cache_hit_ratios(self):
+        """Hit ratio per method, or {} when caching is off"""
+        return self.cache.hit_ratios() if self.cache is not None else {}
+
+    @metrics.timed('openai.summarize_conversation')
+    def summarize_conversation(self, summary, turns):
+        """Fold older chat turns into the rolling conversation summary"""
+        transcript = '\n'.join(f"{'User' if t['role'] == 'user' else 'Pookie'}: {t['content']}" for t in turns)
+        return self._complete(
+            'chat_summary',
+            [
+                {"role": "system", "content": "You maintain a compact running summary of a nutrition chat. Keep facts about the user's preferences, goals and what was already suggested. Reply with the updated summary only, under 80 words."},
+                {"role": "user", "content": f"Current summary: {summary or '(none)'}\n\nNew messages:\n{transcript}"}
+            ],
+            temperature=0.2, max_tokens=150, use_cache=False
+        )
+
+    def _build_chat_messages(self, meal_history, user_profile, user_query, memory=None):
+        """Prior conversation (bounded by the memory's token budget) followed by the new prompt"""
+        prompt = self._build_chat_prompt(meal_history, user_profile, user_query)
+        if memory is None:
+            return [{"role": "user", "content": prompt}]
+        allowance = memory.token_budget - estimate_tokens(prompt)
+        return memory.context_messages(max(0, allowance)) + [{"role": "user", "content": prompt}]
+
+    def _build_chat_prompt(self, meal_history, user_profile, user_query):
+        """Build the chat prompt from today's meals and the user's question"""
+        # Only the latest meals are listed so the prompt stays flat for heavy loggers
+        history_str = format_meal_history(meal_history)
 
-        prompt = f"""
+        return f"""
 You are NutriLens, a cute, encouraging, and knowledgeable AI nutritionist. Your nickname is Pookie.
 The user's profile: Their goal is '{user_profile['goal']}' and they are {user_profile['age']} years old.
 Today's meal history:
@@ -47,39 +175,31 @@ Based on their history and goal, provide a helpful, friendly, and practical resp
 If they ask for a snack, suggest 2-3 specific, healthy options, explaining why they are a good choice (e.g., "it has protein to keep you full!").
 Keep it conversational and use emojis naturally! 🌸 Your response should be encouraging and cute.
 """
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=250
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"❌ GPT Chat Error: {e}")
-            return f"Oh no, pookie! I had a little hiccup trying to think! Please try again. 💕"
 
     # --- ALL YOUR ORIGINAL FUNCTIONS ARE STILL HERE ---
-    def generate_advice(self, food_name, nutrition_data, user_profile):
+    @metrics.timed('openai.generate_advice')
+    def generate_advice(self, food_name, nutrition_data, user_profile, use_cache=True):
         """Generate personalized nutrition advice using GPT"""
         if not self.client:
             return { 'success': False, 'error': 'OpenAI API not configured.' }
         
         try:
             prompt = self._build_prompt(food_name, nutrition_data, user_profile)
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            advice_text = self._complete(
+                'advice',
+                [
                     {"role": "system", "content": "You are NutriLens, a cute, friendly, and knowledgeable AI nutritionist who specializes in Indian diets and personalized health advice. You're encouraging, warm, and give practical tips. Use emojis naturally but not excessively. Keep responses concise and actionable."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7, max_tokens=500
+                temperature=0.7, max_tokens=500, use_cache=use_cache
             )
-            advice_text = response.choices[0].message.content.strip()
             parsed_advice = self._parse_advice(advice_text)
             return { 'success': True, **parsed_advice, 'error': None }
+        except CircuitOpenError:
+            return { 'success': True, **self._local_advice(food_name, nutrition_data, user_profile), 'fallback': True, 'error': None }
         except Exception as e:
             print(f"❌ GPT Error: {str(e)}")
+            metrics.mark_error(e)
             return { 'success': False, 'error': f'Could not generate advice: {str(e)}' }
     
     def _build_prompt(self, food_name, nutrition_data, user_profile):
@@ -132,6 +252,29 @@ Keep it warm, friendly, and specific to Indian context where relevant.
             return self._get_fallback_advice(advice_text)
         return sections
 
+    def _local_advice(self, food_name, nutrition_data, user_profile):
+        """Rule-based advice from the nutrition numbers, served while OpenAI is unavailable"""
+        goal = user_profile.get('goal', 'Stay Healthy')
+        calories = nutrition_data.get('calories', 0) if nutrition_data.get('success') else 0
+        protein = nutrition_data.get('protein', 0) if nutrition_data.get('success') else 0
+        
+        if calories > 600:
+            swap = f"Try a smaller portion of {food_name} with a big side salad to keep the calories in check."
+            portion = "This one is quite filling, so half a plate is plenty."
+        else:
+            swap = f"{food_name} is a fine pick! Add some fresh veggies on the side for extra fibre."
+            portion = "A regular portion works well here."
+        if protein < 15 and goal in ('Build Muscle', 'Lose Weight'):
+            tip = "Pair this with a protein like dal, paneer, eggs or curd to stay full for longer."
+        else:
+            tip = "Drink a glass of water with your meal and eat slowly. 💧"
+        return {
+            'healthy_swap': swap,
+            'diet_tip': tip,
+            'portion_advice': portion,
+            'motivation': "Every meal you log is a step towards your goal! 🌸"
+        }
+
     def _get_fallback_advice(self, text):
         return {
             'healthy_swap': text[:200] if text else "Great food choice!",
@@ -140,21 +283,62 @@ Keep it warm, friendly, and specific to Indian context where relevant.
             'motivation': "You're on the right track! 🌸"
         }
     
-    def generate_daily_tip(self, user_profile):
-        """Generate a daily health tip based on user profile"""
+    @metrics.timed('openai.generate_daily_tip')
+    def generate_daily_tip(self, user_profile, use_cache=True, day=None, fallback=True):
+        """
+        Generate a daily health tip based on user profile
+
+        Args:
+            user_profile (dict): Profile with at least a 'goal'
+            use_cache (bool): Reuse a tip already generated for this goal and day
+            day (datetime.date): Day the tip is for (defaults to today)
+            fallback (bool): Return a static tip when the model can't be reached, else None
+        """
         if not self.client:
-            return "Remember to stay hydrated today! 💧"
+            return "Remember to stay hydrated today! 💧" if fallback else None
         try:
             goal = user_profile.get('goal', 'Stay Healthy')
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            # One tip per goal per calendar day
+            return self._complete(
+                'daily_tip',
+                [
                     {"role": "system", "content": "You are a friendly nutritionist. Give one short, actionable daily health tip."},
                     {"role": "user", "content": f"Give me one daily health tip for someone whose goal is: {goal}. Keep it to one sentence with an emoji."}
                 ],
-                temperature=0.8, max_tokens=100
+                temperature=0.8, max_tokens=100, use_cache=use_cache,
+                key_extra=(day or datetime.date.today()).isoformat()
             )
-            return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"❌ Daily tip error: {e}")
-            return "Eat colorful fruits and veggies today! 🌈"
\ No newline at end of file
+            metrics.mark_error(e)
+            return "Eat colorful fruits and veggies today! 🌈" if fallback else None
+    
+    @metrics.timed('openai.generate_daily_summary')
+    def generate_daily_summary(self, user_profile, day_totals, use_cache=True):
+        """Generate a short recap of a day's eating from its totals"""
+        if not self.client:
+            return None
+        try:
+            goal = user_profile.get('goal', 'Stay Healthy')
+            activity = user_profile.get('activity', 'Moderate')
+            return self._complete(
+                'daily_summary',
+                [
+                    {"role": "system", "content": "You are NutriLens, a cute and encouraging AI nutritionist. Summarize a user's day of eating in two short sentences with one emoji."},
+                    {"role": "user", "content": f"Goal: {goal}. Activity: {activity}. Yesterday they logged {day_totals['meal_count']} meals totalling about {day_totals['calories']:.0f} kcal, {day_totals['protein']:.0f}g protein, {day_totals['carbs']:.0f}g carbs and {day_totals['fat']:.0f}g fat."}
+                ],
+                temperature=0.7, max_tokens=120, use_cache=use_cache
+            )
+        except Exception as e:
+            print(f"❌ Daily summary error: {e}")
+            metrics.mark_error(e)
+            return None
+
+
+def _is_upstream_failure(outcome):
+    """Timeouts, connection errors, rate limits and 5xx count against the breaker; bad requests don't"""
+    if isinstance(outcome, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(outcome, openai.APIStatusError):
+        return outcome.status_code >= 500
+    return False
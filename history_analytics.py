@@ -0,0 +1,255 @@
+# history_analytics.py
+# Columnar analytics over a user's meal history. Meals (or daily rollups) are
+# turned into NumPy arrays once; every statistic is then computed on whole
+# arrays instead of looping over dicts. Benchmark against the old dashboard code:
+#   python history_analytics.py --days 365 --meals-per-day 4
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+from database import meal_day
+
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+KCAL_PER_GRAM = {'protein': 4.0, 'carbs': 4.0, 'fat': 9.0}
+UTC_SUFFIXES = ('+00:00', 'Z')
+
+
+def meal_arrays(meals):
+    """
+    Convert meal rows into columns in a single pass.
+
+    Args:
+        meals (list): Meal dicts with 'created_at' and the macro columns
+
+    Returns:
+        dict: 'day' (datetime64[D]) plus one float64 array per macro
+    """
+    # Supabase returns UTC timestamps, whose date is simply the first ten characters
+    days = [
+        meal['created_at'][:10] if (meal.get('created_at') or '').endswith(UTC_SUFFIXES) else meal_day(meal).isoformat()
+        for meal in meals
+    ]
+    columns = {'day': np.array(days, dtype='datetime64[D]')}
+    for macro in MACROS:
+        columns[macro] = np.fromiter((meal.get(macro) or 0 for meal in meals), dtype=np.float64, count=len(days))
+    columns['meal_count'] = np.ones(len(days), dtype=np.float64)
+    return columns
+
+
+def rollup_arrays(rollups):
+    """Same columns as meal_arrays, from rows of daily_nutrition_rollups."""
+    columns = {'day': np.array([row['day'] for row in rollups], dtype='datetime64[D]')}
+    for field in MACROS + ('meal_count',):
+        columns[field] = np.array([row.get(field) or 0 for row in rollups], dtype=np.float64)
+    return columns
+
+
+def daily_totals(columns, start_date, end_date):
+    """
+    Sum the columns into one slot per calendar day from start_date to end_date.
+    Days without meals are present with zero totals.
+
+    Returns:
+        dict: 'day' (every date in the range) plus a totals array per field
+    """
+    start = np.datetime64(start_date, 'D')
+    n_days = (np.datetime64(end_date, 'D') - start).astype(int) + 1
+    offsets = (columns['day'] - start).astype(int)
+    in_range = (offsets >= 0) & (offsets < n_days)
+    offsets = offsets[in_range]
+
+    totals = {'day': start + np.arange(n_days)}
+    for field in MACROS + ('meal_count',):
+        totals[field] = np.bincount(offsets, weights=columns[field][in_range], minlength=n_days)
+    return totals
+
+
+def rolling_average(values, logged, window):
+    """
+    Mean of values over the trailing window of days, counting only logged
+    days (NaN where the window holds none), so unlogged days don't read as fasting.
+    """
+    sums = np.cumsum(np.concatenate(([0.0], np.where(logged, values, 0.0))))
+    counts = np.cumsum(np.concatenate(([0], logged.astype(int))))
+    starts = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    window_sums = sums[1:] - sums[starts]
+    window_counts = counts[1:] - counts[starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+
+def macro_ratios(protein, carbs, fat):
+    """Share of macro energy from protein, carbs and fat (each array sums to 1 per day, NaN if empty)."""
+    energy = {macro: grams * KCAL_PER_GRAM[macro] for macro, grams in
+              (('protein', protein), ('carbs', carbs), ('fat', fat))}
+    total = energy['protein'] + energy['carbs'] + energy['fat']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {macro: np.where(total > 0, kcal / total, np.nan) for macro, kcal in energy.items()}
+
+
+def logging_streaks(logged):
+    """
+    Runs of consecutive logged days.
+
+    Returns:
+        tuple: (current streak ending on the last day, or the day before if the
+                last day has nothing logged yet; longest streak in the range)
+    """
+    if not len(logged):
+        return 0, 0
+    edges = np.diff(np.concatenate(([0], logged.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if not len(starts):
+        return 0, 0
+    longest = int((ends - starts).max())
+    last_end = ends[-1]
+    current = int(last_end - starts[-1]) if last_end >= len(logged) - 1 else 0
+    return current, longest
+
+
+def analyze_history(columns, start_date, end_date):
+    """
+    Every dashboard statistic for a date range.
+
+    Args:
+        columns (dict): Output of meal_arrays or rollup_arrays
+        start_date (datetime.date): First day of the range
+        end_date (datetime.date): Last day of the range (inclusive)
+
+    Returns:
+        dict: Daily totals, 7/30-day rolling calorie averages, macro ratios,
+              streaks and the extreme days, or None if nothing was logged.
+              The extreme-day keys match analyze_historical_data.
+    """
+    totals = daily_totals(columns, start_date, end_date)
+    logged = totals['meal_count'] > 0
+    if not logged.any():
+        return None
+
+    logged_idx = np.flatnonzero(logged)
+    min_idx = logged_idx[np.argmin(totals['calories'][logged])]
+    max_idx = logged_idx[np.argmax(totals['protein'][logged])]
+    current_streak, longest_streak = logging_streaks(logged)
+    days = totals['day'].astype(datetime.date)
+
+    return {
+        'days': days,
+        'totals': totals,
+        'logged': logged,
+        'rolling_7': rolling_average(totals['calories'], logged, 7),
+        'rolling_30': rolling_average(totals['calories'], logged, 30),
+        'daily_ratios': macro_ratios(totals['protein'], totals['carbs'], totals['fat']),
+        'overall_ratios': {macro: float(share) for macro, share in macro_ratios(
+            totals['protein'].sum(), totals['carbs'].sum(), totals['fat'].sum()).items()},
+        'current_streak': current_streak,
+        'longest_streak': longest_streak,
+        'logged_days': int(logged.sum()),
+        'average_calories': float(totals['calories'][logged].mean()),
+        'min_calorie_day': days[min_idx], 'min_calories': float(totals['calories'][min_idx]),
+        'max_protein_day': days[max_idx], 'max_protein': float(totals['protein'][max_idx]),
+    }
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of n_out points that
+    keep the visual shape of (x, y). First and last points are always kept.
+
+    Args:
+        x (np.ndarray): Increasing numeric x values
+        y (np.ndarray): Values to plot
+        n_out (int): Point budget
+
+    Returns:
+        np.ndarray: Sorted indices into x and y
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_start = end if end < n else n - 1
+        # Third vertex: the mean of the following bucket (or the last point)
+        avg_x = x[next_start:max(next_end, next_start + 1)].mean()
+        avg_y = y[next_start:max(next_end, next_start + 1)].mean()
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_series(days, values, n_out):
+    """LTTB-downsample a daily series to at most n_out points; returns (days, values)."""
+    days = np.asarray(days)
+    values = np.asarray(values, dtype=np.float64)
+    x = days.astype('datetime64[D]').astype(np.int64) if len(days) else days
+    keep = lttb_indices(x, values, n_out)
+    return days[keep], values[keep]
+
+
+def _synthetic_meals(days, meals_per_day, seed=0):
+    rng = np.random.default_rng(seed)
+    today = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    meals = []
+    for day in range(days):
+        for slot in range(meals_per_day):
+            created_at = today - datetime.timedelta(days=day) + datetime.timedelta(minutes=360 + 960 * slot // meals_per_day)
+            meals.append({
+                'id': len(meals), 'created_at': created_at.isoformat(), 'food_name': 'Meal',
+                'calories': float(rng.uniform(150, 900)), 'protein': float(rng.uniform(2, 60)),
+                'carbs': float(rng.uniform(5, 120)), 'fat': float(rng.uniform(1, 50)),
+            })
+    return meals
+
+
+def benchmark(days=365, meals_per_day=4, repeat=20):
+    """
+    Time analyze_history against the dashboard's row-by-row analyze_historical_data
+    on synthetic history. Returns best-of-repeat milliseconds for each.
+    """
+    from pages.dashboard_page import analyze_historical_data
+
+    meals = _synthetic_meals(days, meals_per_day)
+    end_date = datetime.datetime.now(datetime.timezone.utc).date()
+    start_date = end_date - datetime.timedelta(days=days - 1)
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings), result
+
+    legacy_ms, legacy = best_of(lambda: analyze_historical_data(meals))
+    columnar_ms, columnar = best_of(lambda: analyze_history(meal_arrays(meals), start_date, end_date))
+    assert legacy['min_calorie_day'] == columnar['min_calorie_day']
+    assert legacy['max_protein_day'] == columnar['max_protein_day']
+    return {'meals': len(meals), 'legacy_ms': legacy_ms, 'columnar_ms': columnar_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar history analytics.")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--meals-per-day', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    result = benchmark(args.days, args.meals_per_day, args.repeat)
+    print(f"✅ {result['meals']} meals: analyze_historical_data {result['legacy_ms']:.2f} ms, "
+          f"analyze_history {result['columnar_ms']:.2f} ms "
+          f"({result['legacy_ms'] / result['columnar_ms']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# http_transport.py
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# One keep-alive session per pool size, shared by every client in the process
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_shared_session(pool_size=10):
+    """Returns a process-wide, connection-pooled requests.Session."""
+    with _sessions_lock:
+        session = _sessions.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[pool_size] = session
+        return session
+
+
+class HTTPTransport:
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=8.0,
+                 max_retries=3, backoff_base=0.3, backoff_cap=5.0, max_concurrency=4):
+        """
+        Managed HTTP transport: pooled keep-alive connections, split timeouts,
+        jittered exponential backoff and a per-instance concurrency cap.
+
+        Args:
+            pool_size (int): Connections kept alive per host.
+            connect_timeout (float): Seconds to wait for the TCP/TLS connect.
+            read_timeout (float): Seconds to wait for the response.
+            max_retries (int): Retries after the first attempt on 5xx/429/network errors.
+            backoff_base (float): Base delay for exponential backoff.
+            backoff_cap (float): Maximum delay between attempts.
+            max_concurrency (int): In-flight requests allowed from this instance.
+        """
+        self.session = get_shared_session(pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """
+        Sends a request, retrying transient failures.
+
+        Args:
+            deadline (float): Seconds allowed for every attempt and backoff together.
+                Timeouts shrink to fit and no retry starts once it has passed.
+
+        Returns:
+            requests.Response: The last response received (may be a non-200).
+
+        Raises:
+            requests.exceptions.RequestException: If every attempt failed at the network level
+                or the deadline passed before a response arrived.
+        """
+        timeout = kwargs.pop('timeout', self.timeout)
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        expires = time.monotonic() + deadline if deadline else None
+        attempt = 0
+        while True:
+            if expires is not None:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise requests.exceptions.Timeout(f"Deadline of {deadline}s exceeded after {attempt} attempts")
+                kwargs['timeout'] = (min(timeout[0], remaining), min(timeout[1], remaining))
+            else:
+                kwargs['timeout'] = timeout
+            with self._slots:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                    if metrics.ENABLED:
+                        metrics.add_payload(bytes_in=len(response.content), bytes_out=len(response.request.body or b''))
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt >= self.max_retries:
+                        raise
+                    response = None
+
+            if response is not None and (response.status_code not in RETRY_STATUS_CODES
+                                         or attempt >= self.max_retries):
+                return response
+
+            delay = self._backoff_delay(attempt, response)
+            if expires is not None and time.monotonic() + delay >= expires:
+                # No time left for another attempt: hand back what we have
+                if response is not None:
+                    return response
+                raise requests.exceptions.Timeout(f"Deadline of {deadline}s exceeded after {attempt + 1} attempts")
+            time.sleep(delay)
+            attempt += 1
+
+    def _backoff_delay(self, attempt, response):
+        """Full-jitter exponential backoff, overridden by a Retry-After header."""
+        retry_after = self._retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def default_transport():
+    """Builds a transport from NUTRITIONIX_HTTP_* environment settings."""
+    return HTTPTransport(
+        pool_size=int(os.getenv('NUTRITIONIX_HTTP_POOL_SIZE', '10')),
+        connect_timeout=float(os.getenv('NUTRITIONIX_HTTP_CONNECT_TIMEOUT', '3.05')),
+        read_timeout=float(os.getenv('NUTRITIONIX_HTTP_READ_TIMEOUT', '8')),
+        max_retries=int(os.getenv('NUTRITIONIX_HTTP_RETRIES', '3')),
+        max_concurrency=int(os.getenv('NUTRITIONIX_HTTP_MAX_CONCURRENCY', '4'))
+    )
@@ -0,0 +1,114 @@
+# image_preprocessing.py
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from detection_cache import content_hash, perceptual_hash
+
+DEFAULT_MAX_SIDE = int(os.getenv('CLARIFAI_IMAGE_MAX_SIDE', '512'))
+DEFAULT_QUALITY = int(os.getenv('CLARIFAI_JPEG_QUALITY', '85'))
+DEFAULT_PASSTHROUGH_BYTES = int(os.getenv('CLARIFAI_PASSTHROUGH_BYTES', str(200 * 1024)))
+
+_EXIF_ORIENTATION_TAG = 0x0112
+
+
+def read_image_bytes(source):
+    """
+    Get the raw encoded bytes of an upload without decoding it.
+
+    Args:
+        source: bytes, a file-like object (e.g. Streamlit's UploadedFile) or a PIL Image
+
+    Returns:
+        bytes or None: Encoded bytes, or None if source is an already-decoded PIL Image
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, Image.Image):
+        return None
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source.read()
+
+
+def preprocess_image(source, max_side=DEFAULT_MAX_SIDE, quality=DEFAULT_QUALITY,
+                     passthrough_bytes=DEFAULT_PASSTHROUGH_BYTES):
+    """
+    Shrink an image to what the food model needs before it goes over the wire.
+
+    Args:
+        source: bytes, a file-like object or a PIL Image
+        max_side (int): Longest side in pixels after downscaling
+        quality (int): JPEG quality used when re-encoding
+        passthrough_bytes (int): Small JPEGs up to this size are sent unchanged
+
+    Returns:
+        dict: 'bytes' (JPEG payload), 'image' (the PIL image that was encoded),
+              'width', 'height', 'original_bytes', 'payload_bytes' and
+              'passthrough' (True if the original bytes were kept)
+    """
+    raw = read_image_bytes(source)
+    if raw is None:
+        image = source
+        original_size = None
+    else:
+        image = Image.open(BytesIO(raw))
+        original_size = len(raw)
+
+        if image.format == 'JPEG':
+            orientation = image.getexif().get(_EXIF_ORIENTATION_TAG, 1)
+            if (len(raw) <= passthrough_bytes and max(image.size) <= max_side
+                    and orientation == 1 and image.mode in ('RGB', 'L')):
+                return {
+                    'bytes': raw, 'image': image, 'width': image.width, 'height': image.height,
+                    'original_bytes': original_size, 'payload_bytes': original_size,
+                    'passthrough': True
+                }
+            # Let libjpeg decode at a reduced scale instead of the full photo
+            image.draft('RGB', (max_side, max_side))
+
+    image = ImageOps.exif_transpose(image)
+    image = _to_rgb(image)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", quality=quality, optimize=True)
+    payload = buffered.getvalue()
+    return {
+        'bytes': payload, 'image': image, 'width': image.width, 'height': image.height,
+        'original_bytes': original_size, 'payload_bytes': len(payload),
+        'passthrough': False
+    }
+
+
+def prepare_image(source):
+    """
+    preprocess_image plus the detection cache keys. A plain function so
+    batch jobs can run it in worker processes.
+
+    Returns:
+        dict: preprocess_image's result plus 'exact_key' (hash of the original
+              bytes, so a re-upload can be looked up before preprocessing) and 'phash'
+    """
+    raw = read_image_bytes(source)
+    prepared = preprocess_image(raw if raw is not None else source)
+    prepared['exact_key'] = content_hash(raw if raw is not None else prepared['bytes'])
+    prepared['phash'] = perceptual_hash(prepared['image'])
+    return prepared
+
+
+def _to_rgb(image):
+    """Flatten transparency onto white and convert palette/CMYK/etc. to RGB"""
+    if image.mode == 'RGB':
+        return image
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
@@ -0,0 +1,114 @@
+# import_benchmark.py
+# Cold-import cost of the app shell and of each page, measured with
+# `python -X importtime` in a fresh interpreter per target:
+#   python import_benchmark.py
+#   python import_benchmark.py --top 15 --max-shell-ms 1500
+# Exits non-zero if the shell (what every visitor pays on first render) pulls in
+# a provider SDK beyond what Streamlit loads itself, or exceeds --max-shell-ms.
+import os
+import sys
+import json
+import ast
+import argparse
+import subprocess
+
+HEAVY_MODULES = ('clarifai_grpc', 'openai', 'supabase', 'plotly', 'numpy', 'PIL')
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def app_imports(app_path=os.path.join(ROOT, 'app.py')):
+    """
+    Read app.py without running it.
+
+    Returns:
+        tuple: (modules imported at the top level of app.py, its PAGE_MODULES dict)
+    """
+    with open(app_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    shell, pages = [], {}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            shell += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            shell.append(node.module)
+        elif isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == 'PAGE_MODULES' for t in node.targets):
+            pages = ast.literal_eval(node.value)
+    return shell, pages
+
+
+def measure_imports(modules, python=sys.executable):
+    """
+    Import modules in a fresh interpreter and parse its -X importtime report.
+
+    Returns:
+        dict: total_ms (sum of top-level cumulative times) and packages,
+              {package: cumulative_ms} for every module imported
+    """
+    code = '; '.join(f'import {module}' for module in modules)
+    result = subprocess.run([python, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+
+    packages, total_us = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        packages[name] = max(packages.get(name, 0), int(cumulative) / 1000)
+        if depth == 1:
+            total_us += int(cumulative)
+    return {'total_ms': total_us / 1000, 'packages': packages}
+
+
+def heavy_modules_loaded(packages):
+    return sorted({name.split('.')[0] for name in packages if name.split('.')[0] in HEAVY_MODULES})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure NutriLens cold import times.")
+    parser.add_argument('--top', type=int, default=8, help="Slowest packages to list per target")
+    parser.add_argument('--max-shell-ms', type=float, help="Fail if the app shell takes longer than this")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    shell_modules, page_modules = app_imports()
+    targets = {'app shell': shell_modules}
+    targets.update({page: shell_modules + [module] for page, module in page_modules.items()})
+
+    results = {}
+    for target, modules in targets.items():
+        measured = measure_imports(modules)
+        results[target] = {
+            'total_ms': measured['total_ms'],
+            'heavy_modules': heavy_modules_loaded(measured['packages']),
+            'slowest': sorted(measured['packages'].items(), key=lambda item: item[1], reverse=True)[:args.top],
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for target, result in results.items():
+            heavy = ', '.join(result['heavy_modules']) or 'none'
+            print(f"📦 {target}: {result['total_ms']:.0f} ms (provider SDKs: {heavy})")
+            for name, ms in result['slowest']:
+                print(f"    {ms:8.1f} ms  {name}")
+
+    shell = results['app shell']
+    # Streamlit itself loads some of these; only what the app adds on top counts
+    baseline = set(heavy_modules_loaded(measure_imports(['streamlit'])['packages']))
+    added = [name for name in shell['heavy_modules'] if name not in baseline]
+    failed = False
+    if added:
+        print(f"❌ The app shell imports {', '.join(added)}; load them from the page that needs them")
+        failed = True
+    if args.max_shell_ms is not None and shell['total_ms'] > args.max_shell_ms:
+        print(f"❌ The app shell took {shell['total_ms']:.0f} ms (budget {args.max_shell_ms:.0f} ms)")
+        failed = True
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
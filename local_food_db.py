@@ -0,0 +1,129 @@
+# local_food_db.py
+import os
+import re
+import csv
+import threading
+from array import array
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'local_foods.csv')
+
+# Numeric columns, in the order they appear in the data file
+NUMERIC_COLUMNS = (
+    'serving_qty', 'serving_weight_grams', 'calories', 'total_fat', 'saturated_fat',
+    'cholesterol', 'sodium', 'total_carbs', 'dietary_fiber', 'sugars', 'protein', 'potassium'
+)
+SCALED_COLUMNS = NUMERIC_COLUMNS[2:]
+
+_SERVING_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?|\d+/\d+)?\s*(.*?)\s*$')
+_GRAM_UNITS = {'g', 'gm', 'gms', 'gram', 'grams'}
+_GENERIC_UNITS = {'', 'serving', 'servings'}
+
+
+class LocalFoodDatabase:
+    def __init__(self, data_path=DEFAULT_DATA_PATH):
+        """
+        Bundled food composition store, held as one typed array per nutrient.
+        The data file is only read on the first lookup.
+
+        Args:
+            data_path (str): CSV file with one row per food.
+        """
+        self.data_path = data_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._index = {}
+        self._units = []
+        self._columns = {}
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._units)
+
+    def lookup(self, cleaned_food, serving_size="1 serving"):
+        """
+        Look up a food locally and scale it to the requested serving.
+
+        Args:
+            cleaned_food (str): Food name after NutritionAPI.clean_food_name
+            serving_size (str): Serving size (e.g., "1 serving", "2 chapati", "100g")
+
+        Returns:
+            dict: Nutrition information in NutritionAPI's format, or None on a miss
+        """
+        self._ensure_loaded()
+        row = self._index.get(' '.join(cleaned_food.lower().split()))
+        if row is None:
+            return None
+
+        factor = self._serving_factor(row, serving_size)
+        if factor is None:
+            return None
+
+        col = self._columns
+        info = {
+            'success': True,
+            'food_name': cleaned_food.lower().strip(),
+            'brand_name': None,
+            'serving_qty': round(col['serving_qty'][row] * factor, 2),
+            'serving_unit': self._units[row],
+            'serving_weight_grams': round(col['serving_weight_grams'][row] * factor, 1),
+        }
+        for name in SCALED_COLUMNS:
+            info[name] = round(col[name][row] * factor, 2)
+        info['photo_url'] = None
+        info['error'] = None
+        return info
+
+    def _serving_factor(self, row, serving_size):
+        """Multiplier from the stored serving to the requested one, or None if the units don't line up"""
+        match = _SERVING_PATTERN.match(str(serving_size).lower())
+        qty_text, unit = match.group(1), match.group(2)
+        if qty_text and '/' in qty_text:
+            num, den = qty_text.split('/')
+            qty = float(num) / float(den) if float(den) else 0.0
+        else:
+            qty = float(qty_text) if qty_text else 1.0
+        if qty <= 0:
+            return None
+
+        if unit in _GENERIC_UNITS:
+            return qty
+        # Missing weights and quantities are stored as 0: leave those servings to Nutritionix
+        if unit in _GRAM_UNITS:
+            grams = self._columns['serving_weight_grams'][row]
+            return qty / grams if grams > 0 else None
+        stored_unit = self._units[row]
+        if unit == stored_unit or unit.rstrip('s') == stored_unit:
+            stored_qty = self._columns['serving_qty'][row]
+            return qty / stored_qty if stored_qty > 0 else None
+        return None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            columns = {name: array('d') for name in NUMERIC_COLUMNS}
+            index, units = {}, []
+            try:
+                with open(self.data_path, newline='', encoding='utf-8') as f:
+                    for record in csv.DictReader(f):
+                        index[' '.join(record['food_name'].lower().split())] = len(units)
+                        units.append(record['serving_unit'].strip().lower())
+                        for name in NUMERIC_COLUMNS:
+                            columns[name].append(float(record[name] or 0))
+            except (OSError, KeyError, ValueError) as e:
+                print(f"⚠️ Local food database could not be loaded: {e}")
+                columns = {name: array('d') for name in NUMERIC_COLUMNS}
+                index, units = {}, []
+            self._columns, self._index, self._units = columns, index, units
+            self._loaded = True
+
+
+def default_local_db():
+    """Builds the local store from NUTRILENS_LOCAL_FOODS, or None when it is switched off."""
+    data_path = os.getenv('NUTRILENS_LOCAL_FOODS', DEFAULT_DATA_PATH)
+    if data_path.lower() in ('', 'none', 'off'):
+        return None
+    return LocalFoodDatabase(data_path)
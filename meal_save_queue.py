@@ -0,0 +1,175 @@
+# meal_save_queue.py
+import os
+import time
+import queue
+import random
+import atexit
+import threading
+
+from database import build_meal_row, insert_meals
+
+
+class MealSaveQueue:
+    def __init__(self, db, max_pending=500, batch_size=50, flush_interval=0.5,
+                 max_retries=5, backoff_base=0.5, backoff_cap=8.0, enqueue_timeout=2.0):
+        """
+        Write-behind queue for meal rows: pages enqueue and return, a background
+        thread coalesces whatever is waiting into one insert per batch.
+
+        Rows carry the idempotency key of the analysis that produced them, so a
+        retried batch or a repeated enqueue never creates a second row.
+
+        Args:
+            db: Supabase client
+            max_pending (int): Rows buffered before enqueue starts to block.
+            batch_size (int): Most rows sent in one insert.
+            flush_interval (float): Seconds to wait for more rows before sending a batch.
+            max_retries (int): Attempts per batch before it is dropped.
+            backoff_base (float): First retry delay in seconds (doubled each attempt, with jitter).
+            backoff_cap (float): Longest retry delay in seconds.
+            enqueue_timeout (float): Seconds enqueue may block on a full queue
+                                     before the row is written inline instead.
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.stats = {'enqueued': 0, 'inserted': 0, 'duplicates': 0, 'batches': 0,
+                      'retries': 0, 'dropped': 0, 'inline': 0}
+
+    def enqueue(self, user_id, meal_data, advice, idempotency_key):
+        """
+        Queue a meal for saving.
+
+        Returns:
+            bool: True if the meal was queued or written, False if it was lost
+        """
+        row = build_meal_row(user_id, meal_data, advice, idempotency_key)
+        if self._closed:
+            return self._write_inline(row)
+        self._ensure_worker()
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            # Backpressure: the writer can't keep up, so this caller pays for its own write
+            print("⚠️ Meal save queue is full, saving inline")
+            return self._write_inline(row)
+        self.stats['enqueued'] += 1
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued row has been written or dropped.
+
+        Returns:
+            bool: True if the queue drained within timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Flush pending rows and stop the worker; later enqueues write inline."""
+        if self._closed:
+            return
+        drained = self.flush(timeout)
+        self._closed = True
+        if not drained:
+            print(f"⚠️ Meal save queue closed with {self._queue.qsize()} meals unsaved")
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='nutrilens-meal-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Give rows saved moments apart the chance to share the insert
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(self._dedupe(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _dedupe(batch):
+        """Keep the first row per idempotency key."""
+        seen, rows = set(), []
+        for row in batch:
+            key = row.get('idempotency_key')
+            if key and key in seen:
+                continue
+            seen.add(key)
+            rows.append(row)
+        return rows
+
+    def _write_batch(self, rows):
+        for attempt in range(self.max_retries):
+            try:
+                inserted = insert_meals(self.db, rows)
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    self.stats['dropped'] += len(rows)
+                    print(f"❌ Giving up on {len(rows)} meals after {self.max_retries} attempts: {e}")
+                    return
+                self.stats['retries'] += 1
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                print(f"⚠️ Meal batch insert failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.stats['batches'] += 1
+            self.stats['inserted'] += len(inserted)
+            self.stats['duplicates'] += len(rows) - len(inserted)
+            print(f"✅ Saved {len(inserted)} meals to Supabase ({len(rows) - len(inserted)} already saved)")
+            return
+
+    def _write_inline(self, row):
+        self.stats['inline'] += 1
+        try:
+            insert_meals(self.db, [row])
+            return True
+        except Exception as e:
+            print(f"❌ Error saving meal to Supabase: {e}")
+            return False
+
+
+def default_meal_save_queue(db):
+    """
+    Queue built from MEAL_SAVE_* settings whose pending rows are flushed
+    when the interpreter exits.
+    """
+    save_queue = MealSaveQueue(
+        db,
+        max_pending=int(os.getenv('MEAL_SAVE_MAX_PENDING', '500')),
+        batch_size=int(os.getenv('MEAL_SAVE_BATCH_SIZE', '50')),
+        flush_interval=float(os.getenv('MEAL_SAVE_FLUSH_INTERVAL', '0.5')),
+        max_retries=int(os.getenv('MEAL_SAVE_MAX_RETRIES', '5')),
+    )
+    atexit.register(save_queue.close, float(os.getenv('MEAL_SAVE_SHUTDOWN_TIMEOUT', '10')))
+    return save_queue
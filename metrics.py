@@ -0,0 +1,336 @@
+# metrics.py
+# Timing spans and counters for the hot paths, exported as Prometheus text.
+# Off unless NUTRILENS_METRICS=1; while off, @timed returns the function
+# untouched and span() hands back a shared no-op, so instrumented code pays
+# one flag check at most.
+#   NUTRILENS_METRICS_FILE=/var/lib/node_exporter/nutrilens.prom   # textfile collector
+#   NUTRILENS_METRICS_PORT=9464                                    # serves /metrics
+import os
+import json
+import time
+import atexit
+import bisect
+import inspect
+import threading
+import functools
+import contextvars
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.getenv('NUTRILENS_METRICS', '0').lower() in ('1', 'true', 'on', 'yes')
+
+# Latency histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = nullcontext()
+_current_span = contextvars.ContextVar('nutrilens_span', default=None)
+
+
+def _is_timeout(error):
+    name = type(error).__name__.lower()
+    return 'timeout' in name or 'deadline' in name or 'deadline_exceeded' in str(error).lower()
+
+
+def _is_control_flow(error):
+    # st.rerun()/st.stop() unwind the script with exceptions that aren't failures
+    return any(cls.__name__ == 'ScriptControlException' for cls in type(error).__mro__)
+
+
+class _Operation:
+    __slots__ = ('calls', 'errors', 'timeouts', 'seconds', 'max_seconds', 'buckets', 'bytes_in', 'bytes_out')
+
+    def __init__(self):
+        self.calls = self.errors = self.timeouts = 0
+        self.seconds = self.max_seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.bytes_in = self.bytes_out = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Per-operation call counts, error/timeout counts, latency histograms and payload sizes."""
+        self._operations = {}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, operation, seconds, error=None, bytes_in=0, bytes_out=0):
+        with self._lock:
+            op = self._operations.get(operation)
+            if op is None:
+                op = self._operations[operation] = _Operation()
+            op.calls += 1
+            op.seconds += seconds
+            op.max_seconds = max(op.max_seconds, seconds)
+            op.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            op.bytes_in += bytes_in
+            op.bytes_out += bytes_out
+            if error is not None:
+                op.errors += 1
+                op.timeouts += _is_timeout(error)
+
+    def set_gauge(self, metric, value, help_text, **labels):
+        """Set a labelled gauge, e.g. a circuit breaker's state."""
+        with self._lock:
+            self._labelled(metric, 'gauge', help_text)[tuple(sorted(labels.items()))] = value
+
+    def inc_counter(self, metric, help_text, amount=1, **labels):
+        """Add to a labelled counter, e.g. rejected or hedged calls."""
+        with self._lock:
+            values = self._labelled(metric, 'counter', help_text)
+            key = tuple(sorted(labels.items()))
+            values[key] = values.get(key, 0) + amount
+
+    def _labelled(self, metric, kind, help_text):
+        series = self._series.get(metric)
+        if series is None:
+            series = self._series[metric] = (kind, help_text, {})
+        return series[2]
+
+    def snapshot(self):
+        """One dict per operation, e.g. for the debug panel."""
+        with self._lock:
+            rows = []
+            for name, op in sorted(self._operations.items()):
+                rows.append({
+                    'operation': name, 'calls': op.calls, 'errors': op.errors, 'timeouts': op.timeouts,
+                    'mean_ms': op.seconds / op.calls * 1000 if op.calls else 0.0,
+                    'p95_ms': self._quantile(op, 0.95) * 1000, 'max_ms': op.max_seconds * 1000,
+                    'bytes_in': op.bytes_in, 'bytes_out': op.bytes_out,
+                })
+            return rows
+
+    @staticmethod
+    def _quantile(op, q):
+        """Upper bucket bound holding the q-th observation (bucketed, like histogram_quantile)."""
+        target, seen = q * op.calls, 0
+        for bound, count in zip(BUCKETS + (op.max_seconds,), op.buckets):
+            seen += count
+            if seen >= target and count:
+                return min(bound, op.max_seconds)
+        return op.max_seconds
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            '# HELP nutrilens_operation_duration_seconds Time spent per instrumented operation.',
+            '# TYPE nutrilens_operation_duration_seconds histogram',
+        ]
+        with self._lock:
+            operations = sorted(self._operations.items())
+            for name, op in operations:
+                label = f'operation="{name}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, op.buckets):
+                    cumulative += count
+                    lines.append(f'nutrilens_operation_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'nutrilens_operation_duration_seconds_bucket{{{label},le="+Inf"}} {op.calls}')
+                lines.append(f'nutrilens_operation_duration_seconds_sum{{{label}}} {op.seconds:.6f}')
+                lines.append(f'nutrilens_operation_duration_seconds_count{{{label}}} {op.calls}')
+            for metric, help_text, field in (
+                ('nutrilens_operation_errors_total', 'Failed calls per operation (timeouts included).', 'errors'),
+                ('nutrilens_operation_timeouts_total', 'Calls that failed with a timeout.', 'timeouts'),
+            ):
+                lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+                lines += [f'{metric}{{operation="{name}"}} {getattr(op, field)}' for name, op in operations]
+            lines += ['# HELP nutrilens_payload_bytes_total Request and response payload bytes per operation.',
+                      '# TYPE nutrilens_payload_bytes_total counter']
+            for name, op in operations:
+                lines.append(f'nutrilens_payload_bytes_total{{operation="{name}",direction="in"}} {op.bytes_in}')
+                lines.append(f'nutrilens_payload_bytes_total{{operation="{name}",direction="out"}} {op.bytes_out}')
+            for metric, (kind, help_text, values) in sorted(self._series.items()):
+                lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+                for labels, value in sorted(values.items()):
+                    label = ','.join(f'{key}="{label_value}"' for key, label_value in labels)
+                    lines.append(f'{metric}{{{label}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._series.clear()
+
+
+registry = MetricsRegistry()
+
+
+class Span:
+    __slots__ = ('operation', 'started', 'error', 'bytes_in', 'bytes_out', '_token')
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.error = None
+        self.bytes_in = self.bytes_out = 0
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        _current_span.reset(self._token)
+        if exc is not None and not _is_control_flow(exc):
+            self.error = exc
+        registry.observe(self.operation, elapsed, self.error, self.bytes_in, self.bytes_out)
+        return False
+
+
+def span(operation):
+    """Context manager timing a block as one call of operation."""
+    return Span(operation) if ENABLED else _NOOP
+
+
+def mark_error(error):
+    """Count a handled exception against the innermost running span."""
+    if ENABLED:
+        current = _current_span.get()
+        if current is not None:
+            current.error = error
+
+
+def add_payload(bytes_in=0, bytes_out=0):
+    """Attribute payload bytes to the innermost running span."""
+    if ENABLED:
+        current = _current_span.get()
+        if current is not None:
+            current.bytes_in += bytes_in
+            current.bytes_out += bytes_out
+
+
+def set_gauge(metric, value, help_text, **labels):
+    if ENABLED:
+        registry.set_gauge(metric, value, help_text, **labels)
+
+
+def inc_counter(metric, help_text, amount=1, **labels):
+    if ENABLED:
+        registry.inc_counter(metric, help_text, amount, **labels)
+
+
+def json_size(value):
+    """Approximate wire size of a JSON-able value, in bytes."""
+    try:
+        return len(json.dumps(value, default=str).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 0
+
+
+def timed(operation, result_bytes=False):
+    """
+    Decorator recording each call as a span. A returned dict with
+    success=False counts as an error, following the app's result convention.
+    Generators are timed until exhausted, with yielded text counted as bytes in.
+
+    Args:
+        operation (str): Operation name used as the metric label
+        result_bytes (bool): Count the JSON size of the return value as bytes in
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                # The span is current only while the generator runs, never in the consumer between
+                # yields, so mark_error() inside the generator lands on this operation
+                current, started = Span(operation), time.perf_counter()
+                inner = fn(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current_span.set(current)
+                        try:
+                            item = next(inner)
+                        except StopIteration:
+                            break
+                        finally:
+                            _current_span.reset(token)
+                        if isinstance(item, str):
+                            current.bytes_in += len(item.encode('utf-8'))
+                        yield item
+                except GeneratorExit:
+                    raise
+                except BaseException as e:
+                    if not _is_control_flow(e):
+                        current.error = e
+                    raise
+                finally:
+                    inner.close()
+                    registry.observe(operation, time.perf_counter() - started, current.error, current.bytes_in, current.bytes_out)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(operation) as current:
+                result = fn(*args, **kwargs)
+                if isinstance(result, dict) and result.get('success') is False and current.error is None:
+                    current.error = RuntimeError(result.get('error') or 'failed')
+                if result_bytes:
+                    current.bytes_in += json_size(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def write_metrics_file(path):
+    """Write the Prometheus text atomically, for node_exporter's textfile collector."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(registry.render_prometheus())
+    os.replace(temporary, path)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """
+    Start the configured exporters once per process: an HTTP /metrics endpoint
+    (NUTRILENS_METRICS_PORT) and/or a periodically rewritten file
+    (NUTRILENS_METRICS_FILE, every NUTRILENS_METRICS_INTERVAL seconds and at exit).
+    """
+    global _exporters_started
+    if not ENABLED:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    port = os.getenv('NUTRILENS_METRICS_PORT')
+    if port:
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((os.getenv('NUTRILENS_METRICS_HOST', '127.0.0.1'), int(port)), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='nutrilens-metrics-http', daemon=True).start()
+        print(f"📈 Metrics served at http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+
+    path = os.getenv('NUTRILENS_METRICS_FILE')
+    if path:
+        interval = float(os.getenv('NUTRILENS_METRICS_INTERVAL', '15'))
+
+        def write_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_metrics_file(path)
+                except OSError as e:
+                    print(f"⚠️ Could not write metrics file {path}: {e}")
+
+        threading.Thread(target=write_forever, name='nutrilens-metrics-file', daemon=True).start()
+        atexit.register(write_metrics_file, path)
@@ -0,0 +1,15 @@
+-- Precomputed daily tips and summaries, written by daily_precompute.py
+create table if not exists public.daily_insights (
+    user_id uuid not null,
+    day date not null,
+    tip text,
+    summary text,
+    created_at timestamptz not null default now(),
+    primary key (user_id, day)
+);
+
+alter table public.daily_insights enable row level security;
+
+create policy "Users can read their own daily insights"
+    on public.daily_insights for select
+    using (auth.uid() = user_id);
@@ -0,0 +1,70 @@
+-- Per-user, per-day nutrition totals, kept up to date by database.save_meal.
+-- Days are UTC calendar days, matching the date filters in database.py.
+create table if not exists public.daily_nutrition_rollups (
+    user_id uuid not null,
+    day date not null,
+    calories double precision not null default 0,
+    protein double precision not null default 0,
+    carbs double precision not null default 0,
+    fat double precision not null default 0,
+    meal_count integer not null default 0,
+    updated_at timestamptz not null default now(),
+    primary key (user_id, day)
+);
+
+alter table public.daily_nutrition_rollups enable row level security;
+
+create policy "Users can read their own rollups"
+    on public.daily_nutrition_rollups for select
+    using (auth.uid() = user_id);
+
+-- Atomic increment called from save_meal; runs as owner so clients never write the table directly.
+create or replace function public.increment_daily_rollup(
+    p_user_id uuid, p_day date,
+    p_calories double precision, p_protein double precision,
+    p_carbs double precision, p_fat double precision,
+    p_meal_count integer default 1
+) returns void
+language plpgsql security definer set search_path = public as $$
+begin
+    if auth.role() is distinct from 'service_role' and p_user_id is distinct from auth.uid() then
+        raise exception 'cannot update rollups for another user';
+    end if;
+
+    insert into public.daily_nutrition_rollups as r (user_id, day, calories, protein, carbs, fat, meal_count)
+    values (p_user_id, p_day, p_calories, p_protein, p_carbs, p_fat, p_meal_count)
+    on conflict (user_id, day) do update set
+        calories = r.calories + excluded.calories,
+        protein = r.protein + excluded.protein,
+        carbs = r.carbs + excluded.carbs,
+        fat = r.fat + excluded.fat,
+        meal_count = r.meal_count + excluded.meal_count,
+        updated_at = now();
+end;
+$$;
+
+-- Recompute rollups from the meals table (all users, or one). Used by the backfill job.
+create or replace function public.rebuild_daily_rollups(p_user_id uuid default null)
+returns integer
+language plpgsql security definer set search_path = public as $$
+declare
+    affected integer;
+begin
+    if auth.role() is distinct from 'service_role' then
+        raise exception 'rebuild_daily_rollups requires the service role';
+    end if;
+
+    delete from public.daily_nutrition_rollups where p_user_id is null or user_id = p_user_id;
+
+    insert into public.daily_nutrition_rollups (user_id, day, calories, protein, carbs, fat, meal_count)
+    select user_id, (created_at at time zone 'utc')::date,
+           coalesce(sum(calories), 0), coalesce(sum(protein), 0),
+           coalesce(sum(carbs), 0), coalesce(sum(fat), 0), count(*)
+    from public.meals
+    where p_user_id is null or user_id = p_user_id
+    group by user_id, (created_at at time zone 'utc')::date;
+
+    get diagnostics affected = row_count;
+    return affected;
+end;
+$$;
@@ -0,0 +1,5 @@
+-- Client-generated key per analysis so retried or repeated saves insert one row.
+alter table public.meals add column if not exists idempotency_key uuid;
+
+create unique index if not exists meals_idempotency_key_key
+    on public.meals (idempotency_key);
@@ -0,0 +1,35 @@
+-- Keep daily_nutrition_rollups in step with meals inside the inserting
+-- transaction. Replaces the increment_daily_rollup RPC, which the app called
+-- after each insert: its auth.uid() check failed for writes made on the shared
+-- client (write-behind queue, batch import) and a failed call left the day
+-- short until rollup_maintenance.py check --fix.
+create or replace function public.add_meals_to_daily_rollups()
+returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    insert into public.daily_nutrition_rollups as r (user_id, day, calories, protein, carbs, fat, meal_count)
+    select user_id, (created_at at time zone 'utc')::date,
+           coalesce(sum(calories), 0), coalesce(sum(protein), 0),
+           coalesce(sum(carbs), 0), coalesce(sum(fat), 0), count(*)
+    from inserted_meals
+    group by user_id, (created_at at time zone 'utc')::date
+    on conflict (user_id, day) do update set
+        calories = r.calories + excluded.calories,
+        protein = r.protein + excluded.protein,
+        carbs = r.carbs + excluded.carbs,
+        fat = r.fat + excluded.fat,
+        meal_count = r.meal_count + excluded.meal_count,
+        updated_at = now();
+    return null;
+end;
+$$;
+
+-- One statement-level call per insert; rows skipped by on conflict do nothing are not in inserted_meals
+drop trigger if exists meals_add_to_daily_rollups on public.meals;
+create trigger meals_add_to_daily_rollups
+    after insert on public.meals
+    referencing new table as inserted_meals
+    for each statement execute function public.add_meals_to_daily_rollups();
+
+drop function if exists public.increment_daily_rollup(uuid, date, double precision, double precision,
+                                                      double precision, double precision, integer);
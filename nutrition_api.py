@@ -3,15 +3,22 @@ import os
 from dotenv import load_dotenv
 import json
 
+from nutrition_cache import default_cache
+from http_transport import default_transport
+from local_food_db import default_local_db
+from food_normalizer import normalize_food_name
+from resilience import CircuitOpenError, get_guard
+import metrics
+
 # Load environment variables
 load_dotenv()
 
 class NutritionAPI:
-    def __init__(self):
+    def __init__(self, cache=None, transport=None, local_db=None):
         """Initialize with Nutritionix API credentials"""
         self.app_id = os.getenv('NUTRITIONIX_APP_ID')
         self.app_key = os.getenv('NUTRITIONIX_APP_KEY')
-        self.base_url = "https://trackapi.nutritionix.com/v2"
+        self.base_url = os.getenv('NUTRITIONIX_BASE_URL', "https://trackapi.nutritionix.com/v2")
         
         # Headers for API requests
         self.headers = {
@@ -23,7 +30,23 @@ class NutritionAPI:
         # Check if API keys are loaded
         if not self.app_id or not self.app_key:
             print("⚠️ Nutritionix API keys not found! Please check your .env file")
+        
+        # Bundled food table consulted before any network call
+        self.local_db = local_db if local_db is not None else default_local_db()
+        
+        # Foods packed into one natural-language query by get_nutrition_many
+        self.batch_size = int(os.getenv('NUTRITIONIX_BATCH_SIZE', '8'))
+        
+        # Lookup cache keyed on cleaned food name + serving size
+        self.cache = cache if cache is not None else default_cache()
+        
+        # Pooled keep-alive transport with retries and a concurrency cap
+        self.transport = transport if transport is not None else default_transport()
+        
+        # Shared deadline and circuit breaker: 5xx/429 and network errors count as failures
+        self.guard = get_guard('nutritionix', is_failure=_is_upstream_failure)
     
+    @metrics.timed('nutritionix.get_nutrition')
     def get_nutrition(self, food_name, serving_size="1 serving"):
         """
         Get nutrition information for a food item
@@ -39,6 +62,15 @@ class NutritionAPI:
             # Clean food name for better API results
             cleaned_food = self.clean_food_name(food_name)
             
+            local = self._lookup_local(cleaned_food, serving_size)
+            if local is not None:
+                return local
+            
+            cache_key = self.cache.make_key(cleaned_food, serving_size)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
             # API endpoint for natural language nutrition
             url = f"{self.base_url}/natural/nutrients"
             
@@ -49,11 +81,12 @@ class NutritionAPI:
             }
             
             # Make API request with proper encoding
-            response = requests.post(
+            response = self.guard.call(
+                self.transport.post,
                 url, 
                 headers=self.headers, 
                 json=payload,
-                timeout=10
+                deadline=self.guard.deadline
             )
             response.encoding = 'utf-8'
             
@@ -63,28 +96,8 @@ class NutritionAPI:
                 if data.get('foods') and len(data['foods']) > 0:
                     food_data = data['foods'][0]
                     
-                    # Extract nutrition information
-                    nutrition_info = {
-                        'success': True,
-                        'food_name': food_data.get('food_name', cleaned_food),
-                        'brand_name': food_data.get('brand_name'),
-                        'serving_qty': food_data.get('serving_qty', 1),
-                        'serving_unit': food_data.get('serving_unit', 'serving'),
-                        'serving_weight_grams': food_data.get('serving_weight_grams'),
-                        'calories': food_data.get('nf_calories', 0),
-                        'total_fat': food_data.get('nf_total_fat', 0),
-                        'saturated_fat': food_data.get('nf_saturated_fat', 0),
-                        'cholesterol': food_data.get('nf_cholesterol', 0),
-                        'sodium': food_data.get('nf_sodium', 0),
-                        'total_carbs': food_data.get('nf_total_carbohydrate', 0),
-                        'dietary_fiber': food_data.get('nf_dietary_fiber', 0),
-                        'sugars': food_data.get('nf_sugars', 0),
-                        'protein': food_data.get('nf_protein', 0),
-                        'potassium': food_data.get('nf_potassium', 0),
-                        'photo_url': food_data.get('photo', {}).get('thumb') if food_data.get('photo') else None,
-                        'error': None
-                    }
-                    
+                    nutrition_info = self._build_nutrition_info(food_data, cleaned_food)
+                    self.cache.set(cache_key, nutrition_info)
                     return nutrition_info
                 else:
                     return {
@@ -97,7 +110,12 @@ class NutritionAPI:
                     'error': f'API request failed with status code: {response.status_code}'
                 }
                 
+        except CircuitOpenError as e:
+            return self._unavailable(cleaned_food, serving_size, e)
         except requests.exceptions.RequestException as e:
+            metrics.mark_error(e)
+            if self.guard.state != 'closed':
+                return self._unavailable(cleaned_food, serving_size, e)
             return {
                 'success': False,
                 'error': f'Network error: {str(e)}'
@@ -108,6 +126,136 @@ class NutritionAPI:
                 'error': f'Unexpected error: {str(e)}'
             }
     
+    @metrics.timed('nutritionix.get_nutrition_many')
+    def get_nutrition_many(self, items):
+        """
+        Get nutrition information for several foods in as few requests as possible
+        
+        Args:
+            items (list): Food names, or (food_name, serving_size) pairs
+            
+        Returns:
+            list: One nutrition dict per input item, in the same order
+        """
+        requests_to_make = []
+        for item in items:
+            food_name, serving_size = (item, "1 serving") if isinstance(item, str) else item
+            cleaned_food = self.clean_food_name(food_name)
+            requests_to_make.append((food_name, serving_size, cleaned_food, self.cache.make_key(cleaned_food, serving_size)))
+        
+        results = {}
+        pending = []
+        seen = set()
+        for food_name, serving_size, cleaned_food, cache_key in requests_to_make:
+            if cache_key in seen:
+                continue
+            seen.add(cache_key)
+            local = self._lookup_local(cleaned_food, serving_size)
+            if local is not None:
+                results[cache_key] = local
+                continue
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                results[cache_key] = cached
+            else:
+                pending.append((food_name, serving_size, cleaned_food, cache_key))
+        
+        # One natural-language query per chunk, e.g. "1 cup dal, 2 roti, 1 bowl rice"
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            matched = self._resolve_chunk(chunk) if len(chunk) > 1 else {}
+            for food_name, serving_size, cleaned_food, cache_key in chunk:
+                if cache_key in matched:
+                    results[cache_key] = matched[cache_key]
+                    self.cache.set(cache_key, matched[cache_key])
+                else:
+                    # Partial miss: fall back to a single-item lookup
+                    results[cache_key] = self.get_nutrition(food_name, serving_size)
+        
+        return [dict(results[cache_key]) for _, _, _, cache_key in requests_to_make]
+    
+    def _unavailable(self, cleaned_food, serving_size, error):
+        """While Nutritionix is down: an expired cache entry if we have one, else a fast error"""
+        stale = self.cache.get_stale(self.cache.make_key(cleaned_food, serving_size))
+        if stale is not None:
+            print(f"⚠️ Serving cached nutrition for {cleaned_food}: {error}")
+            return {**stale, 'stale': True}
+        return {
+            'success': False,
+            'error': f'Nutrition lookups are paused while the service recovers ({error}). Please try again in a moment.'
+        }
+    
+    def _lookup_local(self, cleaned_food, serving_size):
+        """Sub-millisecond lookup in the bundled food table, None on a miss"""
+        if self.local_db is None:
+            return None
+        return self.local_db.lookup(cleaned_food, serving_size)
+    
+    def _resolve_chunk(self, chunk):
+        """Send one combined query and map each returned food back to its input"""
+        try:
+            payload = {
+                "query": ', '.join(f"{serving_size} {cleaned_food}" for _, serving_size, cleaned_food, _ in chunk),
+                "timezone": "US/Eastern"
+            }
+            response = self.guard.call(self.transport.post, f"{self.base_url}/natural/nutrients",
+                                       headers=self.headers, json=payload, deadline=self.guard.deadline)
+            response.encoding = 'utf-8'
+            if response.status_code != 200:
+                return {}
+            foods = response.json().get('foods') or []
+        except Exception as e:
+            print(f"⚠️ Batched nutrition lookup failed, falling back to single lookups: {e}")
+            return {}
+        
+        matched = {}
+        if len(foods) == len(chunk):
+            # Nutritionix answers in query order when it parses every item; the same count
+            # can also come from one item split in two and two others merged, so check names
+            pairs = list(zip(chunk, foods))
+            if all(_shared_words(cleaned_food, food_data) for (_, _, cleaned_food, _), food_data in pairs):
+                for (_, _, cleaned_food, cache_key), food_data in pairs:
+                    matched[cache_key] = self._build_nutrition_info(food_data, cleaned_food)
+                return matched
+            print("⚠️ Batched nutrition answer is out of order, falling back to single lookups")
+            return {}
+        
+        # Some items were merged or dropped: match by shared words, best overlap first
+        remaining = list(foods)
+        for _, _, cleaned_food, cache_key in chunk:
+            best, best_score = None, 0
+            for food_data in remaining:
+                score = _shared_words(cleaned_food, food_data)
+                if score > best_score:
+                    best, best_score = food_data, score
+            if best is not None:
+                remaining.remove(best)
+                matched[cache_key] = self._build_nutrition_info(best, cleaned_food)
+        return matched
+    
+    def _build_nutrition_info(self, food_data, cleaned_food):
+        """Extract nutrition information from one Nutritionix food record"""
+        return {
+            'success': True,
+            'food_name': food_data.get('food_name', cleaned_food),
+            'brand_name': food_data.get('brand_name'),
+            'serving_qty': food_data.get('serving_qty', 1),
+            'serving_unit': food_data.get('serving_unit', 'serving'),
+            'serving_weight_grams': food_data.get('serving_weight_grams'),
+            'calories': food_data.get('nf_calories', 0),
+            'total_fat': food_data.get('nf_total_fat', 0),
+            'saturated_fat': food_data.get('nf_saturated_fat', 0),
+            'cholesterol': food_data.get('nf_cholesterol', 0),
+            'sodium': food_data.get('nf_sodium', 0),
+            'total_carbs': food_data.get('nf_total_carbohydrate', 0),
+            'dietary_fiber': food_data.get('nf_dietary_fiber', 0),
+            'sugars': food_data.get('nf_sugars', 0),
+            'protein': food_data.get('nf_protein', 0),
+            'potassium': food_data.get('nf_potassium', 0),
+            'photo_url': food_data.get('photo', {}).get('thumb') if food_data.get('photo') else None,
+            'error': None
+        }
+    
     def clean_food_name(self, food_name):
         """
         Clean food name for better API results
@@ -118,31 +266,8 @@ class NutritionAPI:
         Returns:
             str: Cleaned food name
         """
-        # Remove underscores and special characters
-        cleaned = food_name.replace('_', ' ').replace('-', ' ')
-        
-        # Remove numbers and extra spaces
-        cleaned = ' '.join(word for word in cleaned.split() if not word.isdigit())
-        
-        # Handle common AI detection quirks
-        food_mappings = {
-            'paneer butter masala': 'paneer makhani',
-            'dal makhani': 'dal makhani',
-            'chicken tikka masala': 'chicken tikka masala',
-            'biryani': 'chicken biryani',  # Default to chicken
-            'dosa': 'plain dosa',
-            'idli': 'idli sambar',
-            'roti': 'chapati',
-            'naan': 'garlic naan',
-        }
-        
-        # Check if we have a better mapping
-        cleaned_lower = cleaned.lower().strip()
-        for key, value in food_mappings.items():
-            if key in cleaned_lower:
-                return value
-        
-        return cleaned.strip()
+        # Shared alias normalizer: longest alias wins, typo-tolerant fallback
+        return normalize_food_name(food_name)
     
     def format_nutrition_display(self, nutrition_data):
         """
@@ -176,6 +301,17 @@ class NutritionAPI:
             }
         }
 
+def _shared_words(cleaned_food, food_data):
+    """Words a query item has in common with a returned food's name"""
+    return len(set(cleaned_food.lower().split()) & set(str(food_data.get('food_name', '')).lower().split()))
+
+
+def _is_upstream_failure(outcome):
+    """Network errors, 5xx and 429 count against the breaker; 4xx like "no foods found" don't"""
+    if isinstance(outcome, Exception):
+        return isinstance(outcome, requests.exceptions.RequestException)
+    return outcome.status_code >= 500 or outcome.status_code == 429
+
 # Test function
 def test_nutrition_api():
     """Test the nutrition API with sample foods"""
@@ -0,0 +1,152 @@
+# nutrition_cache.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class NutritionCache:
+    def __init__(self, db_path=None, max_entries=512, ttl_seconds=7 * 24 * 3600, stale_seconds=30 * 24 * 3600):
+        """
+        Two-tier cache for nutrition lookups: an in-process LRU in front of
+        a local SQLite file, so results survive restarts.
+
+        Args:
+            db_path (str): SQLite file path. None disables the persistent tier.
+            max_entries (int): Maximum entries held in memory.
+            ttl_seconds (int): How long an entry stays valid in either tier.
+            stale_seconds (int): How much longer an expired entry is kept for get_stale().
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'stale_hits': 0}
+
+        self._conn = None
+        if db_path:
+            try:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS nutrition_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Nutrition cache file unavailable, using memory only: {e}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(cleaned_food, serving_size):
+        """Builds the cache key from an already-cleaned food name and serving size."""
+        food = ' '.join(cleaned_food.lower().split())
+        serving = ' '.join(str(serving_size).lower().split())
+        return f"{serving}|{food}"
+
+    def get(self, key):
+        """Returns the cached nutrition dict for key, or None on a miss."""
+        return self._get(key, self.ttl_seconds)
+
+    def get_stale(self, key):
+        """
+        Like get(), but also returns entries up to stale_seconds past their TTL.
+        Used while Nutritionix is unavailable, when an old answer beats none.
+        """
+        value = self._get(key, self.ttl_seconds + self.stale_seconds)
+        if value is not None:
+            with self._lock:
+                self.stats['stale_hits'] += 1
+        return value
+
+    def _get(self, key, max_age):
+        now = time.time()
+        keep_for = self.ttl_seconds + self.stale_seconds
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at < max_age:
+                    self._memory.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return dict(value)
+                if now - stored_at >= keep_for:
+                    del self._memory[key]
+                self.stats['expired'] += 1
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, stored_at FROM nutrition_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row is not None:
+                    value, stored_at = json.loads(row[0]), row[1]
+                    if now - stored_at < max_age:
+                        self._put_memory(key, value, stored_at)
+                        self.stats['disk_hits'] += 1
+                        return dict(value)
+                    if now - stored_at >= keep_for:
+                        self._delete_disk(key)
+                    self.stats['expired'] += 1
+
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        """Stores a nutrition dict in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, dict(value), now)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO nutrition_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), now)
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Could not persist nutrition cache entry: {e}")
+
+    def clear(self):
+        """Drops every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM nutrition_cache")
+                self._conn.commit()
+
+    def hit_rate(self):
+        hits = self.stats['hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def _put_memory(self, key, value, stored_at):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _delete_disk(self, key):
+        try:
+            self._conn.execute("DELETE FROM nutrition_cache WHERE key = ?", (key,))
+            self._conn.commit()
+        except sqlite3.Error:
+            pass
+
+
+def default_cache():
+    """Builds a cache from NUTRITION_CACHE_* environment settings."""
+    db_path = os.getenv('NUTRITION_CACHE_PATH', 'nutrition_cache.sqlite3')
+    if db_path.lower() in ('', 'none', 'off'):
+        db_path = None
+    return NutritionCache(
+        db_path=db_path,
+        max_entries=int(os.getenv('NUTRITION_CACHE_SIZE', '512')),
+        ttl_seconds=int(os.getenv('NUTRITION_CACHE_TTL', str(7 * 24 * 3600))),
+        stale_seconds=int(os.getenv('NUTRITION_CACHE_STALE_TTL', str(30 * 24 * 3600)))
+    )
@@ -5,7 +5,8 @@ import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from theme import apply_pookie_theme
 from gpt_advisor import GPTAdvisor
-from database import init_database, get_meals_today, get_user_profile
+from database import init_database, get_meals_today, get_user_profile, MEAL_CHAT_COLUMNS
+from conversation_memory import ConversationMemory
 
 def show_page():
     apply_pookie_theme()
@@ -24,6 +25,9 @@ def show_page():
 
     if "chat_messages" not in st.session_state:
         st.session_state.chat_messages = []
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ConversationMemory()
+    memory = st.session_state.chat_memory
 
     for message in st.session_state.chat_messages:
         with st.chat_message(message["role"]):
@@ -36,9 +40,18 @@ def show_page():
 
         with st.chat_message("assistant"):
             with st.spinner("Pookie is thinking... 💭"):
-                meal_history = get_meals_today(db, user_id)
+                meal_history = get_meals_today(db, user_id, columns=MEAL_CHAT_COLUMNS)
                 advisor = GPTAdvisor()
-                ai_response = advisor.get_chat_suggestion(meal_history, user_profile, prompt)
-                st.markdown(ai_response)
+            
+            # Render tokens as they arrive instead of waiting for the whole reply
+            placeholder = st.empty()
+            ai_response = ""
+            for token in advisor.stream_chat_suggestion(meal_history, user_profile, prompt, memory=memory):
+                ai_response += token
+                placeholder.markdown(ai_response + "▌")
+            ai_response = ai_response.strip()
+            placeholder.markdown(ai_response)
         
-        st.session_state.chat_messages.append({"role": "assistant", "content": ai_response})
\ No newline at end of file
+        st.session_state.chat_messages.append({"role": "assistant", "content": ai_response})
+        # Fold older turns into the rolling summary after the reply is on screen
+        memory.sync(st.session_state.chat_messages, summarizer=advisor.summarize_conversation)
\ No newline at end of file
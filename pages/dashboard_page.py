@@ -2,19 +2,26 @@
 import streamlit as st
 import sys, os
 import plotly.graph_objects as go
-import datetime
+import datetime, math
+import numpy as np
 from collections import defaultdict
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from theme import apply_pookie_theme
-from database import init_database, get_meals_for_date, get_meals_for_date_range
+from database import init_database, get_meals_for_date, get_meals_for_date_range, get_daily_rollups
+from history_analytics import analyze_history, meal_arrays, rollup_arrays, downsample_series
+
+TREND_RANGES = {"7 days": 7, "30 days": 30, "90 days": 90, "1 year": 365, "3 years": 1095}
+# Most points any one trace sends to the browser, however long the range
+CHART_POINT_BUDGET = int(os.getenv('DASHBOARD_CHART_POINTS', '150'))
 
 def calculate_totals(meals):
     # This function is fine, no changes needed
     totals = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0}
     for meal in meals:
-        totals['calories'] += meal.get('calories', 0); totals['protein'] += meal.get('protein', 0)
-        totals['carbs'] += meal.get('carbs', 0); totals['fat'] += meal.get('fat', 0)
+        # Columns can be null (e.g. a meal saved when nutrition lookup failed)
+        totals['calories'] += meal.get('calories') or 0; totals['protein'] += meal.get('protein') or 0
+        totals['carbs'] += meal.get('carbs') or 0; totals['fat'] += meal.get('fat') or 0
     return totals, {}
 
 def analyze_historical_data(meals):
@@ -32,6 +39,34 @@ def analyze_historical_data(meals):
         "max_protein_day": max_protein_day[0], "max_protein": max_protein_day[1]['protein'],
     }
 
+def load_history(db, user_id, start_date, end_date):
+    # One row per day from the rollup table; raw meals only if rollups aren't available
+    rollups = get_daily_rollups(db, user_id, start_date, end_date)
+    if rollups is not None:
+        return analyze_history(rollup_arrays(rollups), start_date, end_date)
+    return analyze_history(meal_arrays(get_meals_for_date_range(db, user_id, start_date, end_date)), start_date, end_date)
+
+def build_trend_figures(history, point_budget=CHART_POINT_BUDGET):
+    # Logged days only (a day with nothing logged isn't a zero-calorie day), each trace downsampled to the budget
+    logged, totals = history['logged'], history['totals']
+    days = history['days'][logged]
+    layout = dict(height=320, margin=dict(l=10, r=10, t=40, b=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                  font=dict(family='Quicksand, sans-serif', color='#c2185b'), legend=dict(orientation='h', y=-0.2))
+
+    calories = go.Figure(layout=dict(title="Calories 🔥", **layout))
+    x, y = downsample_series(days, totals['calories'][logged], point_budget)
+    calories.add_trace(go.Scatter(x=x, y=y, mode='lines+markers', name='Daily kcal', line=dict(color='#e91e63')))
+    rolling = history['rolling_7']
+    has_average = ~np.isnan(rolling)
+    x, y = downsample_series(history['days'][has_average], rolling[has_average], point_budget)
+    calories.add_trace(go.Scatter(x=x, y=y, mode='lines', name='7-day average', line=dict(color='#9c27b0', dash='dot')))
+
+    macros = go.Figure(layout=dict(title="Macros (g) 💪", **layout))
+    for field, label, color in (('protein', 'Protein', '#e91e63'), ('carbs', 'Carbs', '#ff9800'), ('fat', 'Fat', '#9c27b0')):
+        x, y = downsample_series(days, totals[field][logged], point_budget)
+        macros.add_trace(go.Scatter(x=x, y=y, mode='lines', name=label, line=dict(color=color)))
+    return calories, macros
+
 def show_page():
     apply_pookie_theme()
     st.markdown("<h1 class='main-title'>Your Dashboard 📊</h1>", unsafe_allow_html=True)
@@ -40,19 +75,42 @@ def show_page():
     st.markdown("---")
     db = init_database()
     user_id = st.session_state.user.id
+    
+    end_date = datetime.date.today(); start_date = end_date - datetime.timedelta(days=30)
+    best_day_stats = load_history(db, user_id, start_date, end_date)
+    
+    # Just the selected day; cut out of a cached 30-day window instead if one is already there
     meals_for_day = get_meals_for_date(db, user_id, selected_date)
     
     if not meals_for_day:
         st.info(f"You haven't logged any meals on {selected_date.strftime('%B %d, %Y')}, cutie!")
     else:
-        # The daily totals display logic is fine, no changes needed
-        pass
+        day_totals, _ = calculate_totals(meals_for_day)
+        st.markdown(f'<div class="nutrition-card"><h3 class="section-title">🍽️ {selected_date.strftime("%B %d, %Y")}</h3></div>', unsafe_allow_html=True)
+        cols = st.columns(4)
+        cols[0].metric("🔥 Calories", f"{day_totals['calories']:.0f}")
+        cols[1].metric("💪 Protein", f"{day_totals['protein']:.1f}g")
+        cols[2].metric("🌾 Carbs", f"{day_totals['carbs']:.1f}g")
+        cols[3].metric("🥑 Fat", f"{day_totals['fat']:.1f}g")
+        for meal in meals_for_day:
+            logged_at = datetime.datetime.fromisoformat(meal['created_at'].replace('Z', '+00:00')).strftime('%H:%M')
+            st.markdown(f"<p class='cute-tagline'>{logged_at} · {meal['food_name']} · {(meal.get('calories') or 0):.0f} kcal</p>", unsafe_allow_html=True)
+
+    st.markdown("---")
+    st.markdown('<h2 class="section-title" style="text-align:center;">Your Trends 📈</h2>', unsafe_allow_html=True)
+    trend_range = st.radio("Range", list(TREND_RANGES), index=1, horizontal=True, label_visibility="collapsed")
+    trend_start = end_date - datetime.timedelta(days=TREND_RANGES[trend_range])
+    trend_history = best_day_stats if trend_start == start_date else load_history(db, user_id, trend_start, end_date)
+    if trend_history is None:
+        st.info("Log a few meals to see your trends, pookie!")
+    else:
+        calorie_chart, macro_chart = build_trend_figures(trend_history)
+        chart_col1, chart_col2 = st.columns(2)
+        chart_col1.plotly_chart(calorie_chart, use_container_width=True, config={'displayModeBar': False})
+        chart_col2.plotly_chart(macro_chart, use_container_width=True, config={'displayModeBar': False})
 
     st.markdown("---")
     st.markdown('<h2 class="section-title" style="text-align:center;">Your Hall of Fame 🏆</h2>', unsafe_allow_html=True)
-    end_date = datetime.date.today(); start_date = end_date - datetime.timedelta(days=30)
-    historical_meals = get_meals_for_date_range(db, user_id, start_date, end_date)
-    best_day_stats = analyze_historical_data(historical_meals)
     
     if best_day_stats is None:
         st.info("Log a few more meals to unlock your Hall of Fame!")
@@ -77,4 +135,7 @@ def show_page():
                     <p>on {best_day_stats['max_protein_day'].strftime('%B %d, %Y')}</p>
                     <p>Incredible work building muscle!</p>
                 </div>
-            """, unsafe_allow_html=True)
\ No newline at end of file
+            """, unsafe_allow_html=True)
+        weekly_average = best_day_stats['rolling_7'][-1]
+        weekly_text = f"{weekly_average:.0f} kcal a day this week" if not math.isnan(weekly_average) else "no meals logged this week"
+        st.markdown(f"<p class='cute-tagline'>🔥 {best_day_stats['current_streak']}-day logging streak (best {best_day_stats['longest_streak']}) · {weekly_text}</p>", unsafe_allow_html=True)
\ No newline at end of file
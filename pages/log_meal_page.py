@@ -1,7 +1,6 @@
 # pages/log_meal_page.py
 import streamlit as st
-from PIL import Image
-import sys, os, time
+import sys, os, time, uuid
 
 # Allow imports from the root directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -9,7 +8,9 @@ from theme import apply_pookie_theme
 from food_detection import FoodDetector
 from nutrition_api import NutritionAPI
 from gpt_advisor import GPTAdvisor
-from database import init_database, save_meal
+from database import init_database
+from meal_save_queue import default_meal_save_queue
+from analysis_pipeline import AnalysisPipeline
 
 # --- Cached Model Loading ---
 @st.cache_resource
@@ -18,10 +19,21 @@ def load_food_detector(): return FoodDetector()
 def load_nutrition_api(): return NutritionAPI()
 @st.cache_resource
 def load_gpt_advisor(): return GPTAdvisor()
+@st.cache_resource
+def load_meal_save_queue(): return default_meal_save_queue(init_database())
+
+def get_analysis_pipeline():
+    """Per-session pipeline holding speculative nutrition/advice work."""
+    if 'analysis_pipeline' not in st.session_state:
+        st.session_state.analysis_pipeline = AnalysisPipeline(load_nutrition_api(), load_gpt_advisor())
+    return st.session_state.analysis_pipeline
 
 def reset_analysis_state():
     """Resets session state for a new analysis."""
-    keys_to_reset = ['analysis_triggered', 'detection_result', 'final_food_name', 'analysis_complete', 'image_to_analyze']
+    # Stale speculative work from the previous photo is no longer wanted
+    if 'analysis_pipeline' in st.session_state:
+        st.session_state.analysis_pipeline.cancel()
+    keys_to_reset = ['analysis_triggered', 'detection_result', 'final_food_name', 'analysis_complete', 'image_to_analyze', 'meal_idempotency_key', 'meal_saved', 'unavailable_food_input']
     for key in keys_to_reset:
         if key in st.session_state:
             del st.session_state[key]
@@ -77,16 +89,34 @@ def show_page():
 
 # --- Analysis Function (Complete and Unabridged) ---
 def analyze_food(image, user_profile):
-    detector, nutrition_api, advisor = load_food_detector(), load_nutrition_api(), load_gpt_advisor()
+    detector = load_food_detector()
+    pipeline = get_analysis_pipeline()
     db = init_database()
 
     if 'detection_result' not in st.session_state or st.session_state.detection_result is None:
         with st.spinner("🌸 Working some magic... ✨"):
-            pil_image = Image.open(image)
-            st.session_state.detection_result = detector.detect_food(pil_image)
+            # Hand over the raw upload so the detector can decode it in draft mode
+            st.session_state.detection_result = detector.detect_food(image)
+            
+            result = st.session_state.detection_result
+            if result['success']:
+                # Resolve every candidate while the user is still choosing, and
+                # start advice for the top pick since it is usually the right one
+                pipeline.prefetch_nutrition([result['food_name']] + [alt['name'] for alt in result['alternatives']])
+                if os.getenv('NUTRILENS_SPECULATIVE_ADVICE', '1') == '1':
+                    pipeline.advice(result['food_name'], user_profile)
     
     result = st.session_state.detection_result
         
+    if not result['success'] and result.get('service_unavailable'):
+        # Photo recognition is down: let the user name the food and carry on
+        st.markdown(f'<div class="error-message"><h4>🌸 My camera eyes need a little rest! 💕</h4><p>{result["error"]}</p></div>', unsafe_allow_html=True)
+        manual_food = st.text_input("Tell me what you ate instead, cutie! 💖", key="unavailable_food_input")
+        if not manual_food:
+            return
+        st.session_state.detection_result = result = {'success': True, 'food_name': manual_food, 'confidence': None, 'alternatives': [], 'error': None}
+        pipeline.prefetch_nutrition([manual_food])
+
     if not result['success']:
         st.markdown(f'<div class="error-message"><h4>🌸 Oopsie! Something went wrong! 💕</h4><p>Error: {result["error"]}</p></div>', unsafe_allow_html=True)
         return
@@ -118,11 +148,13 @@ def analyze_food(image, user_profile):
 
     if final_food_name and not st.session_state.get('analysis_complete', False):
         with st.spinner(f"✨ Analyzing {final_food_name} for you..."):
-            nutrition_data = nutrition_api.get_nutrition(final_food_name)
-            advice = advisor.generate_advice(final_food_name, nutrition_data, user_profile)
+            nutrition_data = pipeline.nutrition(final_food_name).result()
+            advice = pipeline.advice(final_food_name, user_profile).result()
             
             st.session_state.nutrition_data = nutrition_data
             st.session_state.advice = advice
+            # One key per analysis: however often the page reruns, the meal is stored once
+            st.session_state.meal_idempotency_key = str(uuid.uuid4())
             st.session_state.analysis_complete = True
             st.rerun()
 
@@ -151,5 +183,9 @@ def analyze_food(image, user_profile):
         st.balloons()
         st.markdown('<div class="encouragement-card"><h4 style="color: #e91e63;">🌟 You\'re doing great, queen! 🌟</h4></div>', unsafe_allow_html=True)
         
-        user_id = st.session_state.user.id
-        save_meal(db, user_id, st.session_state.nutrition_data, st.session_state.advice)
\ No newline at end of file
+        if db and not st.session_state.get('meal_saved', False):
+            user_id = st.session_state.user.id
+            st.session_state.meal_saved = load_meal_save_queue().enqueue(
+                user_id, st.session_state.nutrition_data, st.session_state.advice,
+                st.session_state.meal_idempotency_key
+            )
\ No newline at end of file
@@ -0,0 +1,283 @@
+# resilience.py
+# Process-wide guards for the external providers: a deadline per call, a
+# circuit breaker that fails fast while a provider is browning out, and
+# optional hedging (a duplicate request once the first has run past the
+# provider's recent p95). Configured per provider from the environment:
+#   NUTRITIONIX_DEADLINE=6  NUTRITIONIX_BREAKER_THRESHOLD=5  NUTRITIONIX_BREAKER_RESET=30
+#   NUTRITIONIX_HEDGE=1     NUTRITIONIX_HEDGE_MIN_DELAY=0.2
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+# Gauge values for nutrilens_circuit_state
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Deadline in seconds for one logical call (all retries included)
+DEFAULT_DEADLINES = {'nutritionix': 6.0, 'clarifai': 10.0, 'openai': 20.0}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+    def __init__(self, provider, retry_in):
+        super().__init__(f"{provider} is temporarily unavailable (retrying in {retry_in:.0f}s)")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def _failed(outcome):
+    return isinstance(outcome, Exception)
+
+
+_hedge_executor = None
+_hedge_lock = threading.Lock()
+
+
+def get_hedge_executor():
+    """Worker pool for hedged calls, separate from the analysis pool so hedges never queue behind it."""
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('NUTRILENS_HEDGE_WORKERS', '16')),
+                    thread_name_prefix='nutrilens-hedge'
+                )
+    return _hedge_executor
+
+
+class ProviderGuard:
+    def __init__(self, name, deadline=None, failure_threshold=5, reset_timeout=30.0,
+                 hedge=False, hedge_min_delay=0.2, is_failure=_failed, latency_window=256):
+        """
+        Circuit breaker, deadline and hedging policy for one provider.
+
+        The breaker opens after failure_threshold consecutive failures and
+        rejects calls for reset_timeout seconds; then one trial call is let
+        through (half-open) and its outcome closes or re-opens the breaker.
+
+        Args:
+            name (str): Provider name used in errors and metric labels
+            deadline (float): Seconds a caller should allow one logical call (None for no limit)
+            failure_threshold (int): Consecutive failures that open the breaker
+            reset_timeout (float): Seconds the breaker stays open before a trial call
+            hedge (bool): Send a duplicate request when the first runs past the recent p95
+            hedge_min_delay (float): Never hedge earlier than this many seconds
+            is_failure (callable): Given a result or exception, whether it counts against the provider
+            latency_window (int): Successful latencies kept for the p95 estimate
+        """
+        self.name = name
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.is_failure = is_failure
+        self._latencies = deque(maxlen=latency_window)
+        self._p95 = None
+        self._since_p95 = 0
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0, 'hedged': 0, 'hedge_wins': 0}
+        metrics.set_gauge('nutrilens_circuit_state', 0, 'Breaker state per provider (0 closed, 1 half-open, 2 open).',
+                          provider=name)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call fn through the breaker (hedged if enabled) and record the outcome.
+
+        Raises:
+            CircuitOpenError: If the breaker is open; fn is not called.
+        """
+        trial = self._admit()
+        started = time.perf_counter()
+        finished = False
+        try:
+            result = self._hedged(fn, args, kwargs) if self.hedge else fn(*args, **kwargs)
+            finished = True
+        except Exception as e:
+            finished = True
+            self._record(self.is_failure(e), time.perf_counter() - started, trial)
+            raise
+        finally:
+            if trial and not finished:
+                # KeyboardInterrupt/SystemExit say nothing about the provider: free the slot for the next trial
+                with self._lock:
+                    self._trial_running = False
+        self._record(self.is_failure(result), time.perf_counter() - started, trial)
+        return result
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Like call, for a fn that returns an iterator (e.g. a streamed completion).
+        Yields its items; the outcome is recorded once the iterator is exhausted
+        or fails part way, not when the first byte arrives. Never hedged.
+
+        Raises:
+            CircuitOpenError: On the first next() if the breaker is open; fn is not called.
+        """
+        trial = self._admit()
+        started = time.perf_counter()
+        finished = False
+        try:
+            yield from fn(*args, **kwargs)
+            finished = True
+        except Exception as e:
+            finished = True
+            self._record(self.is_failure(e), time.perf_counter() - started, trial)
+            raise
+        finally:
+            if trial and not finished:
+                # The consumer stopped early (or was interrupted): no verdict, free the slot
+                with self._lock:
+                    self._trial_running = False
+        self._record(False, time.perf_counter() - started, trial)
+
+    def hedge_delay(self):
+        """
+        Seconds to wait before hedging: the recent p95. None until enough calls
+        were seen, and while failures are piling up (hedging a brownout only adds load).
+        """
+        with self._lock:
+            if self._p95 is None or self._failures:
+                return None
+            return max(self.hedge_min_delay, self._p95)
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._set_state(CLOSED)
+
+    def _admit(self):
+        with self._lock:
+            self.stats['calls'] += 1
+            if self._state == CLOSED:
+                return False
+            waited = time.monotonic() - self._opened_at
+            if self._state == OPEN and waited >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.stats['rejected'] += 1
+        metrics.inc_counter('nutrilens_circuit_rejected_total', 'Calls failed fast by an open breaker.', provider=self.name)
+        raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - waited))
+
+    def _record(self, failed, seconds, trial):
+        with self._lock:
+            if trial:
+                self._trial_running = False
+            if failed:
+                self.stats['failures'] += 1
+                self._failures += 1
+                if trial or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                    self._opened_at = time.monotonic()
+                    self.stats['opened'] += 1
+                    self._set_state(OPEN)
+                    print(f"⚠️ {self.name} circuit opened after {self._failures} failures; failing fast for {self.reset_timeout:.0f}s")
+                return
+            self._failures = 0
+            self._latencies.append(seconds)
+            self._since_p95 += 1
+            # Re-sort every 8 successes rather than on every call
+            if len(self._latencies) >= 20 and self._since_p95 >= 8:
+                ordered = sorted(self._latencies)
+                self._p95 = ordered[int(0.95 * (len(ordered) - 1))]
+                self._since_p95 = 0
+            if trial:
+                self._set_state(CLOSED)
+                print(f"✅ {self.name} circuit closed again")
+
+    def _set_state(self, state):
+        # Caller holds self._lock
+        if state != self._state:
+            self._state = state
+            metrics.set_gauge('nutrilens_circuit_state', STATE_CODES[state],
+                              'Breaker state per provider (0 closed, 1 half-open, 2 open).', provider=self.name)
+            metrics.inc_counter('nutrilens_circuit_transitions_total', 'Breaker state changes per provider.',
+                                provider=self.name, state=state)
+
+    def _hedged(self, fn, args, kwargs):
+        """Run fn; if it is still going after hedge_delay(), race a second copy and keep the first good answer"""
+        delay = self.hedge_delay()
+        if delay is None:
+            return fn(*args, **kwargs)
+
+        executor = get_hedge_executor()
+        # Each attempt runs in a copy of the caller's context so metrics land on the caller's span
+        first = executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        with self._lock:
+            self.stats['hedged'] += 1
+        metrics.inc_counter('nutrilens_hedged_requests_total', 'Duplicate requests sent after the p95 delay.',
+                            provider=self.name)
+        second = executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if not self.is_failure(error if error is not None else future.result()):
+                    if future is second:
+                        with self._lock:
+                            self.stats['hedge_wins'] += 1
+                    return future.result()
+        # Both failed: surface the original attempt's outcome
+        return first.result()
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(name, is_failure=_failed):
+    """
+    Process-wide guard for a provider, configured from {NAME}_DEADLINE,
+    {NAME}_BREAKER_THRESHOLD, {NAME}_BREAKER_RESET, {NAME}_HEDGE and
+    {NAME}_HEDGE_MIN_DELAY. Shared so one session's timeouts spare the others.
+    """
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None:
+            prefix = name.upper()
+            deadline = float(os.getenv(f'{prefix}_DEADLINE', str(DEFAULT_DEADLINES.get(name, 10.0))))
+            guard = ProviderGuard(
+                name,
+                deadline=deadline if deadline > 0 else None,
+                failure_threshold=int(os.getenv(f'{prefix}_BREAKER_THRESHOLD', '5')),
+                reset_timeout=float(os.getenv(f'{prefix}_BREAKER_RESET', '30')),
+                hedge=os.getenv(f'{prefix}_HEDGE', '0') == '1',
+                hedge_min_delay=float(os.getenv(f'{prefix}_HEDGE_MIN_DELAY', '0.2')),
+                is_failure=is_failure,
+            )
+            _guards[name] = guard
+        return guard
+
+
+def guard_states():
+    """One dict per provider guard, e.g. for the debug panel."""
+    with _guards_lock:
+        guards = list(_guards.values())
+    return [{'provider': guard.name, 'state': guard.state, 'deadline_s': guard.deadline,
+             'p95_ms': guard._p95 * 1000 if guard._p95 is not None else None, **guard.stats}
+            for guard in guards]
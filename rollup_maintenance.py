@@ -0,0 +1,116 @@
+# rollup_maintenance.py
+# Backfill and consistency checks for the daily_nutrition_rollups table
+# (see migrations/002_daily_nutrition_rollups.sql). Needs the service key:
+#   python rollup_maintenance.py backfill
+#   python rollup_maintenance.py check --days 90 --fix
+import os
+import argparse
+import datetime
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+from database import iter_meals, meal_day
+
+load_dotenv()
+
+PAGE_SIZE = 1000
+TOLERANCE = 0.01
+ROLLUP_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'meal_count')
+
+
+def _paged(query_builder, page_size=PAGE_SIZE):
+    """Yields rows from a PostgREST query, one page at a time."""
+    start = 0
+    while True:
+        rows = query_builder().range(start, start + page_size - 1).execute().data
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def backfill(db, user_id=None):
+    """Rebuilds rollups from the meals table for every user, or just one."""
+    response = db.rpc('rebuild_daily_rollups', {'p_user_id': user_id}).execute()
+    print(f"✅ Rebuilt {response.data} daily rollup rows")
+    return response.data
+
+
+def recompute_rollups(db, user_id=None, since=None):
+    """Aggregates meals into {(user_id, day): totals} the same way the meals insert trigger does."""
+    totals = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+    for meal in iter_meals(db, user_id, since, columns="id, created_at, user_id, calories, protein, carbs, fat"):
+        day = totals[(meal['user_id'], meal_day(meal))]
+        for field in ('calories', 'protein', 'carbs', 'fat'):
+            day[field] += meal.get(field) or 0
+        day['meal_count'] += 1
+    return totals
+
+
+def load_rollups(db, user_id=None, since=None):
+    def query():
+        q = db.table('daily_nutrition_rollups').select("user_id, day, calories, protein, carbs, fat, meal_count")
+        if user_id:
+            q = q.eq('user_id', user_id)
+        if since:
+            q = q.gte('day', since.isoformat())
+        return q.order('user_id').order('day')
+
+    return {
+        (row['user_id'], datetime.date.fromisoformat(row['day'])): {field: row[field] or 0 for field in ROLLUP_FIELDS}
+        for row in _paged(query)
+    }
+
+
+def check(db, user_id=None, days=None, fix=False):
+    """
+    Compares stored rollups against totals recomputed from meals.
+
+    Returns:
+        list: (user_id, day, expected, stored) for every mismatched day
+    """
+    since = datetime.datetime.utcnow().date() - datetime.timedelta(days=days) if days else None
+    expected = recompute_rollups(db, user_id, since)
+    stored = load_rollups(db, user_id, since)
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=lambda k: (str(k[0]), k[1])):
+        want = expected.get(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+        have = stored.get(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+        if any(abs(want[field] - have[field]) > TOLERANCE for field in ROLLUP_FIELDS):
+            mismatches.append((key[0], key[1], want, have))
+
+    for user, day, want, have in mismatches:
+        print(f"❌ {user} {day}: expected {want}, stored {have}")
+    print(f"{'✅' if not mismatches else '⚠️'} {len(expected)} days checked, {len(mismatches)} mismatched")
+
+    if fix:
+        for user in sorted({user for user, _, _, _ in mismatches}):
+            backfill(db, user)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain NutriLens daily nutrition rollups.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = sub.add_parser('backfill', help="Rebuild rollups from the meals table")
+    backfill_parser.add_argument('--user', help="Only rebuild this user's rollups")
+    check_parser = sub.add_parser('check', help="Compare rollups against the meals table")
+    check_parser.add_argument('--user', help="Only check this user")
+    check_parser.add_argument('--days', type=int, help="Only check the last N days")
+    check_parser.add_argument('--fix', action='store_true', help="Rebuild every user with a mismatch")
+    args = parser.parse_args()
+
+    from supabase import create_client
+    db = create_client(os.environ["SUPABASE_URL"], os.getenv("SUPABASE_SERVICE_KEY") or os.environ["SUPABASE_KEY"])
+
+    if args.command == 'backfill':
+        backfill(db, args.user)
+    else:
+        mismatches = check(db, args.user, args.days, args.fix)
+        raise SystemExit(1 if mismatches and not args.fix else 0)
+
+
+if __name__ == "__main__":
+    main()
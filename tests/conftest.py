@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# The app is a flat set of top-level modules; make them importable from tests/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def postgrest():
+    """In-memory PostgREST, for tests that talk to the database through the supabase client"""
+    from fake_services.postgrest_server import FakePostgRESTServer
+
+    server = FakePostgRESTServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def db(postgrest):
+    supabase = pytest.importorskip('supabase')
+    return supabase.create_client(postgrest.supabase_url, 'fake-key')
@@ -0,0 +1,63 @@
+import datetime
+
+import pytest
+
+pytest.importorskip('supabase')
+pytest.importorskip('openai')
+
+from completion_cache import CompletionCache
+from daily_precompute import run_daily_precompute
+from gpt_advisor import GPTAdvisor
+
+
+class StubAdvisor:
+    def __init__(self, tip=None, summary=None):
+        self.tip, self.summary = tip, summary
+        self.tip_days = []
+
+    def generate_daily_tip(self, user_profile, use_cache=True, day=None, fallback=True):
+        self.tip_days.append(day)
+        return self.tip
+
+    def generate_daily_summary(self, user_profile, day_totals, use_cache=True):
+        return self.summary
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.calls > 1:
+            raise RuntimeError("model unavailable")
+        message = type('Message', (), {'content': 'Drink water 💧'})
+        return type('Response', (), {'choices': [type('Choice', (), {'message': message})]})
+
+
+def test_failed_tip_is_not_written_and_keeps_earlier_tip(postgrest, db):
+    day = datetime.date(2026, 10, 1)
+    postgrest.seed('profiles', [{'id': 'u1', 'goal': 'Lose Weight'}])
+    postgrest.seed('daily_insights', [{'user_id': 'u1', 'day': day.isoformat(), 'tip': 'Earlier tip', 'summary': None}])
+    advisor = StubAdvisor(tip=None)
+
+    result = run_daily_precompute(db, advisor, day=day, max_workers=1)
+
+    assert advisor.tip_days == [day]
+    assert result['failed_tips'] == 1 and result['rows_written'] == 0
+    assert postgrest.tables['daily_insights'] == [{'user_id': 'u1', 'day': day.isoformat(), 'tip': 'Earlier tip', 'summary': None}]
+
+
+def test_tip_cache_is_keyed_by_the_requested_day():
+    advisor = GPTAdvisor(cache=CompletionCache())
+    completions = FakeCompletions()
+    advisor.client = type('Client', (), {'chat': type('Chat', (), {'completions': completions})})
+    advisor.guard.reset()
+
+    first = advisor.generate_daily_tip({'goal': 'Lose Weight'}, day=datetime.date(2026, 10, 1))
+    same_day = advisor.generate_daily_tip({'goal': 'Lose Weight'}, day=datetime.date(2026, 10, 1))
+    next_day = advisor.generate_daily_tip({'goal': 'Lose Weight'}, day=datetime.date(2026, 10, 2), fallback=False)
+
+    assert first == same_day == 'Drink water 💧'
+    assert completions.calls == 2
+    assert next_day is None
@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip('plotly')
+
+from pages.dashboard_page import calculate_totals
+
+
+def test_calculate_totals_treats_null_nutrients_as_zero():
+    meals = [
+        {'calories': 300.0, 'protein': 10.0, 'carbs': 40.0, 'fat': 8.0},
+        {'calories': None, 'protein': None, 'carbs': None, 'fat': None},
+        {'calories': 150.0},
+    ]
+
+    totals, _ = calculate_totals(meals)
+
+    assert totals == {'calories': 450.0, 'protein': 10.0, 'carbs': 40.0, 'fat': 8.0}
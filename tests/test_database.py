@@ -0,0 +1,92 @@
+import datetime
+
+import pytest
+
+pytest.importorskip('supabase')
+
+import database
+
+
+def test_get_daily_rollups_reads_past_max_rows(postgrest, db):
+    end = datetime.date(2026, 10, 1)
+    days = [end - datetime.timedelta(days=offset) for offset in range(1096)]
+    postgrest.seed('daily_nutrition_rollups', [
+        {'user_id': 'u1', 'day': day.isoformat(), 'calories': 2000.0, 'protein': 80.0,
+         'carbs': 250.0, 'fat': 70.0, 'meal_count': 3}
+        for day in days
+    ])
+    database._user_cache.invalidate('u1')
+
+    rollups = database.get_daily_rollups(db, 'u1', end - datetime.timedelta(days=1095), end)
+
+    assert len(rollups) == 1096 > postgrest.max_rows
+    assert rollups[0]['day'] == days[-1]
+    assert rollups[-1]['day'] == end
+    assert [row['day'] for row in rollups] == sorted(days)
+
+
+def test_get_daily_rollups_page_boundary(postgrest, db):
+    start = datetime.date(2026, 1, 1)
+    postgrest.seed('daily_nutrition_rollups', [
+        {'user_id': 'u2', 'day': (start + datetime.timedelta(days=offset)).isoformat(), 'calories': 1.0,
+         'protein': 0.0, 'carbs': 0.0, 'fat': 0.0, 'meal_count': 1}
+        for offset in range(10)
+    ])
+    database._user_cache.invalidate('u2')
+
+    rollups = database.get_daily_rollups(db, 'u2', start, start + datetime.timedelta(days=9), page_size=5)
+
+    assert len(rollups) == 10
+
+
+def test_selected_day_is_cut_out_of_fetched_window(postgrest, db, monkeypatch):
+    end = datetime.date(2026, 10, 1)
+    postgrest.seed('meals', [
+        {'user_id': 'u3', 'created_at': f'{(end - datetime.timedelta(days=offset)).isoformat()}T12:00:00+00:00',
+         'food_name': f'meal {offset}', 'calories': 100.0, 'protein': 1.0, 'carbs': 1.0, 'fat': 1.0}
+        for offset in range(30)
+    ])
+    database._user_cache.invalidate('u3')
+    reads = []
+    iter_meals = database.iter_meals
+    monkeypatch.setattr(database, 'iter_meals', lambda *args, **kwargs: reads.append(args) or iter_meals(*args, **kwargs))
+
+    window = database.get_meals_for_date_range(db, 'u3', end - datetime.timedelta(days=29), end)
+    day = database.get_meals_for_date(db, 'u3', end - datetime.timedelta(days=3))
+
+    assert len(window) == 30
+    assert [meal['food_name'] for meal in day] == ['meal 3']
+    assert len(reads) == 1
+
+
+def test_selected_day_without_cached_window_reads_only_that_day(postgrest, db, monkeypatch):
+    day = datetime.date(2026, 10, 1)
+    postgrest.seed('meals', [
+        {'user_id': 'u4', 'created_at': f'{(day - datetime.timedelta(days=offset)).isoformat()}T12:00:00+00:00',
+         'food_name': f'meal {offset}', 'calories': 100.0, 'protein': 1.0, 'carbs': 1.0, 'fat': 1.0}
+        for offset in range(3)
+    ])
+    database._user_cache.invalidate('u4')
+    reads = []
+    iter_meals = database.iter_meals
+    monkeypatch.setattr(database, 'iter_meals', lambda *args, **kwargs: reads.append(args[2:4]) or iter_meals(*args, **kwargs))
+
+    meals = database.get_meals_for_date(db, 'u4', day)
+
+    assert [meal['food_name'] for meal in meals] == ['meal 0']
+    assert reads == [(day, day)]
+
+
+def test_insert_meals_updates_rollups_for_every_user(postgrest, db):
+    created_at = datetime.datetime(2026, 10, 1, 8, tzinfo=datetime.timezone.utc)
+    rows = [database.build_meal_row(user_id, {'food_name': 'poha', 'calories': 250.0, 'protein': 5.0,
+                                              'total_carbs': 45.0, 'total_fat': 6.0}, None, key, created_at)
+            for user_id, key in (('u5', 'a0000000-0000-4000-8000-000000000001'),
+                                 ('u6', 'a0000000-0000-4000-8000-000000000002'))]
+
+    database.insert_meals(db, rows)
+    database.insert_meals(db, rows)
+
+    rollups = {row['user_id']: row for row in postgrest.tables['daily_nutrition_rollups']}
+    assert rollups['u5']['meal_count'] == rollups['u6']['meal_count'] == 1
+    assert rollups['u5']['calories'] == 250.0
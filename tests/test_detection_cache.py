@@ -0,0 +1,52 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from detection_cache import DetectionCache, content_hash
+
+
+def jpeg_bytes(color=(200, 120, 40)):
+    buffered = BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffered, format='JPEG')
+    return buffered.getvalue()
+
+
+def test_cached_results_are_isolated_from_callers():
+    cache = DetectionCache()
+    result = {'success': True, 'food_name': 'Poha', 'alternatives': [{'name': 'Upma', 'confidence': 0.2}]}
+    cache.set('key', 0, result)
+    result['alternatives'].append({'name': 'changed after set'})
+
+    first = cache.get('key', 0)
+    first['alternatives'][0]['name'] = 'changed by caller'
+
+    assert cache.get('key', 0)['alternatives'] == [{'name': 'Upma', 'confidence': 0.2}]
+    assert cache.get_exact('key')['alternatives'] == [{'name': 'Upma', 'confidence': 0.2}]
+
+
+def test_exact_reupload_skips_preprocessing(monkeypatch):
+    pytest.importorskip('clarifai_grpc')
+    from food_detection import FoodDetector
+
+    monkeypatch.delenv('CLARIFAI_PAT', raising=False)
+    detector = FoodDetector()
+    detector.model_loaded = True
+    detector.cache = DetectionCache()
+    raw = jpeg_bytes()
+    detector.cache.set(content_hash(raw), 0, {'success': True, 'food_name': 'Poha', 'alternatives': []})
+
+    def no_prepare(image):
+        raise AssertionError("cache hit should not preprocess")
+
+    monkeypatch.setattr(detector, '_prepare', no_prepare)
+
+    assert detector.detect_food(BytesIO(raw))['food_name'] == 'Poha'
+    assert detector.cache.stats['hits'] == 1
+
+
+def test_prepared_exact_key_is_the_upload_hash():
+    from image_preprocessing import prepare_image
+
+    raw = jpeg_bytes()
+    assert prepare_image(BytesIO(raw))['exact_key'] == content_hash(raw)
@@ -0,0 +1,48 @@
+import pytest
+
+from food_normalizer import FoodNameNormalizer
+
+
+@pytest.fixture(scope='module')
+def normalizer():
+    return FoodNameNormalizer()
+
+
+@pytest.mark.parametrize('name', ['dal', 'daal', 'dhal', 'dahl', 'Bowl of Dal'])
+def test_dal_spellings(normalizer, name):
+    assert normalizer.normalize(name) == 'dal'
+
+
+@pytest.mark.parametrize('name', ['curd rice', 'roti canai', 'hyderabadi biryani'])
+def test_multi_word_dish_is_not_collapsed_into_one_word(normalizer, name):
+    assert normalizer.normalize(name) == name
+
+
+@pytest.mark.parametrize('name', ['idle', 'dahl'])
+def test_short_word_is_not_guessed_from_a_neighbour(normalizer, name):
+    assert normalizer.normalize(name) not in ('idli sambar', 'curd')
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('biriyani', 'chicken biryani'),
+    ('chiken biryani', 'chicken biryani'),
+    ('paneer buter masala', 'paneer makhani'),
+    ('chapatti', 'chapati'),
+    ('dhal makhani', 'dal makhani'),
+])
+def test_typos_still_resolve(normalizer, name, expected):
+    assert normalizer.normalize(name) == expected
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('dahi', 'curd'),
+    ('roti', 'chapati'),
+    ('Masala_Dosa', 'masala dosa'),
+    ('a plate of biryani', 'chicken biryani'),
+])
+def test_exact_aliases(normalizer, name, expected):
+    assert normalizer.normalize(name) == expected
+
+
+def test_unknown_name_is_only_cleaned(normalizer):
+    assert normalizer.normalize('sambar_rice 2') == 'sambar rice'
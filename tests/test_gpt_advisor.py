@@ -0,0 +1,32 @@
+import pytest
+
+openai = pytest.importorskip('openai')
+httpx = pytest.importorskip('httpx')
+
+from completion_cache import CompletionCache
+from gpt_advisor import GPTAdvisor
+
+
+def chunk(text):
+    delta = type('Delta', (), {'content': text})
+    return type('Chunk', (), {'choices': [type('Choice', (), {'delta': delta})]})
+
+
+class DroppingCompletions:
+    def create(self, **kwargs):
+        yield chunk('Try ')
+        raise openai.APIConnectionError(request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+
+
+def test_stream_dropped_part_way_is_recorded_by_the_breaker():
+    advisor = GPTAdvisor(cache=CompletionCache())
+    advisor.client = type('Client', (), {'chat': type('Chat', (), {'completions': DroppingCompletions()})})
+    advisor.guard.reset()
+    failures = advisor.guard.stats['failures']
+
+    reply = ''.join(advisor.stream_chat_suggestion([], {'goal': 'Stay Healthy', 'age': 30}, 'snack ideas?', use_cache=False))
+
+    assert reply.startswith('Try ')
+    assert 'lost my train of thought' in reply
+    assert advisor.guard.stats['failures'] == failures + 1
+    advisor.guard.reset()
@@ -0,0 +1,24 @@
+from local_food_db import LocalFoodDatabase
+
+HEADER = ('food_name,serving_qty,serving_unit,serving_weight_grams,calories,total_fat,saturated_fat,'
+          'cholesterol,sodium,total_carbs,dietary_fiber,sugars,protein,potassium\n')
+
+
+def make_db(tmp_path, rows):
+    path = tmp_path / 'foods.csv'
+    path.write_text(HEADER + ''.join(row + '\n' for row in rows), encoding='utf-8')
+    return LocalFoodDatabase(str(path))
+
+
+def test_gram_serving_scales_by_weight(tmp_path):
+    db = make_db(tmp_path, ['dal,1,cup,200,230,8,1,0,400,30,8,2,12,500'])
+    assert db.lookup('dal', '100g')['calories'] == 115
+
+
+def test_zero_or_missing_weight_is_a_local_miss(tmp_path):
+    db = make_db(tmp_path, ['dal,1,cup,0,230,8,1,0,400,30,8,2,12,500',
+                            'poha,0,plate,,250,6,1,0,300,45,2,3,5,200'])
+    assert db.lookup('dal', '100g') is None
+    assert db.lookup('poha', '100 grams') is None
+    assert db.lookup('poha', '2 plates') is None
+    assert db.lookup('dal', '1 serving')['calories'] == 230
@@ -0,0 +1,20 @@
+import metrics
+
+
+def test_mark_error_inside_timed_generator_counts_against_it(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    monkeypatch.setattr(metrics, 'registry', metrics.MetricsRegistry())
+
+    @metrics.timed('test.stream')
+    def stream():
+        yield 'hello'
+        metrics.mark_error(RuntimeError("connection dropped"))
+        yield 'sorry'
+
+    with metrics.span('test.page'):
+        assert list(stream()) == ['hello', 'sorry']
+
+    rows = {row['operation']: row for row in metrics.registry.snapshot()}
+    assert rows['test.stream']['errors'] == 1
+    assert rows['test.stream']['bytes_in'] == len('hellosorry')
+    assert rows['test.page']['errors'] == 0
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip('requests')
+
+from nutrition_api import NutritionAPI
+from nutrition_cache import NutritionCache
+
+
+class NoLocalFoods:
+    def lookup(self, cleaned_food, serving_size="1 serving"):
+        return None
+
+
+class FakeResponse:
+    def __init__(self, foods):
+        self.status_code = 200
+        self._foods = foods
+
+    def json(self):
+        return {'foods': self._foods}
+
+
+class FakeNutritionix:
+    """Answers single queries with one food; batched queries with a canned list"""
+
+    def __init__(self, batched_foods):
+        self.batched_foods = batched_foods
+        self.queries = []
+
+    def post(self, url, headers=None, json=None, deadline=None):
+        query = json['query']
+        self.queries.append(query)
+        if ',' in query:
+            return FakeResponse(self.batched_foods)
+        name = query.split(' ', 2)[-1]
+        return FakeResponse([{'food_name': name, 'nf_calories': len(name) * 10}])
+
+
+def make_api(transport):
+    api = NutritionAPI(cache=NutritionCache(None), transport=transport, local_db=NoLocalFoods())
+    api.guard.reset()
+    return api
+
+
+def test_batched_answer_in_query_order_is_used():
+    transport = FakeNutritionix([{'food_name': 'apple', 'nf_calories': 95},
+                                 {'food_name': 'banana', 'nf_calories': 105}])
+    results = make_api(transport).get_nutrition_many(['apple', 'banana'])
+
+    assert [r['calories'] for r in results] == [95, 105]
+    assert len(transport.queries) == 1
+
+
+def test_same_count_but_split_and_merged_falls_back_to_single_lookups():
+    # "egg fried rice" came back as two foods while "apple" and "banana" were merged
+    transport = FakeNutritionix([{'food_name': 'egg', 'nf_calories': 1},
+                                 {'food_name': 'fried rice', 'nf_calories': 2},
+                                 {'food_name': 'fruit salad', 'nf_calories': 3}])
+    results = make_api(transport).get_nutrition_many(['egg fried rice', 'apple', 'banana'])
+
+    assert [r['food_name'] for r in results] == ['egg fried rice', 'apple', 'banana']
+    assert [r['calories'] for r in results] == [140, 50, 60]
+    assert len(transport.queries) == 4
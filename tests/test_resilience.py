@@ -0,0 +1,230 @@
+import threading
+
+import pytest
+
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitOpenError, ProviderGuard
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class UpstreamError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience.time, 'monotonic', clock)
+    return clock
+
+
+def fail():
+    raise UpstreamError(503)
+
+
+def ok():
+    return 'ok'
+
+
+def test_opens_at_threshold(clock):
+    guard = ProviderGuard('test', failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            guard.call(fail)
+    assert guard.state == CLOSED
+
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    assert guard.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        guard.call(calls.append, 1)
+    assert calls == []
+    assert guard.stats['opened'] == 1 and guard.stats['rejected'] == 1
+
+
+def test_success_resets_failure_count(clock):
+    guard = ProviderGuard('test', failure_threshold=2)
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    guard.call(ok)
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    assert guard.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through(clock):
+    guard = ProviderGuard('test', failure_threshold=1, reset_timeout=30)
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    clock.now += 30
+    assert guard.state == HALF_OPEN
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_trial():
+        started.set()
+        release.wait(5)
+        return 'ok'
+
+    trial = threading.Thread(target=guard.call, args=(slow_trial,))
+    trial.start()
+    assert started.wait(5)
+    with pytest.raises(CircuitOpenError):
+        guard.call(ok)
+    release.set()
+    trial.join(5)
+
+    assert guard.state == CLOSED
+    assert guard.call(ok) == 'ok'
+
+
+def test_interrupted_trial_frees_the_half_open_slot(clock):
+    guard = ProviderGuard('test', failure_threshold=1, reset_timeout=30)
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    clock.now += 30
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        guard.call(interrupted)
+    assert guard.state == HALF_OPEN
+
+    assert guard.call(ok) == 'ok'
+    assert guard.state == CLOSED
+
+
+def test_failed_trial_reopens(clock):
+    guard = ProviderGuard('test', failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        with pytest.raises(UpstreamError):
+            guard.call(fail)
+    clock.now += 30
+
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    assert guard.state == OPEN
+    assert guard.stats['opened'] == 2
+    with pytest.raises(CircuitOpenError):
+        guard.call(ok)
+
+    clock.now += 30
+    assert guard.call(ok) == 'ok'
+    assert guard.state == CLOSED
+
+
+def test_stream_failing_part_way_counts_as_failure(clock):
+    guard = ProviderGuard('test', failure_threshold=1, reset_timeout=30)
+
+    def dropped():
+        yield 'a'
+        raise UpstreamError(502)
+
+    received = []
+    with pytest.raises(UpstreamError):
+        for item in guard.stream(dropped):
+            received.append(item)
+    assert received == ['a']
+    assert guard.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        next(guard.stream(iter, ['b']))
+
+
+def test_stream_success_is_recorded_when_exhausted(clock):
+    guard = ProviderGuard('test', failure_threshold=1, reset_timeout=30)
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    clock.now += 30
+
+    stream = guard.stream(iter, ['a', 'b'])
+    assert next(stream) == 'a'
+    assert guard.state == HALF_OPEN
+    assert list(stream) == ['b']
+    assert guard.state == CLOSED
+
+
+def test_is_failure_ignores_client_errors(clock):
+    def is_failure(outcome):
+        return isinstance(outcome, UpstreamError) and outcome.status >= 500
+
+    def bad_request():
+        raise UpstreamError(404)
+
+    guard = ProviderGuard('test', failure_threshold=2, is_failure=is_failure)
+    for _ in range(5):
+        with pytest.raises(UpstreamError):
+            guard.call(bad_request)
+    assert guard.state == CLOSED
+    assert guard.stats['failures'] == 0
+
+
+def hedging_guard():
+    guard = ProviderGuard('test', hedge=True, hedge_min_delay=0.05)
+    # As if 20+ fast calls had already been seen
+    guard._p95 = 0.01
+    return guard
+
+
+def test_hedge_winner_is_returned_and_counted(clock):
+    guard = hedging_guard()
+    release_first = threading.Event()
+    attempts = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            attempts.append(len(attempts))
+            attempt = attempts[-1]
+        if attempt == 0:
+            release_first.wait(5)
+            return 'first'
+        return 'second'
+
+    try:
+        assert guard.call(call) == 'second'
+    finally:
+        release_first.set()
+    assert len(attempts) == 2
+    assert guard.stats['hedged'] == 1 and guard.stats['hedge_wins'] == 1
+
+
+def test_hedge_both_attempts_fail(clock):
+    guard = hedging_guard()
+    attempts = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            attempts.append(len(attempts))
+            attempt = attempts[-1]
+        if attempt == 0:
+            threading.Event().wait(0.2)
+        raise UpstreamError(500 + attempt)
+
+    with pytest.raises(UpstreamError) as raised:
+        guard.call(call)
+
+    # The original attempt's error is surfaced, and the call counts as one failure
+    assert raised.value.status == 500
+    assert guard.stats['hedged'] == 1 and guard.stats['hedge_wins'] == 0
+    assert guard.stats['failures'] == 1
+
+
+def test_no_hedge_while_failing(clock):
+    guard = hedging_guard()
+    with pytest.raises(UpstreamError):
+        guard.call(fail)
+    assert guard.hedge_delay() is None
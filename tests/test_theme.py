@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip('streamlit')
+
+import theme
+
+
+@pytest.fixture(autouse=True)
+def fresh_style():
+    theme.theme_style.cache_clear()
+    yield
+    theme.theme_style.cache_clear()
+
+
+def test_self_hosted_font_makes_no_remote_requests(monkeypatch):
+    monkeypatch.setattr(theme, 'font_is_self_hosted', lambda: True)
+    style = theme.theme_style()
+    assert theme.FONT_URL in style
+    assert theme.remote_urls(style) == []
+
+
+def test_missing_font_falls_back_to_google_fonts(monkeypatch):
+    monkeypatch.setattr(theme, 'font_is_self_hosted', lambda: False)
+    assert theme.remote_urls(theme.theme_style()) == [theme.GOOGLE_FONTS_CSS]
@@ -0,0 +1,26 @@
+from user_cache import UserDataCache
+
+
+def test_set_drops_expired_entries_of_that_user(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('user_cache.time.time', lambda: now[0])
+    cache = UserDataCache(ttls={'meals': 60})
+    cache.set('u1', 'meals', ('2026-10-01', '2026-10-01'), ['old'])
+    cache.set('u2', 'meals', ('2026-10-01', '2026-10-01'), ['other user'])
+
+    now[0] += 61
+    cache.set('u1', 'meals', ('2026-10-02', '2026-10-02'), ['new'])
+
+    assert list(cache._users['u1']) == [('meals', ('2026-10-02', '2026-10-02'))]
+    assert len(cache._users['u2']) == 1
+
+
+def test_get_respects_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('user_cache.time.time', lambda: now[0])
+    cache = UserDataCache(ttls={'profile': 10})
+    cache.set('u1', 'profile', None, {'name': 'a'})
+
+    assert cache.get('u1', 'profile', None) == (True, {'name': 'a'})
+    now[0] += 10
+    assert cache.get('u1', 'profile', None) == (False, None)
@@ -1,55 +1,189 @@
 # theme.py (Version with High-Contrast Text)
+# The stylesheet lives in static/theme.css. It is minified once per process and
+# injected once per rerun; Quicksand is served from static/fonts through
+# Streamlit static serving (.streamlit/config.toml) instead of Google Fonts.
+# The font file is fetched when the image is built (.devcontainer/devcontainer.json);
+# if it is missing the Google Fonts stylesheet is used instead.
+#   python theme.py fetch-font   # download static/fonts/quicksand-latin-variable.woff2
+#   python theme.py benchmark    # payload and render-time comparison
+import os
+import re
+import sys
+import time
+import functools
+
 import streamlit as st
 
-def apply_pookie_theme():
-    st.markdown("""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Quicksand:wght@300;400;500;600;700&display=swap');
-        
-        /* --- THIS IS THE MAIN FIX --- */
-        /* Set a default dark color for all text */
-        .stApp, .stApp p, .stMarkdown, .stAlert, .stExpander {
-            color: #333333 !important; /* A very dark gray, almost black */
-        }
-        
-        .stApp {
-            background: linear-gradient(135deg, #ffeef8 0%, #ffe1f4 25%, #ffd7ef 50%, #ffb3d9 100%);
-            font-family: 'Quicksand', sans-serif !important;
-        }
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+THEME_CSS_PATH = os.path.join(STATIC_DIR, 'theme.css')
+FONT_FILE = 'fonts/quicksand-latin-variable.woff2'
+# Streamlit serves ./static at app/static/, relative to the page URL
+FONT_URL = f'app/static/{FONT_FILE}'
+GOOGLE_FONTS_CSS = 'https://fonts.googleapis.com/css2?family=Quicksand:wght@300..700&display=swap'
+# Fontsource's build of the same Google Fonts file (Latin subset, weights 300-700)
+FONT_SOURCE_URL = 'https://cdn.jsdelivr.net/npm/@fontsource-variable/quicksand@5/files/quicksand-latin-wght-normal.woff2'
 
-        /* Keep the main title vibrant pink */
-        .main-title {
-            color: #d63384 !important;
-            text-align: center; font-size: 3.5rem !important; font-weight: 700 !important; font-style: italic !important;
-            text-shadow: 2px 2px 4px rgba(214, 51, 132, 0.3); margin-bottom: 0.5rem !important;
-        }
-        
-        /* Make headings a darker, more readable pink */
-        h2, h3, h4, .section-title, .cute-tagline {
-            color: #880e4f !important; /* A very dark, rich pink */
-            font-family: 'Quicksand', sans-serif !important;
-            font-weight: 700 !important;
-        }
+_INJECTED_KEY = '_pookie_theme_injected'
+render_stats = {'injections': 0, 'skipped': 0, 'total_ms': 0.0, 'payload_bytes': 0}
 
-        /* Sidebar Styling (already good, no changes needed) */
-        .css-1d391kg { background: linear-gradient(180deg, #fff0f6, #fce4ec) !important; border-right: 2px solid #f8bbd9 !important; }
-        .css-1d391kg .stAlert { border-radius: 15px; border-color: #f06292; background-color: #ffc1e3; }
-        .css-1d391kg .stButton>button { background: linear-gradient(45deg, #ff6b9d, #e91e63) !important; color: white !important; border-radius: 25px !important; border: none !important; font-weight: 700 !important; }
-        .css-1d391kg .stButton>button:hover { background: linear-gradient(45deg, #ff8fab, #f06292) !important; transform: scale(1.05); }
-
-        /* The button centering class */
-        .center-btn-container { display: flex; justify-content: center; padding-top: 1rem; }
-        
-        /* General Component Styles */
-        .upload-section, .profile-dropdown, .food-result, .nutrition-card, .advice-card, .advice-section, .welcome-section, .encouragement-card, .daily-tip-card { border-radius: 25px; padding: 2rem; margin-bottom: 1.5rem; }
-
-        /* Fix for metric cards to use the new dark text color */
-        .nutrition-card div[data-testid="stMetric"], .nutrition-card div[data-testid="stMetric"] div {
-             color: #333333 !important;
-        }
-        .daily-tip-card p {
-            color: #333333 !important;
+
+def minify_css(css):
+    """Strip comments and insignificant whitespace from a stylesheet."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    # Spaces before ':' are kept: 'a :hover' and 'a:hover' select different elements
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def font_is_self_hosted():
+    return os.path.exists(os.path.join(STATIC_DIR, FONT_FILE))
+
+
+def _font_face():
+    if not font_is_self_hosted():
+        print(f"⚠️ {FONT_FILE} is missing, using Google Fonts; run python theme.py fetch-font")
+        # @import has to come first in the stylesheet
+        return f"@import url('{GOOGLE_FONTS_CSS}');\n"
+    # swap: text paints immediately in the fallback font instead of waiting for Quicksand
+    return ("@font-face { font-family: 'Quicksand'; font-style: normal; font-weight: 300 700; "
+            f"font-display: swap; src: local('Quicksand'), url('{FONT_URL}') format('woff2'); }}\n")
+
+
+@functools.lru_cache(maxsize=1)
+def theme_style():
+    """The <style> element for the theme, built once per process."""
+    with open(THEME_CSS_PATH, encoding='utf-8') as f:
+        css = f.read()
+    return f"<style>{minify_css(_font_face() + css)}</style>"
+
+
+def apply_pookie_theme(new_run=False):
+    """
+    Inject the theme stylesheet once per rerun.
+
+    Args:
+        new_run (bool): True at the top of app.py, which runs first on every
+                        rerun; the pages' own calls later in that run are skipped.
+    """
+    if not new_run and st.session_state.get(_INJECTED_KEY):
+        render_stats['skipped'] += 1
+        return
+    started = time.perf_counter()
+    style = theme_style()
+    st.markdown(style, unsafe_allow_html=True)
+    st.session_state[_INJECTED_KEY] = True
+    render_stats['injections'] += 1
+    render_stats['payload_bytes'] += len(style)
+    render_stats['total_ms'] += (time.perf_counter() - started) * 1000
+
+
+def fetch_font(timeout=30):
+    """Download the Latin Quicksand variable font into static/fonts (run at image build)."""
+    import requests
+
+    response = requests.get(FONT_SOURCE_URL, timeout=timeout)
+    response.raise_for_status()
+    if not response.content.startswith(b'wOF2'):
+        raise RuntimeError(f"{FONT_SOURCE_URL} did not return a woff2 file")
+    path = os.path.join(STATIC_DIR, FONT_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    print(f"✅ Saved {len(response.content)} bytes to {path}")
+
+
+def remote_urls(css):
+    """Remote (http/https) URLs a stylesheet makes the browser fetch, from @import and url()."""
+    return re.findall(r"""(?:@import\s+|url\(\s*)['"]?(https?://[^'")\s;]+)""", css)
+
+
+def benchmark(reruns=50, page='Login', page_module='pages.login_page'):
+    """
+    Compare the old theme path (the unminified stylesheet with a Google Fonts
+    @import, injected on every call) with the current one, by running app.py
+    headless through Streamlit's AppTest with each in turn. The menu is pinned
+    to page, whose module calls apply_pookie_theme again after app.py did; the
+    default Login page is the one a logged-out session can open.
+
+    Returns:
+        dict: {'legacy': ..., 'current': ...}, each with the style elements and
+              bytes sent per rerun, the remote URLs the CSS loads, the theme's
+              own time per rerun and the mean and p95 app.py script time in ms
+    """
+    from streamlit.testing.v1 import AppTest
+
+    import importlib
+    import streamlit_option_menu
+
+    # app.py imports the 'theme' module, which is not __main__ when run as python theme.py
+    module = importlib.import_module('theme')
+    # Pages bind apply_pookie_theme at import, so the swap has to reach them too
+    sys.path.insert(0, os.path.dirname(os.path.dirname(THEME_CSS_PATH)))
+    page_module = importlib.import_module(page_module)
+    with open(THEME_CSS_PATH, encoding='utf-8') as f:
+        raw_css = f.read()
+    legacy_style = f"<style>\n@import url('{GOOGLE_FONTS_CSS}');\n{raw_css}</style>"
+
+    def legacy_apply(new_run=False):
+        st.markdown(legacy_style, unsafe_allow_html=True)
+
+    def timed(apply):
+        def wrapper(new_run=False):
+            started = time.perf_counter()
+            apply(new_run)
+            theme_ms.append((time.perf_counter() - started) * 1000)
+        return wrapper
+
+    def measure(apply):
+        module.apply_pookie_theme = page_module.apply_pookie_theme = timed(apply)
+        app = AppTest.from_file(os.path.join(os.path.dirname(THEME_CSS_PATH), '..', 'app.py'), default_timeout=60)
+        app.run()
+        timings = []
+        theme_ms.clear()
+        for _ in range(reruns):
+            started = time.perf_counter()
+            app.run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        styles = [element.value for element in app.markdown if element.value.startswith('<style>')]
+        return {
+            'theme_calls_per_rerun': len(theme_ms) / reruns,
+            'style_elements_per_rerun': len(styles),
+            'style_bytes_per_rerun': sum(len(style) for style in styles),
+            'remote_urls': sorted({url for style in styles for url in remote_urls(style)}),
+            'mean_rerun_ms': sum(timings) / len(timings),
+            'p95_rerun_ms': timings[int(0.95 * (len(timings) - 1))],
+            'theme_ms_per_rerun': sum(theme_ms) / reruns,
         }
 
-    </style>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    theme_ms = []
+    current_apply = module.apply_pookie_theme
+    menu = streamlit_option_menu.option_menu
+    # app.py imports option_menu and apply_pookie_theme on every run, so swapping them here takes effect
+    streamlit_option_menu.option_menu = lambda *args, **kwargs: page
+    try:
+        return {'legacy': measure(legacy_apply), 'current': measure(current_apply)}
+    finally:
+        module.apply_pookie_theme = page_module.apply_pookie_theme = current_apply
+        streamlit_option_menu.option_menu = menu
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'benchmark'
+    if command == 'fetch-font':
+        fetch_font()
+    elif command == 'benchmark':
+        result = benchmark()
+        for name in ('legacy', 'current'):
+            stats = result[name]
+            print(f"{name:<8} {stats['theme_calls_per_rerun']:.0f} theme calls, {stats['style_elements_per_rerun']} style element(s), {stats['style_bytes_per_rerun']} bytes per rerun; "
+                  f"theme {stats['theme_ms_per_rerun']:.2f} ms, rerun mean {stats['mean_rerun_ms']:.1f} ms, p95 {stats['p95_rerun_ms']:.1f} ms; "
+                  f"remote URLs: {', '.join(stats['remote_urls']) or 'none'}")
+    else:
+        raise SystemExit("usage: python theme.py [fetch-font|benchmark]")
+
+
+if __name__ == "__main__":
+    main()
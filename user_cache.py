@@ -0,0 +1,76 @@
+# user_cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_TTLS = {
+    'profile': int(os.getenv('USER_CACHE_PROFILE_TTL', '300')),
+    'meals': int(os.getenv('USER_CACHE_MEALS_TTL', '60')),
+    'rollups': int(os.getenv('USER_CACHE_ROLLUPS_TTL', '60')),
+}
+
+
+class UserDataCache:
+    def __init__(self, ttls=None, max_users=1000):
+        """
+        Short-lived cache of per-user reads, grouped by user so a write can
+        drop exactly that user's entries of the affected kind.
+
+        Args:
+            ttls (dict): Seconds to keep entries, per kind ('profile', 'meals', ...).
+            max_users (int): Users kept before the least recently used is dropped.
+        """
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'window_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, user_id, kind, key):
+        """Returns (True, value) on a hit, (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries(user_id).get((kind, key))
+            if entry is not None and entry[0] > time.time():
+                self.stats['hits'] += 1
+                return True, entry[1]
+            self.stats['misses'] += 1
+            return False, None
+
+    def set(self, user_id, kind, key, value):
+        now = time.time()
+        with self._lock:
+            entries = self._entries(user_id, create=True)
+            # Windows are keyed by dates, so an active user keeps adding keys; drop the dead ones here
+            for entry_key in [k for k, (expires, _) in entries.items() if expires <= now]:
+                del entries[entry_key]
+            entries[(kind, key)] = (now + self.ttls.get(kind, 60), value)
+
+    def find(self, user_id, kind, predicate):
+        """First unexpired (key, value) of this kind whose key satisfies predicate, or None."""
+        now = time.time()
+        with self._lock:
+            for (entry_kind, key), (expires, value) in self._entries(user_id).items():
+                if entry_kind == kind and expires > now and predicate(key):
+                    self.stats['window_hits'] += 1
+                    return key, value
+        return None
+
+    def invalidate(self, user_id, kinds=None):
+        """Drops a user's entries of the given kinds (all kinds if None)."""
+        with self._lock:
+            entries = self._entries(user_id)
+            for entry_key in [k for k in entries if kinds is None or k[0] in kinds]:
+                del entries[entry_key]
+                self.stats['invalidations'] += 1
+
+    def _entries(self, user_id, create=False):
+        entries = self._users.get(user_id)
+        if entries is None:
+            if not create:
+                return {}
+            entries = self._users[user_id] = {}
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return entries